@@ -1,20 +1,140 @@
 #! /usr/bin/env python3
 import logging
-from pyboi import Pyboi
+from pyboi.emulator.snapshot import SnapshotPool
+from pyboi.frontend.loop import EmulatorLoop
+from pyboi.frontend.broadcast import Broadcast
 import asyncio
 import websockets
 
 #turn off logging
 logging.disable(level=logging.CRITICAL)
 
+# every session of a rom starts as a copy of the rom started once
+POOL = SnapshotPool()
+# the players' in-game saves and the code cache
+SAVE_DIR = 'saves'
+CACHE_DIR = 'cache'
+
+# sessions being played by path, spectators watch them at /watch<path>
+SESSIONS = {}
+
+# client key messages, uppercase presses and lowercase releases
+KEYS = {
+    'A': 'left',
+    'D': 'right',
+    'W': 'up',
+    'S': 'down',
+    'L': 'select',
+    'P': 'start',
+    'N': 'a',
+    'M': 'b'
+}
+
+# receives the client's input while frames are streamed
+async def receive_input(websocket, loop, state):
+    gb = loop.gb
+    while True:
+        try:
+            message = await websocket.recv()
+        except websockets.exceptions.ConnectionClosed:
+            loop.stop()
+            return
+        if message == 'stop':
+            loop.paused = True
+        elif message == 'start':
+            loop.paused = False
+        elif message == 'audio':
+            state['audio'] = True
+        elif message.upper() in KEYS:
+            if message.isupper():
+                gb.press(KEYS[message])
+            else:
+                gb.release(KEYS[message.upper()])
+
+# receives a spectator's messages, only to switch audio on
+async def receive_spectator(websocket, broadcast, frames, state):
+    while True:
+        try:
+            message = await websocket.recv()
+        except websockets.exceptions.ConnectionClosed:
+            broadcast.leave(frames)
+            return
+        if message == 'audio':
+            state['audio'] = True
+
+# plays a new session at path, streaming every frame to the player
+async def play(websocket, path):
+    gb = POOL.session('roms/tetris.gb', save_dir=SAVE_DIR,
+                      cache_dir=CACHE_DIR)
+    if gb is None:
+        # 1011: the server could not start the game
+        await websocket.close(1011, 'the rom could not be loaded')
+        return
+    loop = EmulatorLoop(gb)
+    broadcast = Broadcast(loop.bus)
+    SESSIONS[path] = broadcast
+    # up to a second of frames queued for a slow connection
+    frames = loop.bus.subscribe('every', limit=60)
+    state = {'audio': False}
+    receiver = asyncio.ensure_future(receive_input(websocket, loop, state))
+    runner = asyncio.ensure_future(loop.run_async())
+    try:
+        while True:
+            frame = await frames.next_frame()
+            if frame is None:
+                break
+            await websocket.send(frame.video)
+            if state['audio']:
+                # the frame's sound, 16 bit stereo pcm at 48kHz
+                await websocket.send(b'pcm' + frame.audio)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        del SESSIONS[path]
+        loop.stop()
+        receiver.cancel()
+        await runner
+        gb.close()
+
+# streams a session to a spectator, the frames are encoded once for
+# all spectators, one that lags skips ahead to a key frame
+async def watch(websocket, broadcast):
+    frames = broadcast.watch()
+    state = {'audio': False}
+    receiver = asyncio.ensure_future(
+        receive_spectator(websocket, broadcast, frames, state))
+    last = None
+    try:
+        while True:
+            frame = await frames.next_frame()
+            if frame is None:
+                break
+            message = frame.message(last)
+            last = frame.number
+            if message is not None:
+                await websocket.send(message)
+            if state['audio']:
+                await websocket.send(frame.audio)
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        receiver.cancel()
+        broadcast.leave(frames)
+
 # websocket handler for streaming gb screen
 async def gameboy(websocket, path):
     print(path)
-    gb = Pyboi()
-    gb.load_rom('roms/tetris.gb')
-    while True:
-        message = gb.get_boot_frame()
-        await websocket.send(bytes(message))
+    if path.startswith('/watch/'):
+        path = path[len('/watch'):]
+    elif path not in SESSIONS:
+        await play(websocket, path)
+        return
+    # watching, or joining a session that is already played
+    broadcast = SESSIONS.get(path)
+    if broadcast is None:
+        await websocket.close()
+        return
+    await watch(websocket, broadcast)
 
 #simple websocket test for graphics
 def main():
@@ -1,26 +1,46 @@
 #! /usr/bin/env python3
 
 from pyboi import Pyboi
-import drawille
+from pyboi.frontend.terminal import TerminalRenderer
+from pyboi.frontend.loop import EmulatorLoop
+import argparse
+import os.path
+import threading
 
 
 def main():
+    parser = argparse.ArgumentParser(description='run pyboi in the terminal')
+    parser.add_argument('--rom', default='roms/tetris.gb')
+    parser.add_argument('--half', action='store_true',
+                        help='draw with colored half blocks instead of braille')
+    parser.add_argument('--data', default=None,
+                        help='keep in-game saves and the code cache in this '
+                             'directory, nothing is written without it')
+    args = parser.parse_args()
+
     gb = Pyboi()
-    gb.load_rom('roms/tetris.gb')
-    c = drawille.Canvas()
-    while True:
-        c.clear()
-        c.set(0,0)
-        c.set(159, 143)
-        frame = gb.get_boot_frame()
-        for row in range(144):
-            for col in range(160):
-                if frame[(row * 160) + col] != 0:
-                    c.set(col, row)
-        print(chr(27) + "[2J")
-        print(chr(27) + "[3J")
-        print(c.frame())
+    if args.data is None:
+        gb.load_rom(args.rom)
+    else:
+        gb.load_rom(args.rom, save_dir=os.path.join(args.data, 'saves'),
+                    cache_dir=os.path.join(args.data, 'cache'))
+    gb.boot()
+    screen = TerminalRenderer('half' if args.half else 'braille')
+    loop = EmulatorLoop(gb)
+    # the terminal may draw slower than the game runs
+    frames = loop.bus.subscribe('latest')
+    thread = threading.Thread(target=loop.run, daemon=True)
+    thread.start()
+    try:
+        for frame in frames:
+            screen.draw(frame.video)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.stop()
+        thread.join()
+        screen.close()
+        gb.close()
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,463 @@
+import numpy as np
+import logging
+log = logging.getLogger(name='apu')
+
+# cpu clock and output sample rate (Hz)
+CLOCK_RATE = 4194304
+SAMPLE_RATE = 48000
+CYCLES_PER_SAMPLE = CLOCK_RATE / SAMPLE_RATE
+# the frame sequencer clocks length/envelope/sweep at 512 Hz
+SEQUENCER_CYCLES = 8192
+# at most one second of stereo int16 samples are kept unread
+MAX_BUFFER = SAMPLE_RATE * 4
+
+# register reads are ORed with these, 0xff10 - 0xff2f
+READ_MASKS = bytes((
+    0x80, 0x3f, 0x00, 0xff, 0xbf,  # NR10 - NR14
+    0xff, 0x3f, 0x00, 0xff, 0xbf,  # unused, NR21 - NR24
+    0x7f, 0xff, 0x9f, 0xff, 0xbf,  # NR30 - NR34
+    0xff, 0xff, 0x00, 0x00, 0xbf,  # unused, NR41 - NR44
+    0x00, 0x00, 0x70,              # NR50 - NR52
+    0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff))
+
+# square waveforms for the 4 duty cycles, 12.5% 25% 50% 75%
+DUTY = np.array([
+    [-1, -1, -1, -1, -1, -1, -1, 1],
+    [1, -1, -1, -1, -1, -1, -1, 1],
+    [1, -1, -1, -1, -1, 1, 1, 1],
+    [-1, 1, 1, 1, 1, 1, 1, -1]], dtype=np.float32)
+
+# wave channel volume codes, mute 100% 50% 25%
+WAVE_VOLUME = (0.0, 1.0, 0.5, 0.25)
+
+
+def lfsr_table(width7):
+    """
+    Returns the full output sequence of the noise LFSR
+    as an array of +-1, 32767 entries (127 for width7).
+    """
+    length = 127 if width7 else 32767
+    lfsr = 0x7fff
+    table = np.empty(length, dtype=np.float32)
+    for i in range(length):
+        table[i] = -1.0 if lfsr & 0x1 else 1.0
+        bit = (lfsr ^ (lfsr >> 1)) & 0x1
+        lfsr = (lfsr >> 1) | (bit << 14)
+        if width7:
+            lfsr = (lfsr & ~0x40) | (bit << 6)
+    return table
+
+NOISE = (lfsr_table(False), lfsr_table(True))
+
+
+class Channel:
+    """
+    Length counter and volume envelope shared by the channels.
+    Channels produce their samples as float32 arrays in volume
+    units (-15 to 15), centered around 0.
+
+    ...
+    Attributes
+    ----------
+    enabled : bool
+        channel is playing, cleared when the length runs out
+    dac : bool
+        the channel's DAC is powered, triggering requires it
+    length : int
+        length counter, counts down to 0 while length_enabled
+    phase : float
+        position in the waveform, in waveform steps
+    volume : int
+        current envelope volume 0 - 15
+    """
+    max_length = 64
+
+    def __init__(self):
+        self.enabled = False
+        self.dac = False
+        self.length = 0
+        self.length_enabled = False
+        self.freq = 0
+        self.phase = 0.0
+        self.volume = 0
+        self.env_initial = 0
+        self.env_add = False
+        self.env_period = 0
+        self.env_timer = 0
+
+    def write_envelope(self, byte):
+        self.env_initial = byte >> 4
+        self.env_add = byte & 0x8 != 0
+        self.env_period = byte & 0x7
+        self.dac = byte & 0xf8 != 0
+        if not self.dac:
+            self.enabled = False
+
+    def write_length(self, byte):
+        self.length = self.max_length - byte
+
+    def write_control(self, byte):
+        """ NRx4, frequency bits 8-10, length enable and trigger. """
+        self.freq = (self.freq & 0xff) | ((byte & 0x7) << 8)
+        self.length_enabled = byte & 0x40 != 0
+        if byte & 0x80:
+            self.trigger()
+
+    def trigger(self):
+        self.enabled = self.dac
+        if self.length == 0:
+            self.length = self.max_length
+        self.volume = self.env_initial
+        self.env_timer = self.env_period
+        self.phase = 0.0
+
+    def clock_length(self):
+        if self.length_enabled and self.length > 0:
+            self.length -= 1
+            if self.length == 0:
+                self.enabled = False
+
+    def clock_envelope(self):
+        if self.env_period == 0:
+            return
+        self.env_timer -= 1
+        if self.env_timer <= 0:
+            self.env_timer = self.env_period
+            if self.env_add and self.volume < 15:
+                self.volume += 1
+            elif not self.env_add and self.volume > 0:
+                self.volume -= 1
+
+    def steps(self, n, steps_per_sample, period):
+        """
+        Returns the waveform step index of the next n samples
+        and advances the phase past them.
+        """
+        steps = self.phase + steps_per_sample * np.arange(n, dtype=np.float64)
+        self.phase = (self.phase + steps_per_sample * n) % period
+        return steps.astype(np.int64) % period
+
+
+class Square(Channel):
+    """
+    Square channels 1 and 2, channel 1 has the frequency sweep.
+    """
+    def __init__(self, sweep):
+        super().__init__()
+        self.has_sweep = sweep
+        self.duty = 0
+        self.sweep_period = 0
+        self.sweep_negate = False
+        self.sweep_shift = 0
+        self.sweep_timer = 0
+        self.sweep_enabled = False
+        self.shadow = 0
+
+    def write(self, reg, byte):
+        """ Write NRx0 - NRx4, reg is 0 - 4. """
+        if reg == 0:
+            self.sweep_period = (byte >> 4) & 0x7
+            self.sweep_negate = byte & 0x8 != 0
+            self.sweep_shift = byte & 0x7
+        elif reg == 1:
+            self.duty = byte >> 6
+            self.write_length(byte & 0x3f)
+        elif reg == 2:
+            self.write_envelope(byte)
+        elif reg == 3:
+            self.freq = (self.freq & 0x700) | byte
+        else:
+            self.write_control(byte)
+
+    def trigger(self):
+        super().trigger()
+        if self.has_sweep:
+            self.shadow = self.freq
+            self.sweep_timer = self.sweep_period or 8
+            self.sweep_enabled = self.sweep_period != 0 or self.sweep_shift != 0
+            if self.sweep_shift:
+                self.sweep_freq()
+
+    def sweep_freq(self):
+        """ Returns the next swept frequency, disables on overflow. """
+        delta = self.shadow >> self.sweep_shift
+        freq = self.shadow - delta if self.sweep_negate else self.shadow + delta
+        if freq > 2047:
+            self.enabled = False
+        return freq
+
+    def clock_sweep(self):
+        self.sweep_timer -= 1
+        if self.sweep_timer > 0:
+            return
+        self.sweep_timer = self.sweep_period or 8
+        if self.sweep_enabled and self.sweep_period:
+            freq = self.sweep_freq()
+            if freq <= 2047 and self.sweep_shift:
+                self.freq = self.shadow = freq
+                self.sweep_freq()
+
+    def samples(self, n):
+        """ Returns the next n samples, None if silent. """
+        if not self.enabled or self.volume == 0:
+            return None
+        # 8 duty steps, each lasting (2048 - freq) * 4 cycles
+        steps = self.steps(n, CYCLES_PER_SAMPLE / ((2048 - self.freq) * 4), 8)
+        return DUTY[self.duty][steps] * self.volume
+
+
+class Wave(Channel):
+    """
+    Channel 3, plays the 32 4 bit samples of wave ram.
+
+    ...
+    Attributes
+    ----------
+    table : ndarray
+        wave ram as 32 float samples, centered around 0
+    """
+    max_length = 256
+
+    def __init__(self):
+        super().__init__()
+        self.level = 0
+        self.table = np.zeros(32, dtype=np.float32)
+
+    def write(self, reg, byte):
+        """ Write NR30 - NR34, reg is 0 - 4. """
+        if reg == 0:
+            self.dac = byte & 0x80 != 0
+            if not self.dac:
+                self.enabled = False
+        elif reg == 1:
+            self.write_length(byte)
+        elif reg == 2:
+            self.level = (byte >> 5) & 0x3
+        elif reg == 3:
+            self.freq = (self.freq & 0x700) | byte
+        else:
+            self.write_control(byte)
+
+    def write_ram(self, index, byte):
+        """ Write wave ram byte index (0 - 15), two samples. """
+        self.table[index * 2] = ((byte >> 4) - 7.5) * 2
+        self.table[index * 2 + 1] = ((byte & 0xf) - 7.5) * 2
+
+    def samples(self, n):
+        """ Returns the next n samples, None if silent. """
+        if not self.enabled or self.level == 0:
+            return None
+        # 32 samples, each lasting (2048 - freq) * 2 cycles
+        steps = self.steps(n, CYCLES_PER_SAMPLE / ((2048 - self.freq) * 2), 32)
+        return self.table[steps] * WAVE_VOLUME[self.level]
+
+
+class Noise(Channel):
+    """
+    Channel 4, plays the LFSR output. The LFSR sequences are
+    precomputed (NOISE), so the phase indexes into them.
+    """
+    def __init__(self):
+        super().__init__()
+        self.shift = 0
+        self.width7 = False
+        self.divisor = 0
+
+    def write(self, reg, byte):
+        """ Write NR40 - NR44, reg is 0 - 4 (0 is unused). """
+        if reg == 1:
+            self.write_length(byte & 0x3f)
+        elif reg == 2:
+            self.write_envelope(byte)
+        elif reg == 3:
+            self.shift = byte >> 4
+            self.width7 = byte & 0x8 != 0
+            self.divisor = byte & 0x7
+            self.phase %= len(NOISE[self.width7])
+        elif reg == 4:
+            self.write_control(byte & 0xc0)
+
+    def samples(self, n):
+        """ Returns the next n samples, None if silent. """
+        if not self.enabled or self.volume == 0:
+            return None
+        table = NOISE[self.width7]
+        if self.shift >= 14:
+            # the lfsr is not clocked
+            steps_per_sample = 0.0
+        else:
+            period = (self.divisor * 16 or 8) << self.shift
+            steps_per_sample = CYCLES_PER_SAMPLE / period
+        return table[self.steps(n, steps_per_sample, len(table))] * self.volume
+
+
+class APU:
+    """
+    The sound hardware, registers 0xff10 - 0xff3f.
+
+    Register writes are stored right away (for reads) and logged with
+    the timer clock, render() then replays the log and synthesizes the
+    samples in between writes/frame sequencer steps as numpy blocks.
+
+    ...
+    Attributes
+    ----------
+    regs : bytearray
+        the registers as written, 0xff10 - 0xff3f
+    power : bool
+        NR52 bit 7, registers ignore writes while off
+    on : bool
+        NR52 bit 7 as of the rendered clock
+    master : int
+        NR50 master volume as of the rendered clock
+    panning : int
+        NR51 channel panning as of the rendered clock
+    log : list of tuples
+        (clock, register, byte) writes not rendered yet
+    clock : int
+        timer clock rendered up to
+    sample_clock : float
+        timer clock of the next output sample
+    next_step : int
+        timer clock of the next frame sequencer step
+    step : int
+        frame sequencer step 0 - 7
+    buffer : bytearray
+        rendered interleaved stereo int16 samples not read yet
+    """
+    def __init__(self, memory):
+        self.timer = memory.timer
+        self.regs = bytearray(0x30)
+        self.power = False
+        self.on = False
+        self.master = 0
+        self.panning = 0
+        self.log = []
+        self.channels = (Square(True), Square(False), Wave(), Noise())
+        self.clock = self.timer.clock
+        self.sample_clock = float(self.clock)
+        self.next_step = self.clock + SEQUENCER_CYCLES
+        self.step = 0
+        self.buffer = bytearray()
+
+    def read(self, address):
+        """ Read a sound register. """
+        reg = address - 0xff10
+        if reg >= 0x20:
+            return self.regs[reg]
+        if address == 0xff26:
+            # channel status, bring the channels up to date first
+            self.render()
+            status = 0x80 if self.power else 0
+            for i, channel in enumerate(self.channels):
+                if channel.enabled:
+                    status |= 1 << i
+            return status | 0x70
+        return self.regs[reg] | READ_MASKS[reg]
+
+    def write(self, address, byte):
+        """ Write a sound register, logged for render(). """
+        reg = address - 0xff10
+        if address == 0xff26:
+            self.power = byte & 0x80 != 0
+            if not self.power:
+                self.regs[:0x16] = bytes(0x16)
+        elif not self.power and reg < 0x20:
+            return
+        self.regs[reg] = byte
+        self.log.append((self.timer.clock, reg, byte))
+        if len(self.log) > 4096:
+            self.render()
+
+    def apply(self, reg, byte):
+        """ Applies a logged register write to the channels. """
+        if reg < 0x14:
+            self.channels[reg // 5].write(reg % 5, byte)
+        elif reg >= 0x20:
+            self.channels[2].write_ram(reg - 0x20, byte)
+        elif reg == 0x14:
+            self.master = byte
+        elif reg == 0x15:
+            self.panning = byte
+        elif reg == 0x16:
+            self.on = byte & 0x80 != 0
+            if not self.on:
+                channels = (Square(True), Square(False), Wave(), Noise())
+                # wave ram survives power off
+                channels[2].table = self.channels[2].table
+                self.channels = channels
+                self.master = self.panning = 0
+
+    def render(self):
+        """
+        Synthesizes the samples up to the current timer clock,
+        applying the logged writes at their cycle.
+        """
+        log = self.log
+        self.log = []
+        for clock, reg, byte in log:
+            self.synthesize(clock)
+            self.apply(reg, byte)
+        self.synthesize(self.timer.clock)
+        if len(self.buffer) > MAX_BUFFER:
+            del self.buffer[:len(self.buffer) - MAX_BUFFER]
+
+    def synthesize(self, end):
+        """ Renders the samples from self.clock up to end. """
+        while self.next_step <= end:
+            self.mix(self.next_step)
+            self.sequence()
+            self.next_step += SEQUENCER_CYCLES
+        self.mix(end)
+
+    def sequence(self):
+        """ Frame sequencer step: length, sweep and envelope clocks. """
+        if self.step & 0x1 == 0:
+            for channel in self.channels:
+                channel.clock_length()
+        if self.step == 2 or self.step == 6:
+            self.channels[0].clock_sweep()
+        if self.step == 7:
+            for channel in self.channels:
+                channel.clock_envelope()
+        self.step = (self.step + 1) & 0x7
+
+    def mix(self, end):
+        """
+        Mixes the channels' samples from self.clock up to end into the
+        buffer, with the NR51 panning and NR50 master volume.
+        """
+        self.clock = end
+        n = int(np.ceil((end - self.sample_clock) / CYCLES_PER_SAMPLE))
+        if n <= 0:
+            return
+        self.sample_clock += n * CYCLES_PER_SAMPLE
+        left = np.zeros(n, dtype=np.float32)
+        right = np.zeros(n, dtype=np.float32)
+        if self.on:
+            panning = self.panning
+            for i, channel in enumerate(self.channels):
+                samples = channel.samples(n)
+                if samples is None:
+                    continue
+                if panning & (0x10 << i):
+                    left += samples
+                if panning & (0x1 << i):
+                    right += samples
+            volume = self.master
+            # 4 channels of +-15, scaled by the master volume 1 - 8
+            left *= (((volume >> 4) & 0x7) + 1) * (32767 / (60 * 8))
+            right *= ((volume & 0x7) + 1) * (32767 / (60 * 8))
+        pcm = np.empty(n * 2, dtype=np.int16)
+        pcm[0::2] = left
+        pcm[1::2] = right
+        self.buffer += pcm.tobytes()
+
+    def read_samples(self):
+        """
+        Returns the rendered samples not read yet, interleaved
+        stereo (left, right) signed 16 bit at SAMPLE_RATE.
+        """
+        samples = bytes(self.buffer)
+        self.buffer = bytearray()
+        return samples
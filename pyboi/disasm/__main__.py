@@ -0,0 +1,59 @@
+import argparse
+import logging
+import sys
+from ..memory.cartridge import ROMS
+from .analysis import ANALYSES
+
+parser = argparse.ArgumentParser(prog='python -m pyboi.disasm',
+                                 description='disassemble the code of a rom')
+parser.add_argument('rom')
+parser.add_argument('--bank', type=int, default=None,
+                    help='only list this bank')
+parser.add_argument('--entry', action='append', default=[],
+                    help='also explore from bank:address (hex)')
+parser.add_argument('--no-sweep', action='store_true',
+                    help="don't list banks no explored code reached")
+parser.add_argument('--cache', default='cache',
+                    help='directory of the analysis cache')
+args = parser.parse_args()
+
+logging.disable(logging.CRITICAL)
+loaded = ROMS.load(args.rom)
+if loaded is None:
+    sys.exit(2)
+analysis = ANALYSES.get(*loaded, cache_dir=args.cache)
+for entry in args.entry:
+    bank, _, address = entry.rpartition(':')
+    analysis.block_at(int(address, 16), int(bank or '1', 16))
+heads = set(analysis.loop_heads())
+blocks = analysis.blocks
+for key in sorted(blocks):
+    block = blocks[key]
+    if args.bank is not None and block.bank != args.bank:
+        continue
+    print('{:02x}:{:04x}:{}'.format(block.bank, block.start,
+                                     '  ; loop' if key in heads else ''))
+    for instruction in block.instructions:
+        print('    {:04x}  {}'.format(instruction.address, instruction.text))
+    if block.successors:
+        print('    ; -> ' + ' '.join(
+            '{}:{:04x}'.format('??' if bank is None else '{:02x}'.format(bank),
+                               address)
+            for bank, address in block.successors))
+if not args.no_sweep:
+    # code only jumped to after a bank switch is not found by exploring,
+    # list those banks as a linear sweep from their start
+    reached = analysis.reached_banks()
+    banks = range(analysis.banks) if args.bank is None else [args.bank]
+    for bank in banks:
+        if bank in reached or not 0 <= bank < analysis.banks:
+            continue
+        print('{:02x}:{:04x}:  ; not reached, linear sweep (data is listed '
+              'as code)'.format(bank, 0 if bank == 0 else 0x4000))
+        for instruction in analysis.sweep(bank):
+            print('    {:04x}  {}'.format(instruction.address,
+                                          instruction.text))
+print('; {} instructions, {} blocks, {} loops, {} jumps into unknown banks, '
+      '{} into ram'.format(len(analysis.instructions), len(blocks), len(heads),
+                           len(analysis.far), len(analysis.external)))
+ANALYSES.save(analysis, args.cache)
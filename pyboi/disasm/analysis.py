@@ -0,0 +1,426 @@
+import bisect
+import logging
+import threading
+from .decoder import (decode, Instruction, JUMP, BRANCH, CALL, CALL_COND,
+                      BLOCK_ENDS, FALLS_THROUGH)
+from .codecache import cache_file, read_cache, write_cache
+log = logging.getLogger(name='analysis')
+
+# reset, interrupt vectors
+ENTRY_POINTS = (0x100, 0x40, 0x48, 0x50, 0x58, 0x60)
+BANK_SIZE = 0x4000
+
+
+class Block:
+    """
+    A basic block: straight line code entered only at start and left
+    only after its last instruction.
+
+    ...
+    Attributes
+    ----------
+    bank : int
+        rom bank, 0 for 0x0000 - 0x3fff
+    start : int
+        address of the first instruction
+    end : int
+        address after the last instruction
+    instructions : list of Instructions
+        the code
+    successors : list of tuples
+        (bank, address) the block may continue at, bank is None for
+        a jump from bank 0 into whatever bank is mapped at 0x4000
+    calls : list of tuples
+        (bank, address) of the routines called at the end
+    """
+    __slots__ = ('bank', 'start', 'end', 'instructions', 'successors',
+                 'calls')
+
+    def __init__(self, bank, start):
+        self.bank = bank
+        self.start = start
+        self.end = start
+        self.instructions = []
+        self.successors = []
+        self.calls = []
+
+    def flow(self):
+        """ Returns how the block is left, None if it runs into a leader. """
+        return self.instructions[-1].flow
+
+    def __repr__(self):
+        return '<Block({:02x}:{:04x}-{:04x})>'.format(self.bank, self.start,
+                                                     self.end)
+
+
+class RomAnalysis:
+    """
+    Static analysis of the code in a rom: the instructions reachable
+    from the entry points, split into basic blocks linked into a
+    control flow graph.
+
+    Code is found by following jumps and calls from the reset and
+    interrupt vectors. Where a jump from bank 0 lands in the
+    switchable bank can't be known statically (unless the rom has
+    just two banks), such code is added when asked for with the bank
+    that is mapped, and kept in the on disk cache for the next time.
+    Banks only entered that way have no known code until then,
+    sweep() lists them by decoding them from their start instead.
+
+    ...
+    Attributes
+    ----------
+    rom : bytes-like
+        the rom
+    rom_hash : string
+        sha1 of the rom, the key of the cache
+    banks : int
+        number of rom banks, from the header
+    instructions : dict
+        (bank, address) -> Instruction
+    leaders : set
+        (bank, address) starting a block
+    far : set
+        addresses 0x4000 - 0x7fff jumped/called to from bank 0
+    external : set
+        addresses outside the rom (ram, hram) jumped/called to
+    dirty : bool
+        True if code was found since the cache was read
+    """
+    def __init__(self, rom, header, rom_hash):
+        self.rom = rom
+        self.rom_hash = rom_hash
+        self.banks = max(2, min(header.rom_banks, len(rom) // BANK_SIZE))
+        self.instructions = {}
+        self.leaders = set()
+        self.far = set()
+        self.external = set()
+        self.dirty = False
+        self.blocks = None
+        self.starts = None
+        self.lock = threading.Lock()
+
+    def reader(self, bank):
+        """ Returns read(address) for the rom with bank mapped. """
+        rom = self.rom
+        offset = bank * BANK_SIZE - BANK_SIZE
+        size = len(rom)
+
+        def read(address):
+            if address < BANK_SIZE:
+                return rom[address]
+            address += offset
+            return rom[address] if address < size else 0xff
+        return read
+
+    def resolve(self, bank, address):
+        """
+        Returns the (bank, address) of a jump/call from bank to address,
+        None if it's outside the rom or in an unknown bank.
+        """
+        if address < BANK_SIZE:
+            return (0, address)
+        if address >= 0x8000:
+            return None
+        if bank != 0:
+            return (bank, address)
+        if self.banks == 2:
+            return (1, address)
+        return None
+
+    def explore(self, bank, address):
+        """
+        Decodes all the code reachable from address in bank. Returns
+        True if any new code was found.
+        """
+        start = self.resolve(bank, address)
+        if start is None:
+            return False
+        found = False
+        self.leaders.add(start)
+        work = [start]
+        instructions = self.instructions
+        while work:
+            bank, address = work.pop()
+            read = self.reader(bank)
+            while True:
+                key = (0 if address < BANK_SIZE else bank, address)
+                if key in instructions or address >= 0x8000:
+                    break
+                instruction = decode(read, address)
+                instructions[key] = instruction
+                found = True
+                target = instruction.target
+                if target is not None:
+                    location = self.resolve(key[0], target)
+                    if location is not None:
+                        self.leaders.add(location)
+                        work.append(location)
+                    elif target < 0x8000:
+                        self.far.add(target)
+                    else:
+                        self.external.add(target)
+                flow = instruction.flow
+                if flow in BLOCK_ENDS:
+                    if flow not in FALLS_THROUGH:
+                        break
+                    self.leaders.add((key[0], instruction.next_address()))
+                address = instruction.next_address()
+                if address >= BANK_SIZE and key[0] == 0:
+                    # ran off bank 0 into the switchable bank
+                    location = self.resolve(0, address)
+                    if location is None:
+                        self.far.add(address)
+                        break
+                    bank = location[0]
+                    read = self.reader(bank)
+        if found:
+            self.dirty = True
+            self.blocks = None
+        return found
+
+    def explore_entry_points(self):
+        """ Explores from the reset and interrupt vectors. """
+        for address in ENTRY_POINTS:
+            self.explore(0, address)
+
+    def sweep(self, bank):
+        """
+        Decodes bank linearly from its start, for banks no explored
+        code reached. Data is decoded as if it were code, so the
+        instructions are only listed, never added to the analysis.
+
+        ...
+        Parameters
+        ----------
+        bank : int
+            rom bank, 0 for 0x0000 - 0x3fff
+
+        Returns
+        -------
+        list of Instructions
+            the whole bank in address order
+        """
+        read = self.reader(bank)
+        first = 0 if bank == 0 else BANK_SIZE
+        instructions = []
+        address = first
+        while address < first + BANK_SIZE:
+            instruction = decode(read, address)
+            instructions.append(instruction)
+            address = instruction.next_address()
+        return instructions
+
+    def reached_banks(self):
+        """ Returns the set of banks with explored code. """
+        return {key[0] for key in self.instructions}
+
+    def build_blocks(self):
+        """ Splits the instructions into basic blocks. """
+        blocks = {}
+        starts = {}
+        block = None
+        previous = None
+        for key in sorted(self.instructions):
+            instruction = self.instructions[key]
+            if block is None or key in self.leaders or \
+                    previous.flow in BLOCK_ENDS or \
+                    key[0] != block.bank or block.end != key[1]:
+                if block is not None:
+                    self.link(block)
+                block = Block(key[0], key[1])
+                blocks[key] = block
+                starts.setdefault(key[0], []).append(key[1])
+            block.instructions.append(instruction)
+            block.end = key[1] + instruction.length
+            previous = instruction
+        if block is not None:
+            self.link(block)
+        self.blocks = blocks
+        self.starts = starts
+
+    def link(self, block):
+        """ Fills in the successors and calls of a finished block. """
+        last = block.instructions[-1]
+        flow = last.flow
+        bank = block.bank
+        if last.target is not None:
+            location = self.resolve(bank, last.target)
+            if location is None and last.target < 0x8000:
+                location = (None, last.target)
+            if location is not None:
+                if flow in (JUMP, BRANCH):
+                    block.successors.append(location)
+                elif flow in (CALL, CALL_COND):
+                    block.calls.append(location)
+        if flow in FALLS_THROUGH:
+            address = last.next_address()
+            location = self.resolve(bank, address)
+            if location is None and address < 0x8000:
+                location = (None, address)
+            if location is not None:
+                block.successors.append(location)
+
+    def block_at(self, address, bank=1):
+        """
+        Returns the block containing address, exploring from address
+        if it is not known code.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            0x0000 - 0x7fff
+        bank : int
+            the bank mapped at 0x4000 - 0x7fff
+
+        Returns
+        -------
+        Block
+            the block, None if address isn't in the rom
+        """
+        with self.lock:
+            key = self.resolve(bank or 1, address)
+            if key is None:
+                return None
+            if key not in self.instructions:
+                self.explore(*key)
+            if self.blocks is None:
+                self.build_blocks()
+            starts = self.starts.get(key[0], ())
+            index = bisect.bisect_right(starts, address) - 1
+            if index < 0:
+                return None
+            block = self.blocks[(key[0], starts[index])]
+            return block if address < block.end else None
+
+    def successors(self, address, bank=1):
+        """
+        Returns the (bank, address) the block at address may continue
+        at, jumps into the switchable bank resolved with bank.
+        """
+        block = self.block_at(address, bank)
+        if block is None:
+            return []
+        return [(bank if location[0] is None else location[0], location[1])
+                for location in block.successors]
+
+    def loop_heads(self):
+        """
+        Returns the sorted (bank, address) of the blocks targeted by
+        a back edge, found by a depth first search of the graph.
+        """
+        with self.lock:
+            if self.blocks is None:
+                self.build_blocks()
+            blocks = self.blocks
+        heads = set()
+        # 0 unvisited, 1 on the stack, 2 done
+        state = dict.fromkeys(blocks, 0)
+        for root in sorted(blocks):
+            if state[root]:
+                continue
+            state[root] = 1
+            stack = [(root, iter(blocks[root].successors))]
+            while stack:
+                key, edges = stack[-1]
+                for successor in edges:
+                    if successor not in blocks:
+                        continue
+                    if state[successor] == 1:
+                        heads.add(successor)
+                    elif state[successor] == 0:
+                        state[successor] = 1
+                        stack.append((successor,
+                                      iter(blocks[successor].successors)))
+                        break
+                else:
+                    state[key] = 2
+                    stack.pop()
+        return sorted(heads)
+
+    def to_cache(self):
+        """ Returns the analysis as marshal-able data. """
+        return {'rom': self.rom_hash,
+                'instructions': [(key[0], key[1], i.length, i.text, i.flow,
+                                  i.target)
+                                 for key, i in self.instructions.items()],
+                'leaders': list(self.leaders), 'far': list(self.far),
+                'external': list(self.external)}
+
+    def from_cache(self, data):
+        """ Restores an analysis from to_cache, False if out of date. """
+        if not isinstance(data, dict) or data.get('rom') != self.rom_hash:
+            return False
+        self.instructions = {
+            (bank, address): Instruction(address, length, text, flow, target)
+            for bank, address, length, text, flow, target
+            in data['instructions']}
+        self.leaders = set(data['leaders'])
+        self.far = set(data['far'])
+        self.external = set(data['external'])
+        self.blocks = None
+        self.dirty = False
+        return True
+
+
+class AnalysisRegistry:
+    """
+    Process wide cache of rom analyses, backed by files in cache_dir
+    keyed by the rom's sha1.
+
+    ...
+    Attributes
+    ----------
+    analyses : dict
+        sha1 -> RomAnalysis
+    """
+    def __init__(self):
+        self.analyses = {}
+        self.lock = threading.Lock()
+
+    def get(self, rom, header, rom_hash, cache_dir='cache'):
+        """
+        Returns the analysis of rom, read from the cache or analyzed
+        from the entry points.
+
+        ...
+        Parameters
+        ----------
+        rom : bytes-like
+            the rom, e.g. Memory.rom
+        header : RomHeader
+            its header
+        rom_hash : string
+            its sha1
+        cache_dir : string
+            directory of the analysis cache
+
+        Returns
+        -------
+        RomAnalysis
+            shared by every caller in the process
+        """
+        with self.lock:
+            analysis = self.analyses.get(rom_hash)
+            if analysis is not None:
+                return analysis
+            analysis = RomAnalysis(rom, header, rom_hash)
+            data = read_cache(cache_file(cache_dir, rom_hash, 'analysis'))
+            if data is None or not analysis.from_cache(data):
+                analysis.explore_entry_points()
+            self.analyses[rom_hash] = analysis
+            return analysis
+
+    def save(self, analysis, cache_dir='cache'):
+        """ Writes the analysis to the cache if anything was added. """
+        if not analysis.dirty:
+            return
+        with analysis.lock:
+            data = analysis.to_cache()
+            analysis.dirty = False
+        write_cache(cache_file(cache_dir, analysis.rom_hash, 'analysis'), data)
+
+
+# the registry shared by every caller in the process
+ANALYSES = AnalysisRegistry()
@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import marshal
+import os
+log = logging.getLogger(name='codecache')
+
+# sources of everything derived from the rom's code and cached,
+# relative to the pyboi package
+CODE_SOURCES = ('processor/z80.py', 'processor/idle.py',
+                'disasm/decoder.py', 'disasm/analysis.py')
+VERSION = None
+
+
+def code_version():
+    """
+    Returns the version of the emulator code the cache depends on,
+    a hash of its sources so no cache outlives a change to them.
+    """
+    global VERSION
+    if VERSION is None:
+        package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        digest = hashlib.sha1()
+        for source in CODE_SOURCES:
+            with open(os.path.join(package, source), 'rb') as f:
+                digest.update(f.read())
+        VERSION = digest.hexdigest()[:16]
+    return VERSION
+
+
+def cache_file(cache_dir, rom_hash, name):
+    """ Returns the path of cache file name of the rom. """
+    return os.path.join(cache_dir, rom_hash, name + '-' + code_version())
+
+
+def read_cache(path):
+    """ Returns the data marshaled to path, None if missing/corrupt. """
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return marshal.load(f)
+    except (EOFError, ValueError, TypeError):
+        log.error('corrupt cache file ' + path)
+        return None
+
+
+def write_cache(path, data):
+    """ Marshals data to path, replacing it in one step. """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # written aside and renamed, readers never see half a file
+    temp = path + '.' + str(os.getpid())
+    with open(temp, 'wb') as f:
+        marshal.dump(data, f)
+    os.replace(temp, path)
+
+
+class CodeCache:
+    """
+    Keeps what the cpu learns about a rom's code while running (the
+    busy wait loops it can skip) in cache_dir, so the next session
+    of the rom starts with it.
+
+    Entries are keyed by (rom bank, address) of rom code, so they
+    stay valid whatever bank is switched in later. Code in ram or
+    the bios can change or go away, it is never cached.
+
+    ...
+    Attributes
+    ----------
+    cache_dir : string
+        directory of the cache, one subdirectory per rom sha1
+    rom_hash : string
+        sha1 of the loaded rom, None if none
+    loaded : int
+        number of loops read from the cache
+    """
+    def __init__(self, cache_dir='cache'):
+        self.cache_dir = cache_dir
+        self.rom_hash = None
+        self.loaded = 0
+
+    def load(self, rom_hash, idle):
+        """
+        Fills idle (an IdleLoopDetector) with the loops cached for
+        the rom.
+        """
+        self.rom_hash = rom_hash
+        loops = read_cache(cache_file(self.cache_dir, rom_hash, 'loops'))
+        if not isinstance(loops, list):
+            loops = []
+        idle.add_cached_loops(loops)
+        self.loaded = len(loops)
+
+    def save(self, idle):
+        """ Adds the loops idle found to the cache, if there are new ones. """
+        if self.rom_hash is None:
+            return
+        loops = idle.cached_loops()
+        if len(loops) <= self.loaded:
+            return
+        path = cache_file(self.cache_dir, self.rom_hash, 'loops')
+        # merge with what other sessions saved meanwhile
+        cached = read_cache(path)
+        if isinstance(cached, list):
+            loops = list(set(loops) | set(map(tuple, cached)))
+        write_cache(path, sorted(loops, key=lambda loop: (
+            loop[0], loop[1], loop[2])))
+        self.loaded = len(loops)
@@ -0,0 +1,182 @@
+import logging
+log = logging.getLogger(name='decoder')
+
+R8 = ('b', 'c', 'd', 'e', 'h', 'l', '(hl)', 'a')
+RP = ('bc', 'de', 'hl', 'sp')
+RP2 = ('bc', 'de', 'hl', 'af')
+CC = ('nz', 'z', 'nc', 'c')
+ALU = ('add a,', 'adc a,', 'sub ', 'sbc a,', 'and ', 'xor ', 'or ', 'cp ')
+ROT = ('rlc', 'rrc', 'rl', 'rr', 'sla', 'sra', 'swap', 'srl')
+MISC = ('rlca', 'rrca', 'rla', 'rra', 'daa', 'cpl', 'scf', 'ccf')
+
+# how an instruction leaves, None if it just falls through
+JUMP = 'jump'           # jp nn, jr e
+BRANCH = 'branch'       # jp cc,nn, jr cc,e
+CALL = 'call'           # call nn, rst n
+CALL_COND = 'callcc'    # call cc,nn
+RET = 'ret'             # ret, reti
+RET_COND = 'retcc'      # ret cc
+INDIRECT = 'indirect'   # jp (hl)
+INVALID = 'invalid'     # undefined opcodes lock up the cpu
+
+# flows that end a basic block
+BLOCK_ENDS = (JUMP, BRANCH, CALL, CALL_COND, RET, RET_COND, INDIRECT, INVALID)
+# flows that may continue with the next instruction
+FALLS_THROUGH = (None, BRANCH, CALL, CALL_COND, RET_COND)
+
+
+class Instruction:
+    """
+    A decoded instruction.
+
+    ...
+    Attributes
+    ----------
+    address : int
+        where it is mapped
+    length : int
+        1 - 3 bytes
+    text : string
+        the mnemonic with its operands
+    flow : string
+        one of the flows above, None for straight line code
+    target : int
+        address jumped/called to, None if not known statically
+    """
+    __slots__ = ('address', 'length', 'text', 'flow', 'target')
+
+    def __init__(self, address, length, text, flow=None, target=None):
+        self.address = address
+        self.length = length
+        self.text = text
+        self.flow = flow
+        self.target = target
+
+    def next_address(self):
+        """ Returns the address of the following instruction. """
+        return (self.address + self.length) & 0xffff
+
+    def __repr__(self):
+        return '<Instruction({:04x}: {})>'.format(self.address, self.text)
+
+
+# opcode -> (format, length, flow), the format's {n} is the immediate
+# byte, {nn} the immediate word, {e} the relative jump target
+OPCODES = {}
+
+
+def build_tables():
+    """ Fills OPCODES from the regular layout of the opcode space. """
+    table = OPCODES
+    for y in range(8):
+        p, q = y >> 1, y & 1
+        # x = 0
+        base = y << 3
+        if y == 0:
+            table[0x00] = ('nop', 1, None)
+        elif y == 1:
+            table[0x08] = ('ld ({nn}),sp', 3, None)
+        elif y == 2:
+            table[0x10] = ('stop', 2, None)
+        elif y == 3:
+            table[0x18] = ('jr {e}', 2, JUMP)
+        else:
+            table[base] = ('jr ' + CC[y - 4] + ',{e}', 2, BRANCH)
+        if q == 0:
+            table[base | 1] = ('ld ' + RP[p] + ',{nn}', 3, None)
+            table[base | 2] = (('ld (bc),a', 'ld (de),a', 'ld (hl+),a',
+                                'ld (hl-),a')[p], 1, None)
+            table[base | 3] = ('inc ' + RP[p], 1, None)
+        else:
+            table[base | 1] = ('add hl,' + RP[p], 1, None)
+            table[base | 2] = (('ld a,(bc)', 'ld a,(de)', 'ld a,(hl+)',
+                                'ld a,(hl-)')[p], 1, None)
+            table[base | 3] = ('dec ' + RP[p], 1, None)
+        table[base | 4] = ('inc ' + R8[y], 1, None)
+        table[base | 5] = ('dec ' + R8[y], 1, None)
+        table[base | 6] = ('ld ' + R8[y] + ',{n}', 2, None)
+        table[base | 7] = (MISC[y], 1, None)
+        # x = 1, 2
+        for z in range(8):
+            table[0x40 | base | z] = ('ld ' + R8[y] + ',' + R8[z], 1, None)
+            table[0x80 | base | z] = (ALU[y] + R8[z], 1, None)
+        # x = 3
+        base |= 0xc0
+        if y < 4:
+            table[base] = ('ret ' + CC[y], 1, RET_COND)
+            table[base | 2] = ('jp ' + CC[y] + ',{nn}', 3, BRANCH)
+            table[base | 4] = ('call ' + CC[y] + ',{nn}', 3, CALL_COND)
+        if q == 0:
+            table[base | 1] = ('pop ' + RP2[p], 1, None)
+            table[base | 5] = ('push ' + RP2[p], 1, None)
+        table[base | 6] = (ALU[y] + '{n}', 2, None)
+        table[base | 7] = ('rst ${:02x}'.format(y << 3), 1, CALL)
+    table[0x76] = ('halt', 1, None)
+    table.update({
+        0xc9: ('ret', 1, RET), 0xd9: ('reti', 1, RET),
+        0xe9: ('jp (hl)', 1, INDIRECT), 0xf9: ('ld sp,hl', 1, None),
+        0xc3: ('jp {nn}', 3, JUMP), 0xcd: ('call {nn}', 3, CALL),
+        0xcb: ('', 2, None), 0xf3: ('di', 1, None), 0xfb: ('ei', 1, None),
+        0xe0: ('ldh ({n}),a', 2, None), 0xf0: ('ldh a,({n})', 2, None),
+        0xe8: ('add sp,{s}', 2, None), 0xf8: ('ld hl,sp{s}', 2, None),
+        0xe2: ('ld (c),a', 1, None), 0xf2: ('ld a,(c)', 1, None),
+        0xea: ('ld ({nn}),a', 3, None), 0xfa: ('ld a,({nn})', 3, None),
+    })
+    for opcode in (0xd3, 0xdb, 0xdd, 0xe3, 0xe4, 0xeb, 0xec, 0xed, 0xf4,
+                   0xfc, 0xfd):
+        table[opcode] = ('db ${:02x}'.format(opcode), 1, INVALID)
+
+
+build_tables()
+
+
+def cb_text(opcode):
+    """ Returns the mnemonic of the 0xcb prefixed opcode. """
+    x, y, z = opcode >> 6, (opcode >> 3) & 7, opcode & 7
+    if x == 0:
+        return ROT[y] + ' ' + R8[z]
+    return ('bit', 'res', 'set')[x - 1] + ' {},'.format(y) + R8[z]
+
+
+def decode(read, address):
+    """
+    Decodes the instruction at address.
+
+    ...
+    Parameters
+    ----------
+    read : function
+        read(address) -> byte, e.g. Memory.read
+    address : int
+        where the instruction starts
+
+    Returns
+    -------
+    Instruction
+        the decoded instruction
+    """
+    opcode = read(address)
+    fmt, length, flow = OPCODES[opcode]
+    target = None
+    if opcode == 0xcb:
+        return Instruction(address, 2, cb_text(read((address + 1) & 0xffff)))
+    if length == 1:
+        if flow == CALL:
+            # rst
+            target = opcode & 0x38
+        return Instruction(address, 1, fmt, flow, target)
+    n = read((address + 1) & 0xffff)
+    if length == 2:
+        signed = n - 0x100 if n & 0x80 else n
+        if flow is not None:
+            # jr, relative to the next instruction
+            target = (address + 2 + signed) & 0xffff
+        text = fmt.format(n='${:02x}'.format(n), e='${:04x}'.format(
+            target if target is not None else 0),
+            s='{:+d}'.format(signed))
+        return Instruction(address, 2, text, flow, target)
+    nn = (read((address + 2) & 0xffff) << 8) | n
+    if flow is not None:
+        target = nn
+    return Instruction(address, 3, fmt.format(nn='${:04x}'.format(nn)),
+                       flow, target)
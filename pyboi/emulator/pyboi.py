@@ -1,9 +1,15 @@
 from ..processor.z80 import Z80
 from ..memory.mem import Memory
 from ..gpu.gpu import GPU
+from ..profiler.profiler import Profiler
+from ..profiler.memprofiler import MemoryProfiler
+from ..replay.movie import Recorder
+from ..disasm.codecache import CodeCache
+from .snapshot import Snapshot
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..base import Base
+import os.path
 import logging
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(name='pyboi')
@@ -21,16 +27,84 @@ class Pyboi:
     gpu : GPU class
         renders graphics
     engine : SQLAlchemy engine
-        engine for saving the game states in SQLAlchemy's database
+        engine for saving the game states in SQLAlchemy's database,
+        None until a state is saved
+    profiler : Profiler class
+        cpu profiler, None unless profiling was started
+    mem_profiler : MemoryProfiler class
+        memory access counters, None unless profiling was started
+    recorder : Recorder class
+        records the input into a movie, None unless recording
+    code_cache : CodeCache class
+        what the cpu learned about the rom's code, kept on disk
+    booted : string
+        how the rom was booted, 'state' (the post-bios state set
+        directly) or 'bios', None if it wasn't
+    boot_clock : int
+        timer clock when the boot was done, 0 if not booted
 
     """
-    def __init__(self):
-        self.mem = Memory()
-        self.z80 = Z80(self.mem)
-        self.gpu = GPU(self.mem)
-        self.engine = create_engine('sqlite:///pyboi_saves.db')
-        Base.metadata.create_all(self.engine)
+    def __init__(self, snapshot=None):
+        """
+        Parameters
+        ----------
+        snapshot : Snapshot
+            start as a copy of the snapshot, None for a cold start
+        """
+        if snapshot is None:
+            self.mem = Memory()
+            self.z80 = Z80(self.mem)
+            self.gpu = GPU(self.mem)
+            self.engine = None
+            self.booted = None
+            self.boot_clock = 0
+        else:
+            self.mem, self.z80, self.gpu = snapshot.copy()
+            self.engine = snapshot.engine
+            self.booted = snapshot.booted
+            self.boot_clock = snapshot.boot_clock
+        self.profiler = None
+        self.mem_profiler = None
+        self.recorder = None
+        self.code_cache = None
+        self.z80.idle.set_budget(self.idle_budget)
     
+    def idle_budget(self):
+        """
+        Returns the number of cycles the cpu may skip while idling,
+        up to the next GPU mode change or timer overflow. Queued input
+        waits for the next instruction after the skip, so runs don't
+        depend on when the host pushed it.
+        """
+        return min(self.gpu.cycles_to_next_mode(),
+                   self.mem.timer.cycles_to_event())
+
+    def press(self, button, cycle=None):
+        """
+        Presses a button, safe to call from any thread.
+
+        Parameters
+        ----------
+        button : string
+            right, left, up, down, a, b, select or start
+        cycle : int
+            timer clock to press at, None for the next instruction
+        """
+        self.mem.joypad.push(button, True, cycle)
+
+    def release(self, button, cycle=None):
+        """
+        Releases a button, safe to call from any thread.
+
+        Parameters
+        ----------
+        button : string
+            right, left, up, down, a, b, select or start
+        cycle : int
+            timer clock to release at, None for the next instruction
+        """
+        self.mem.joypad.push(button, False, cycle)
+
     def save(self, save_name):
         """
         Save the current pyboi state.
@@ -41,71 +115,277 @@ class Pyboi:
             name to save the current state as
 
         """
-        Session = sessionmaker(bind=self.engine)
+        Session = sessionmaker(bind=self.get_engine())
         session = Session()
         self.z80.save_state(save_name, session)
 
-    def load_rom(self, rom):
+    def get_engine(self):
+        """
+        Returns the engine of the saved states, pyboi_saves.db
+        is only created when first needed.
+        """
+        if self.engine is None:
+            self.engine = create_engine('sqlite:///pyboi_saves.db')
+            Base.metadata.create_all(self.engine)
+        return self.engine
+
+    def start_profiling(self):
         """
-        Load a rom into the GB.
+        Start recording per opcode/address/bank execution stats.
+        Requires a rom to be loaded.
+
+        Returns
+        -------
+        Profiler object collecting the stats
+        """
+        if self.profiler is None:
+            self.profiler = Profiler()
+            self.profiler.attach(self.z80)
+        return self.profiler
+
+    def stop_profiling(self, top=10):
+        """
+        Stop profiling, the cpu goes back to running unwrapped.
+
+        Parameters
+        ----------
+        top : int
+            number of entries per section of the report
+
+        Returns
+        -------
+        string
+            hot-spot report of the profiled run
+        """
+        if self.profiler is None:
+            return ''
+        self.profiler.detach()
+        report = self.profiler.report(top)
+        self.profiler = None
+        return report
+
+    def start_memory_profiling(self):
+        """
+        Start counting memory accesses per address.
+
+        Returns
+        -------
+        MemoryProfiler object collecting the counts
+        """
+        if self.mem_profiler is None:
+            self.mem_profiler = MemoryProfiler()
+            self.mem_profiler.attach(self.mem)
+        return self.mem_profiler
+
+    def stop_memory_profiling(self, top=10):
+        """
+        Stop counting memory accesses.
+
+        Parameters
+        ----------
+        top : int
+            number of IO registers listed in the summary
+
+        Returns
+        -------
+        string
+            summary table of the accesses per region/IO register
+        """
+        if self.mem_profiler is None:
+            return ''
+        self.mem_profiler.detach()
+        summary = self.mem_profiler.summary(top)
+        self.mem_profiler = None
+        return summary
+
+    def start_recording(self, interval=60):
+        """
+        Start recording the input into a movie, must be called
+        right after the rom is loaded (and booted, the movie replays
+        with the same boot).
+
+        Parameters
+        ----------
+        interval : int
+            frames between frame hash checkpoints
+
+        Returns
+        -------
+        Recorder object, None if the emulator already ran
+        """
+        if self.mem.timer.clock != self.boot_clock:
+            log.error('recording has to start at power on')
+            return None
+        if self.recorder is None:
+            self.recorder = Recorder(self, interval)
+        return self.recorder
+
+    def stop_recording(self, path=None):
+        """
+        Stop recording.
+
+        Parameters
+        ----------
+        path : string
+            file to save the movie to, None to not save it
+
+        Returns
+        -------
+        Movie object with the recording, None if not recording
+        """
+        if self.recorder is None:
+            return None
+        self.recorder.detach()
+        movie = self.recorder.movie
+        self.recorder = None
+        if path is not None:
+            movie.save(path)
+        return movie
+
+    def snapshot(self, frames=0):
+        """
+        Returns a Snapshot of the machine, new Pyboi(snapshot)
+        sessions start from. Battery ram is copied without its file.
+
+        Parameters
+        ----------
+        frames : int
+            frames run so far, kept with the snapshot
+        """
+        return Snapshot(self, frames)
+
+    def load_rom(self, rom, user='default', save_dir=None,
+                 cache_dir=None):
+        """
+        Load a rom into the GB. Nothing is kept on disk unless asked
+        for: with save_dir, battery backed ram is mapped from
+        save_dir/<rom sha1>/<user>.sav, with cache_dir, what earlier
+        sessions learned about the rom's code is read from
+        cache_dir/<rom sha1>/
 
         Parameters
         ----------
         rom : path (string)
             path to the rom file to load
+        user : string
+            whose in-game saves to use
+        save_dir : path (string)
+            directory holding the .sav files, None to keep the
+            battery ram in memory only
+        cache_dir : path (string)
+            directory of the code cache, None to not use it
 
         """
         self.mem.load_rom(rom)
+        self.open_rom_files(user, save_dir, cache_dir)
 
-    def boot(self):
+    def open_rom_files(self, user='default', save_dir=None,
+                       cache_dir=None):
         """
-        Runs the bios and stops after completed.
-        Requires a rom to be loaded.
+        Maps the battery ram and reads the code cache of the loaded
+        rom, see load_rom.
         """
-        self.mem.set_bios_mode(True)
+        path = None
+        if save_dir is not None:
+            path = os.path.join(save_dir, self.mem.rom_hash, user + '.sav')
+        self.mem.load_save(path)
+        if cache_dir is not None:
+            self.code_cache = CodeCache(cache_dir)
+            self.code_cache.load(self.mem.rom_hash, self.z80.idle)
+
+    def close(self):
+        """
+        Flushes the battery ram and the code cache to disk, call
+        when done playing.
+        """
+        self.mem.close_save()
+        if self.code_cache is not None:
+            self.code_cache.save(self.z80.idle)
+
+    def boot(self, bios=False):
+        """
+        Boots the loaded rom, the cpu stops at 0x100 where the game
+        starts. Call right after loading the rom.
+
+        Parameters
+        ----------
+        bios : bool
+            run the bios from roms/bios.gb (seconds), by default the
+            state it leaves is set directly
+        """
+        if not bios:
+            self.mem.init_post_boot()
+            self.z80.init_post_boot()
+            self.booted = 'state'
+            self.boot_clock = self.mem.timer.clock
+            return
+        self.init_boot()
         for _ in range(9000000):
-            cycles = self.z80.execute_boot_opcode()
-            #self.gpu.update_graphics(cycles)
+            if self.z80.pc == 0x100:
+                break
+            cycles = self.z80.execute_opcode()
+            self.gpu.update_graphics(cycles)
+        # the bios unmaps itself writing 0xff50
         self.mem.set_bios_mode(False)
+        self.booted = 'bios'
+        self.boot_clock = self.mem.timer.clock
 
     def init_boot(self):
         """
-        Sets up to run the bootstrap "bios".
+        Sets up to run the bootstrap "bios", it is mapped over the
+        rom until it is done.
         """
         self.z80.init_boot()
+        self.mem.set_bios_mode(True)
 
     def get_boot_frame(self):
         """
-        Runs enough clock cycles to get one frame.
+        Runs enough clock cycles to get one frame, of the bios while
+        it runs (see init_boot) and then of the game.
         ...
         Returns
         -------
         bytearray object representing the frame
         """
-        self.mem.set_bios_mode(True)
-        count = 0
-        while count < 70224:
-            cycles = self.z80.execute_boot_opcode()
-            self.gpu.update_graphics(cycles)
-            count += cycles
-        return self.gpu.get_frame_buffer()
-        self.mem.set_bios_mode(False)
+        return self.get_frame()
 
-    def get_frame(self):
+    def get_frame(self, fmt=None):
         """
         Runs enough clock cycles to get one frame.
         ...
+        Parameters
+        ----------
+        fmt : string
+            output format, 'indexed', 'packed', 'rgb' or 'rgba',
+            None for the gpu's screen buffer
+
         Returns
         -------
-        bytearray object representing the frame
+        bytearray object representing the frame, a memoryview of
+        the converted frame if fmt is given
         """
         count = 0
         while count < 70224:
             cycles = self.z80.execute_opcode()
             self.gpu.update_graphics(cycles)
             count += cycles
+        self.mem.apu.render()
+        if self.recorder is not None:
+            self.recorder.end_frame()
+        if fmt is not None:
+            return self.gpu.get_frame_as(fmt)
         return self.gpu.get_frame_buffer()
 
+    def get_audio(self):
+        """
+        Returns the sound rendered since the last call.
+        ...
+        Returns
+        -------
+        bytes of interleaved stereo signed 16 bit samples at 48kHz
+        """
+        return self.mem.apu.read_samples()
+
     def run(self):
         """ Start execution of the emulator. """
         for _ in range(95200828):
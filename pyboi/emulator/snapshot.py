@@ -0,0 +1,121 @@
+import copy
+import threading
+import logging
+from ..memory.cartridge import ROMS
+log = logging.getLogger(name='snapshot')
+
+
+def copy_machine(mem, z80, gpu):
+    """
+    Returns deep copies of (mem, z80, gpu). The rom and its bank
+    views are shared, they are read only. Battery ram is copied
+    without its .sav file.
+    """
+    memo = {id(mem.rom): mem.rom}
+    rom_bank = getattr(mem.membanks.bank, 'rom_bank', None)
+    if rom_bank is not None:
+        memo[id(rom_bank)] = rom_bank
+    if mem.save is not None:
+        memo[id(mem.save)] = None
+    return copy.deepcopy((mem, z80, gpu), memo)
+
+
+class Snapshot:
+    """
+    A frozen copy of a running machine. It is never run itself,
+    every session started from it gets its own copy.
+
+    ...
+    Attributes
+    ----------
+    rom_hash : string
+        sha1 of the rom loaded
+    frames : int
+        frames run before the snapshot was taken
+    engine : SQLAlchemy engine
+        shared with the sessions started from the snapshot,
+        None if the machine never saved a state
+    booted : string
+        how the machine was booted, see Pyboi
+    boot_clock : int
+        timer clock when the boot was done
+    """
+    def __init__(self, gb, frames=0):
+        self.rom_hash = gb.mem.rom_hash
+        self.frames = frames
+        self.engine = gb.engine
+        self.booted = gb.booted
+        self.boot_clock = gb.boot_clock
+        self.machine = copy_machine(gb.mem, gb.z80, gb.gpu)
+
+    def copy(self):
+        """ Returns a new (mem, z80, gpu) in the snapshot's state. """
+        return copy_machine(*self.machine)
+
+
+class SnapshotPool:
+    """
+    Boots each rom once and keeps it as a Snapshot, new sessions
+    of the rom are copies of it instead of a cold start.
+
+    Copies are made in process, sessions run in the server's event
+    loop. Roms with battery ram are snapshotted right after boot, their
+    code may read the player's save while starting.
+
+    ...
+    Attributes
+    ----------
+    frames : int
+        frames to run a rom before taking its snapshot
+    snapshots : dict
+        (rom sha1, frames) -> Snapshot
+    """
+    def __init__(self, frames=0):
+        self.frames = frames
+        self.snapshots = {}
+        self.lock = threading.Lock()
+
+    def snapshot(self, rom, frames=None):
+        """
+        Returns the snapshot of rom after frames frames (the pool's
+        default if None), booting the rom if there is none yet.
+        None if the rom can't be loaded.
+        """
+        # imported here, the emulator imports this module
+        from .pyboi import Pyboi
+        loaded = ROMS.load(rom)
+        if loaded is None:
+            return None
+        _, header, rom_hash = loaded
+        if frames is None:
+            frames = self.frames
+        if header.has_battery():
+            frames = 0
+        key = (rom_hash, frames)
+        with self.lock:
+            snapshot = self.snapshots.get(key)
+            if snapshot is None:
+                gb = Pyboi()
+                gb.mem.load_rom(rom)
+                gb.boot()
+                for _ in range(frames):
+                    gb.get_frame()
+                snapshot = Snapshot(gb, frames)
+                self.snapshots[key] = snapshot
+                log.info('SNAPSHOT: {} after {} frames'.format(rom, frames))
+            return snapshot
+
+    def session(self, rom, user='default', save_dir=None,
+                cache_dir=None, frames=None):
+        """
+        Returns a new Pyboi running rom, copied from its snapshot.
+        The user's battery ram and the code cache are opened as
+        Pyboi.load_rom does. None if the rom can't be loaded.
+        """
+        from .pyboi import Pyboi
+        snapshot = self.snapshot(rom, frames)
+        if snapshot is None:
+            return None
+        gb = Pyboi(snapshot)
+        gb.open_rom_files(user, save_dir, cache_dir)
+        return gb
@@ -0,0 +1,124 @@
+import numpy as np
+import logging
+from .bus import FrameBus
+log = logging.getLogger(name='broadcast')
+
+FRAME_SIZE = 23040
+# first byte of a delta message, then per changed row: the row number
+# and its 160 pixels
+DELTA = b'd'
+AUDIO = b'pcm'
+
+
+class EncodedFrame:
+    """
+    A frame encoded for the spectators, once for all of them.
+
+    ...
+    Attributes
+    ----------
+    number : int
+        number of the frame on the source bus
+    key : bytes
+        the whole frame (the raw 160x144 shades players get too)
+    delta : bytes
+        the rows that changed since the previous frame, b'' if
+        none did, None if there is no previous frame or the delta
+        would not be smaller than the key frame
+    audio : bytes
+        the frame's sound as an audio message
+    """
+    __slots__ = ('number', 'key', 'delta', 'audio')
+
+    def __init__(self, number, key, delta, audio):
+        self.number = number
+        self.key = key
+        self.delta = delta
+        self.audio = audio
+
+    def message(self, last):
+        """
+        Returns what to send a spectator whose last frame was number
+        last: the delta if that was the previous frame, else the key
+        frame. None if nothing changed.
+        """
+        if last == self.number - 1 and self.delta is not None:
+            return self.delta or None
+        return self.key
+
+
+def encode_delta(previous, video):
+    """
+    Returns the delta message from previous to video (both 160x144
+    shade bytes), None if it would not be smaller than video.
+    """
+    old = np.frombuffer(previous, dtype=np.uint8).reshape(144, 160)
+    new = np.frombuffer(video, dtype=np.uint8).reshape(144, 160)
+    rows = np.flatnonzero((old != new).any(axis=1))
+    if len(rows) == 0:
+        return b''
+    if len(rows) * 161 + 1 >= FRAME_SIZE:
+        return None
+    out = np.empty((len(rows), 161), dtype=np.uint8)
+    out[:, 0] = rows
+    out[:, 1:] = new[rows]
+    return DELTA + out.tobytes()
+
+
+class Broadcast:
+    """
+    Fans a session's frames out to spectators. Each frame is encoded
+    once and every spectator is sent the same bytes objects.
+
+    Frames are encoded as they are published, in the emulation
+    loop, so the spectators get each one before the next is run.
+    Nothing is encoded while no one is watching.
+    Spectators subscribe with the 'latest' policy: one that falls
+    behind is not buffered for, it skips to the newest frame and is
+    sent that frame's key frame, after which it gets deltas again.
+
+    ...
+    Attributes
+    ----------
+    spectators : FrameBus
+        carries the EncodedFrames to the spectators
+    previous : bytes
+        the last frame encoded
+    """
+    def __init__(self, bus):
+        self.spectators = FrameBus()
+        self.previous = None
+        bus.attach(self)
+
+    def encode(self, frame):
+        """ Returns the EncodedFrame of a Frame. """
+        delta = None
+        if self.previous is not None:
+            delta = encode_delta(self.previous, frame.video)
+        self.previous = frame.video
+        return EncodedFrame(frame.number, frame.video, delta,
+                            AUDIO + frame.audio)
+
+    def offer(self, frame):
+        """ Encodes and forwards a frame, called by the session's bus. """
+        if not self.spectators.subscriptions:
+            # the next spectator starts with a key frame anyway
+            self.previous = None
+            return
+        self.spectators.forward(self.encode(frame))
+
+    def close(self):
+        """ Ends the broadcast with the session, spectators get None. """
+        self.spectators.close()
+
+    def watch(self):
+        """ Returns a new spectator's Subscription. """
+        return self.spectators.subscribe('latest')
+
+    def leave(self, subscription):
+        """ Removes a spectator. """
+        self.spectators.unsubscribe(subscription)
+
+    def count(self):
+        """ Returns the number of spectators. """
+        return len(self.spectators.subscriptions)
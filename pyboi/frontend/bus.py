@@ -0,0 +1,230 @@
+import asyncio
+import threading
+from collections import deque
+import logging
+log = logging.getLogger(name='bus')
+
+POLICIES = ('every', 'latest', 'nth')
+
+
+class Frame:
+    """
+    A finished frame as published on the bus. The same object goes
+    to every subscriber, it must not be modified.
+
+    ...
+    Attributes
+    ----------
+    number : int
+        frames published before this one
+    video : bytes
+        the screen, 160x144 shades 0-3
+    audio : bytes
+        the frame's sound, interleaved stereo 16 bit at 48kHz
+    """
+    __slots__ = ('number', 'video', 'audio')
+
+    def __init__(self, number, video, audio):
+        self.number = number
+        self.video = video
+        self.audio = audio
+
+
+class Subscription:
+    """
+    A consumer's queue of frames from a FrameBus.
+
+    every : every frame, queued
+    latest : only the newest frame, older ones are dropped
+    nth : every nth frame (number % n == 0), queued
+
+    Queues are unbounded unless limit is given, then the oldest
+    frames are dropped once full. Frames are taken with get()
+    (blocking), poll() or, in asyncio, await next_frame().
+
+    ...
+    Attributes
+    ----------
+    policy : string
+        one of POLICIES
+    n : int
+        frame interval of the nth policy
+    frames : deque
+        the frames waiting to be taken
+    dropped : int
+        frames dropped by the policy or limit
+    closed : bool
+        True once unsubscribed or the bus closed
+    """
+    def __init__(self, policy='every', n=1, limit=None):
+        if policy not in POLICIES:
+            log.error('unknown policy ' + str(policy))
+            policy = 'every'
+        self.policy = policy
+        self.n = max(1, n)
+        self.frames = deque(maxlen=1 if policy == 'latest' else limit)
+        self.dropped = 0
+        self.closed = False
+        self.ready = threading.Condition()
+        # (loop, asyncio.Event) of a coroutine waiting in next_frame
+        self.waiter = None
+
+    def offer(self, frame):
+        """ Queues frame if the policy wants it, called by the bus. """
+        if self.policy == 'nth' and frame.number % self.n:
+            return
+        with self.ready:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+            self.ready.notify()
+            self.wake()
+
+    def wake(self):
+        """ Wakes a coroutine in next_frame, from any thread. """
+        if self.waiter is not None:
+            loop, event = self.waiter
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            # set now from the loop itself, so the consumer runs before
+            # the emulation loop's next frame
+            if running is loop:
+                event.set()
+            else:
+                loop.call_soon_threadsafe(event.set)
+
+    def poll(self):
+        """ Returns the next frame, None if there is none yet. """
+        with self.ready:
+            return self.frames.popleft() if self.frames else None
+
+    def get(self, timeout=None):
+        """
+        Returns the next frame, waiting up to timeout seconds (forever
+        if None). None on timeout or once closed and empty.
+        """
+        with self.ready:
+            self.ready.wait_for(lambda: self.frames or self.closed, timeout)
+            return self.frames.popleft() if self.frames else None
+
+    async def next_frame(self):
+        """ Returns the next frame, None once closed and empty. """
+        event = asyncio.Event()
+        while True:
+            with self.ready:
+                if self.frames:
+                    self.waiter = None
+                    return self.frames.popleft()
+                if self.closed:
+                    self.waiter = None
+                    return None
+                event.clear()
+                self.waiter = (asyncio.get_running_loop(), event)
+            await event.wait()
+
+    def close(self):
+        """ Stops the subscription, waiting consumers get None. """
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+            self.wake()
+
+    def __iter__(self):
+        """ Yields frames until closed. """
+        while True:
+            frame = self.get()
+            if frame is None:
+                return
+            yield frame
+
+
+class FrameBus:
+    """
+    Publishes frames from one emulation loop to any number of
+    subscribers, each with its own policy. A frame is copied once,
+    when published, every subscriber gets the same Frame.
+
+    ...
+    Attributes
+    ----------
+    subscriptions : list of Subscriptions
+        the current subscribers
+    published : int
+        number of frames published
+    """
+    def __init__(self):
+        self.subscriptions = []
+        self.published = 0
+        self.lock = threading.Lock()
+
+    def subscribe(self, policy='every', n=1, limit=None):
+        """
+        Returns a new Subscription, see Subscription for the policies.
+
+        ...
+        Parameters
+        ----------
+        policy : string
+            'every', 'latest' or 'nth'
+        n : int
+            for 'nth', take every nth frame
+        limit : int
+            most frames queued, None for no limit
+        """
+        return self.attach(Subscription(policy, n, limit))
+
+    def attach(self, subscriber):
+        """
+        Adds a subscriber, anything with offer(frame) and close(),
+        returns it. offer is called in the publishing thread.
+        """
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscription):
+        """ Removes and closes subscription. """
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions
+                                  if s is not subscription]
+        subscription.close()
+
+    def publish(self, video, audio=b''):
+        """
+        Publishes a frame to the subscribers.
+
+        ...
+        Parameters
+        ----------
+        video : bytes-like
+            the screen, copied as the gpu reuses its buffer
+        audio : bytes
+            the frame's sound
+
+        Returns
+        -------
+        Frame
+            the frame published
+        """
+        return self.forward(Frame(self.published, bytes(video), audio))
+
+    def forward(self, frame):
+        """
+        Offers an already made frame (anything with a number, e.g. an
+        encoded frame) to the subscribers, returns it.
+        """
+        self.published += 1
+        # the list is replaced, never changed, when subscribing
+        for subscription in self.subscriptions:
+            subscription.offer(frame)
+        return frame
+
+    def close(self):
+        """ Closes every subscription, the loop is done. """
+        with self.lock:
+            subscriptions = self.subscriptions
+            self.subscriptions = []
+        for subscription in subscriptions:
+            subscription.close()
@@ -0,0 +1,97 @@
+import asyncio
+import time
+import logging
+from .bus import FrameBus
+log = logging.getLogger(name='loop')
+
+# frames per second of the gameboy, 70224 cycles at 4.19MHz
+FPS = 4194304 / 70224
+# further behind than this the loop stops catching up
+MAX_LAG = 0.25
+
+
+class EmulatorLoop:
+    """
+    The one loop running a Pyboi. Every finished frame is published
+    with its sound on the bus, for any number of frontends (players,
+    spectators, recorders, thumbnails...) to subscribe to.
+
+    ...
+    Attributes
+    ----------
+    gb : Pyboi
+        the emulator, only run from this loop
+    bus : FrameBus
+        where the frames are published
+    fps : float
+        frames per second to run at, None for as fast as possible
+    paused : bool
+        while True no frames are run
+    running : bool
+        False once stop() was called
+    """
+    def __init__(self, gb, bus=None, fps=FPS):
+        self.gb = gb
+        self.bus = bus if bus is not None else FrameBus()
+        self.fps = fps
+        self.paused = False
+        self.running = True
+        self.deadline = None
+
+    def step(self):
+        """ Runs and publishes one frame, returns the Frame. """
+        video = self.gb.get_frame()
+        return self.bus.publish(video, self.gb.get_audio())
+
+    def delay(self):
+        """
+        Returns the seconds to wait before the next frame, keeping
+        the loop at fps.
+        """
+        if self.fps is None:
+            return 0
+        now = time.monotonic()
+        if self.deadline is None or now - self.deadline > MAX_LAG:
+            self.deadline = now
+        self.deadline += 1 / self.fps
+        return max(0, self.deadline - now)
+
+    def run(self, frames=None):
+        """
+        Runs until stop() or frames frames, in the calling thread.
+        Closes the bus when done.
+        """
+        count = 0
+        try:
+            while self.running and (frames is None or count < frames):
+                if self.paused:
+                    self.deadline = None
+                    time.sleep(1 / FPS)
+                    continue
+                self.step()
+                count += 1
+                time.sleep(self.delay())
+        finally:
+            self.bus.close()
+        return count
+
+    async def run_async(self, frames=None):
+        """ Same as run, as a coroutine yielding between frames. """
+        count = 0
+        try:
+            while self.running and (frames is None or count < frames):
+                if self.paused:
+                    self.deadline = None
+                    await asyncio.sleep(1 / FPS)
+                    continue
+                self.step()
+                count += 1
+                # lets the consumers and the input run
+                await asyncio.sleep(self.delay())
+        finally:
+            self.bus.close()
+        return count
+
+    def stop(self):
+        """ Ends run/run_async after the current frame. """
+        self.running = False
@@ -0,0 +1,116 @@
+import sys
+import numpy as np
+import logging
+log = logging.getLogger(name='terminal')
+
+# braille cell pattern (dots as the unicode braille bits) -> character
+BRAILLE = tuple(chr(0x2800 + dots) for dots in range(256))
+# braille bit of each pixel in a 2x4 cell, [row][col]
+BRAILLE_DOTS = np.array([[0x01, 0x08],
+                         [0x02, 0x10],
+                         [0x04, 0x20],
+                         [0x40, 0x80]], dtype=np.uint8)
+
+# 256 color codes for shades 0 (white) to 3 (black)
+SHADE_COLORS = (231, 248, 240, 16)
+# top shade * 4 + bottom shade -> upper half block in those colors
+HALF_BLOCKS = tuple('\x1b[38;5;%d;48;5;%dm▀' % (SHADE_COLORS[top],
+                                                     SHADE_COLORS[bottom])
+                    for top in range(4) for bottom in range(4))
+
+
+class TerminalRenderer:
+    """
+    Draws frames to an ANSI terminal, only the cells that changed since
+    the previous frame are rewritten (one cursor move per changed run
+    in a row).
+
+    braille mode draws 2x4 pixels per cell (80x36 cells), pixels with a
+    shade >= threshold are set. half mode draws 1x2 pixels per cell
+    (160x72 cells) as colored upper half blocks with the 4 shades.
+
+    ...
+    Attributes
+    ----------
+    mode : string
+        'braille' or 'half'
+    threshold : int
+        lowest shade drawn in braille mode
+    out : file
+        the terminal to write to
+    cells : ndarray
+        the cells of the last frame drawn, None before the first
+    """
+    def __init__(self, mode='braille', threshold=1, out=sys.stdout):
+        if mode not in ('braille', 'half'):
+            log.error('unknown terminal mode ' + str(mode))
+            mode = 'braille'
+        self.mode = mode
+        self.threshold = threshold
+        self.out = out
+        self.cells = None
+        self.chars = BRAILLE if mode == 'braille' else HALF_BLOCKS
+
+    def frame_cells(self, frame):
+        """
+        Returns the cells for frame (160x144 shades) as a 2d array
+        of indices into self.chars.
+        """
+        pixels = np.frombuffer(frame, dtype=np.uint8).reshape(144, 160)
+        if self.mode == 'braille':
+            lit = (pixels >= self.threshold).view(np.uint8)
+            cells = lit.reshape(36, 4, 80, 2) * BRAILLE_DOTS[:, None, :]
+            return cells.sum(axis=(1, 3), dtype=np.uint8)
+        halves = pixels.reshape(72, 2, 160)
+        return halves[:, 0, :] * 4 + halves[:, 1, :]
+
+    def render(self, frame):
+        """
+        Returns the ANSI output updating the terminal from the last
+        frame drawn to frame.
+
+        ...
+        Parameters
+        ----------
+        frame : bytes-like
+            160x144 shades (0-3)
+
+        Returns
+        -------
+        string
+            escape sequences and characters to write
+        """
+        cells = self.frame_cells(frame)
+        updates = []
+        if self.cells is None:
+            # clear once and hide the cursor
+            updates.append('\x1b[2J\x1b[?25l')
+            changed = np.ones(cells.shape, dtype=bool)
+        else:
+            changed = cells != self.cells
+        self.cells = cells
+        chars = self.chars
+        for row in np.flatnonzero(changed.any(axis=1)).tolist():
+            cols = np.flatnonzero(changed[row])
+            first = int(cols[0])
+            last = int(cols[-1])
+            updates.append('\x1b[%d;%dH' % (row + 1, first + 1))
+            updates.append(''.join([chars[cell] for cell in
+                                    cells[row, first:last + 1].tolist()]))
+        if updates and self.mode == 'half':
+            updates.append('\x1b[0m')
+        return ''.join(updates)
+
+    def draw(self, frame):
+        """ Writes the changes for frame to the terminal. """
+        updates = self.render(frame)
+        if updates:
+            self.out.write(updates)
+            self.out.flush()
+
+    def close(self):
+        """ Restores the cursor and colors, below the picture. """
+        rows = 36 if self.mode == 'braille' else 72
+        self.out.write('\x1b[0m\x1b[%d;1H\x1b[?25h\n' % (rows + 1))
+        self.out.flush()
+        self.cells = None
@@ -1,11 +1,27 @@
+import copy
 from enum import Enum
-import pdb
 from ctypes import c_int8
-import drawille
+import numpy as np
+from .output import FrameOutput
 import logging
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(name='gpu')
 
+# tile data byte -> its 8 bits spread one per byte, pixel 0 the top byte
+SPREAD = tuple(sum(((byte >> bit) & 0x1) << (8 * bit) for bit in range(8))
+               for byte in range(256))
+# tile data byte -> bits reversed, for horizontally flipped sprites
+FLIP = bytes(int('{:08b}'.format(byte)[::-1], 2) for byte in range(256))
+
+
+def tile_row(byte_A, byte_B):
+    """
+    Returns the 8 color numbers (0-3) of a tile row,
+    byte_A has the low and byte_B the high bits.
+    """
+    return ((SPREAD[byte_B] << 1) | SPREAD[byte_A]).to_bytes(8, 'big')
+
+
 class GPU:
     """
     GPU for the gameboy
@@ -19,6 +35,15 @@ class GPU:
         gameboy LCD screen arranged in an array
         160x144
         index = col + (row * 160)
+    window_line : int
+        line of the window drawn next, reset every frame
+    video_enabled : bool
+        if False scanlines are not drawn (headless runs),
+        the LCD timing and interrupts are unchanged
+    palettes : Palettes
+        the memory's decoded palettes, indexed by the renderers
+    output : FrameOutput
+        converts the screen to the indexed/packed/rgb/rgba formats
 
     """
     #TODO: The scanline incrementing is confusing...
@@ -26,7 +51,12 @@ class GPU:
         self.mode_clock = 0
         self.gb_screen = bytearray(23040)
         self.white_screen = bytearray(23040)
+        # numpy views of the screens for FrameOutput, made once
+        self.screen_arrays = (np.frombuffer(self.gb_screen, dtype=np.uint8),
+                              np.frombuffer(self.white_screen, dtype=np.uint8))
+        self.output = FrameOutput()
         self.mem = memory
+        self.palettes = memory.palettes
         self.modes = Enum('Mode', 'HB VB OR LCD')
         self.mode = self.modes.OR
         self.dispatch_mode = {
@@ -36,11 +66,32 @@ class GPU:
             self.modes.LCD: self.lcd_trans
         }
         self.lcd_prev_enabled = True
+        self.window_line = 0
+        self.video_enabled = True
 
         #set up initial state
         self.mem.set_scanline(0)
         self.set_mode(self.modes.OR, 0)
 
+    def __deepcopy__(self, memo):
+        """
+        Copies the gpu and its memory. The copy gets its own screen,
+        numpy views of it and output buffers, and a mode dispatch
+        table bound to it.
+        """
+        gpu = copy.copy(self)
+        memo[id(self)] = gpu
+        gpu.mem = copy.deepcopy(self.mem, memo)
+        gpu.palettes = gpu.mem.palettes
+        gpu.gb_screen = bytearray(self.gb_screen)
+        # the white screen is never written, it is shared
+        gpu.screen_arrays = (np.frombuffer(gpu.gb_screen, dtype=np.uint8),
+                             self.screen_arrays[1])
+        gpu.output = FrameOutput(self.output.palette)
+        gpu.dispatch_mode = {mode: getattr(gpu, method.__name__)
+                             for mode, method in self.dispatch_mode.items()}
+        return gpu
+
     def update_graphics(self, cycles):
         """
         Updates the graphics display according to number of cycles
@@ -65,6 +116,25 @@ class GPU:
                 self.set_mode(self.modes.VB, 0)
             self.lcd_prev_enabled = False
 
+    def cycles_to_next_mode(self):
+        """
+        Returns the number of cycles until the next mode change,
+        that is when LY, STAT or the interrupt flags may change next.
+        While the LCD is off nothing changes, returns one scanline.
+        """
+        if not self.lcd_enabled() or not self.lcd_prev_enabled:
+            return 456
+        elif self.mode == self.modes.HB:
+            return 204 - self.mode_clock
+        elif self.mode == self.modes.VB:
+            if self.mem.get_scanline() == 153:
+                return 64 - self.mode_clock
+            return 456 - self.mode_clock
+        elif self.mode == self.modes.OR:
+            return 80 - self.mode_clock
+        else: # mode == self.modes.LCD
+            return 174 - self.mode_clock
+
     def h_blank(self, cycles):
         """
         Mode 0 of screen drawing process.
@@ -131,7 +201,8 @@ class GPU:
         self.mode_clock += cycles
         if self.mode_clock >= 174:
             # enter H-Blank mode and draw line
-            self.draw_scanline(self.mem.get_scanline())
+            if self.video_enabled:
+                self.draw_scanline(self.mem.get_scanline())
             self.set_mode(self.modes.HB, self.mode_clock % 204)
 
 
@@ -180,7 +251,8 @@ class GPU:
     def draw_scanline(self, scanline):
         """
         Draws the scanline specified based on the current
-        contents of memory
+        contents of memory. Background/window and sprites are
+        each drawn as a line of color numbers, then composited.
 
         ...
         Parameters
@@ -188,226 +260,208 @@ class GPU:
         scanline : int
             scanline to draw (0-143)
         """
-        self.draw_background(scanline)
-        #self.draw_window(scanline)
-        self.draw_sprites(scanline)
-
-
-
-    def draw_window(self, scanline):
-        """
-        Draws the window for the scanline
-        """
         lcd_control = self.mem.read(0xff40)
-        if not self.bit_set(lcd_control, 5):
-            return #bg turned off
-        ##log.debug('drawing window!')
-
+        if scanline == 0:
+            self.window_line = 0
+        if lcd_control & 0x1:
+            bg_line = self.draw_background(scanline, lcd_control)
+            self.draw_window(scanline, lcd_control, bg_line)
+        else:
+            bg_line = bytearray(160)
+        sprites = self.draw_sprites(scanline, lcd_control)
+        row = self.composite(bg_line, sprites, lcd_control)
+        self.gb_screen[scanline * 160:(scanline + 1) * 160] = row
 
-    def draw_sprites(self, scanline):
+    def composite(self, bg_line, sprites, lcd_control):
         """
-        Draws the sprites for the current scanline
-        """
-        lcd_control = self.mem.read(0xff40)
-        if not self.bit_set(lcd_control, 1):
-            return #bg turned off
-
-        height = 16 if self.bit_set(lcd_control, 2) else 8
-        for i in range(40):
-            offset = (39 - i) * 4
-            y = self.mem.read(0xfe00 + offset)
-            x = self.mem.read(0xfe00 + offset + 1)
-            tile_num = self.mem.read(0xfe00 + offset + 2)
-            if height == 16:
-                tile_num &= 0xfe
-            flags = self.mem.read(0xfe00 + offset + 3)
-            address = 0x8000 + (tile_num * 16)
-            if scanline >= (y - 16) and (y - 16) + height - 1 >= scanline:
-                # sprite actually on this scanline
-                self.draw_sprite_line(y - 16, x - 8, height, 
-                                      address, flags, scanline)
+        Resolves sprite priority and the palettes for one line.
 
-    def draw_sprite_line(self, y, x, height, address, flags, scanline):
-        """
-        Draws the sprite for one line (if it's on the current scanline)
-        """
-        pal_addr = 0xff49 if self.bit_set(flags, 4) else 0xff48
+        ...
+        Parameters
+        ----------
+        bg_line : bytearray
+            160 background/window color numbers
+        sprites : tuple
+            (color numbers, flags) from draw_sprites or None
+        lcd_control : int
+            value of 0xff40
 
-        sprite_line = height - (scanline - y)
-        if not self.bit_set(flags, 6):
-            offset = 2 * (scanline - y)
-        else:
-            offset = 2 * (sprite_line - 1)
-        byte_A = self.mem.read(address + offset)
-        byte_B = self.mem.read(address + offset + 1)
-
-        for pix in range(8):
-            #check for horiz flip
-            col_index = 7 - pix if self.bit_set(flags, 5) else pix
-            color_num = self.get_color_num(byte_A, byte_B, col_index)
-            if x + pix < 160 and x + pix >= 0 and color_num != 0:
-                pal_color = self.get_palette_color(color_num, pal_addr)
-                if not self.bit_set(flags, 7):
-                    # has priority over background just draw
-                    self.draw_to_buffer(x + pix, scanline, pal_color)
-                elif self.get_palette_color(0, 0xff47) == \
-                     self.get_buff_color(x + pix, scanline):
-                    # background is clear OK to draw
-                    self.draw_to_buffer(x + pix, scanline, pal_color)
-
-
-    def draw_background(self, scanline):
+        Returns
+        -------
+        bytearray
+            the 160 colors (0-3) of the line
         """
-        Draws the background for the current scanline
+        if lcd_control & 0x1:
+            row = bg_line.translate(self.palettes.tables[0xff47])
+        else:
+            # background off is white
+            row = bytearray(160)
+        if sprites is None:
+            return row
+        obj_line, obj_flags = sprites
+        palettes = (self.palettes.colors[0xff48],
+                    self.palettes.colors[0xff49])
+        for x in range(160):
+            color_num = obj_line[x]
+            if color_num == 0:
+                continue
+            flags = obj_flags[x]
+            if flags & 0x80 and bg_line[x] != 0:
+                # behind background colors 1-3
+                continue
+            row[x] = palettes[(flags >> 4) & 0x1][color_num]
+        return row
+
+    def tile_line(self, map_row, first, count, line, lcd_control):
+        """
+        Decodes count tiles of a tile map row into color numbers.
 
+        ...
         Parameters
         ----------
-        scanline
-            to draw background on
-        """
-        # background display register
-        lcd_control = self.mem.read(0xff40)
-        if not self.bit_set(lcd_control, 0):
-            return #bg turned off
+        map_row : int
+            address of the row in the tile map
+        first : int
+            first tile in the row (0-31), wraps around
+        count : int
+            number of tiles
+        line : int
+            line of the tiles to decode (0-7)
+        lcd_control : int
+            value of 0xff40, bit 4 selects the tile data
 
-        scY = self.mem.read(0xff42)
-        scX = self.mem.read(0xff43)
-        tile_select = 0x8000 if self.bit_set(lcd_control, 4) else 0x9000
-        tile_map = 0x9c00 if self.bit_set(lcd_control, 3) else 0x9800
-
-        y_offset = (((scY + scanline) // 8) % 32) * 32
-        tile_line = (scY + scanline) % 8
-        for x_tile in range(20):
-            x_offset = (x_tile + (scX // 8)) % 32
-            tile_index = self.mem.read(tile_map + y_offset + x_offset)
-            if tile_select == 0x9000:
-                tile_index = c_int8(tile_index).value
-            address = tile_select + (16 * tile_index)
-            x_shift = scX % 8
-            if x_tile == 0 and x_shift != 0:
-                self.draw_bg_tile(address, tile_line, 
-                                  0, scanline, x_shift, 7)
-            elif x_tile == 20 and x_shift != 0:
-                self.draw_bg_tile(address, tile_line, 
-                                  160 - x_shift, scanline, 0, x_shift - 1)
+        Returns
+        -------
+        bytearray
+            count * 8 color numbers
+        """
+        read = self.mem.read
+        unsigned = lcd_control & 0x10
+        pixels = bytearray()
+        for i in range(count):
+            tile_index = read(map_row + ((first + i) & 0x1f))
+            if unsigned:
+                address = 0x8000 + (16 * tile_index)
             else:
-                self.draw_bg_tile(address, tile_line, 
-                                 (x_tile * 8) - x_shift, scanline, 0, 7)
+                address = 0x9000 + (16 * c_int8(tile_index).value)
+            address += 2 * line
+            pixels += tile_row(read(address), read(address + 1))
+        return pixels
 
-    def draw_bg_tile(self, address, line, x, y, pix_start, pix_end):
+    def draw_background(self, scanline, lcd_control):
         """
-        Draws a background tile into the display buffer.
+        Draws the background for the current scanline
 
         ...
         Parameters
         ----------
-        address : int
-            address in memory of tile data 
-        line : int
-            line of the tile to draw (0-7)
-        x : int
-            x position on the GB screen
-        y : int
-            y position on the GB screen
-        pix_start : int
-            first pixel in the block to draw
-        pix_end : int
-            last pixel in the block to draw
-        """
-        block_one = self.mem.read(address + (2 * line))
-        block_two = self.mem.read(address + (2 * line) + 1)
-        
-        for pixel in range(pix_start, pix_end + 1):
-            color = self.get_color(block_one, block_two, pixel, 0xff47)
-            x_pix = (x + pixel - pix_start) % 160
-            self.draw_to_buffer(x_pix, y, color)
-
-
-
-
-    def dump_tile(self, address):
-        c = drawille.Canvas()
-        line1 = []
-        line2 = []
-        for x in range(8):
-            line1.append(self.mem.read(address + (2 * x)))
-            line2.append(self.mem.read(address + (2 * x) + 1))
-        print('Tile Data @' + hex(address))
-        c.set(0,0)
-        c.set(10,10)
-        for i,line in enumerate(line1):
-            for pixel in range(8):
-                if self.get_color(line, line2[i], pixel) != 0:
-                    c.set(1 + pixel,1 + i)
-        print(c.frame())        
-
-    def dump_tile_to_screen(self, address, x_start):
-        line1 = []
-        line2 = []
-        for x in range(8):
-            line1.append(self.mem.read(address + (2 * x)))
-            line2.append(self.mem.read(address + (2 * x) + 1))
-        for i,line in enumerate(line1):
-            for pixel in range(8):
-                if self.get_color(line, line2[i], pixel) != 0:
-                    self.draw_to_buffer(x_start + i, pixel, 1)
-        c = drawille.Canvas()
-        c.clear()
-        c.set(0,0)
-        c.set(160,144)
-        for row in range(144):
-            for col in range(160):
-                if self.gb_screen[(row * 160) + col] != 0:
-                    c.set(col, row)
-        print(c.frame())
+        scanline : int
+            to draw background on
+        lcd_control : int
+            value of 0xff40
 
-    def draw_to_buffer(self, col, row, color):
-        """
-        Places color at position col,row in the screen buffer.
-        color is a byte value
+        Returns
+        -------
+        bytearray
+            160 color numbers
         """
-        self.gb_screen[col + (row * 160)] = color
-
-    def get_buff_color(self, col, row):
-        return self.gb_screen[col + (row * 160)]
+        scY = self.mem.read(0xff42)
+        scX = self.mem.read(0xff43)
+        tile_map = 0x9c00 if lcd_control & 0x8 else 0x9800
+        y = (scY + scanline) & 0xff
+        pixels = self.tile_line(tile_map + ((y // 8) * 32), scX // 8, 21,
+                                y % 8, lcd_control)
+        return pixels[scX % 8:(scX % 8) + 160]
 
-    def get_color(self, block_one, block_two, pixel, pal_addr):
-        """
-        Return the color of the pixel to draw.
-        For GB MODE
-        0-3
+    def draw_window(self, scanline, lcd_control, bg_line):
         """
-        pix = 7 - pixel
-        color_num = 1 if self.bit_set(block_two, pix) else 0
-        color_num = (color_num << 1) | (1 if self.bit_set(block_one, pix) else 0)
-        palette = self.mem.read(pal_addr)
-        color = (palette >> (color_num * 2)) & 0x3
+        Draws the window over bg_line, if it's on the current scanline.
+        The window keeps its own line counter, it only advances
+        on lines the window is drawn.
 
-        return color
-
-    def get_color_num(self, block_one, block_two, pixel):
-        """
-        Translates sprite data to color num
-        """
-        pix = 7 - pixel
-        color_num = 1 if self.bit_set(block_two, pix) else 0
-        color_num = (color_num << 1) | (1 if self.bit_set(block_one, pix) else 0)
-        return color_num
+        ...
+        Parameters
+        ----------
+        scanline : int
+            to draw the window on
+        lcd_control : int
+            value of 0xff40
+        bg_line : bytearray
+            160 background color numbers, overwritten
+        """
+        if not lcd_control & 0x20:
+            return
+        wy = self.mem.read(0xff4a)
+        wx = self.mem.read(0xff4b) - 7
+        if scanline < wy or wx >= 160:
+            return
+        tile_map = 0x9c00 if lcd_control & 0x40 else 0x9800
+        line = self.window_line
+        self.window_line += 1
+        start = max(wx, 0)
+        pixels = self.tile_line(tile_map + ((line // 8) * 32), 0,
+                                (167 - wx) // 8 + 1, line % 8, lcd_control)
+        bg_line[start:] = pixels[start - wx:160 - wx]
+
+    def draw_sprites(self, scanline, lcd_control):
+        """
+        Draws the sprites for the current scanline. Up to 10 sprites
+        per line, lower x (then lower OAM index) is drawn on top.
 
+        ...
+        Parameters
+        ----------
+        scanline : int
+            to draw sprites on
+        lcd_control : int
+            value of 0xff40
 
-    def get_palette_color(self, color_num, palette_addr):
-        """
-        Translates color_num to a color via palette address
-        """
-        return (self.mem.read(palette_addr) >> (color_num * 2)) & 0x3
-        
-    def bit_set(self, data, bit):
-        """
-        Checks if bit bit is set in data.
-        Same as is_set without reading
-        from memory
-        """
-        return True if (data >> bit) & 0x1 == 0x1 else False
+        Returns
+        -------
+        tuple
+            (color numbers, flags) bytearrays of 160 pixels,
+            None if no sprites on the line
+        """
+        if not lcd_control & 0x2:
+            return None
+        height = 16 if lcd_control & 0x4 else 8
+        oam = self.mem.oam
+        visible = []
+        for offset in range(0, 0xa0, 4):
+            y = oam[offset] - 16
+            if y <= scanline < y + height:
+                visible.append((oam[offset + 1], offset))
+                if len(visible) == 10:
+                    break
+        if not visible:
+            return None
+
+        # 8 pixels margin on both sides for sprites partly off screen
+        obj_line = bytearray(176)
+        obj_flags = bytearray(176)
+        read = self.mem.read
+        for x, offset in sorted(visible, reverse=True):
+            if x >= 168:
+                # off screen, still counts towards the 10
+                continue
+            tile_num = oam[offset + 2]
+            if height == 16:
+                tile_num &= 0xfe
+            flags = oam[offset + 3]
+            line = scanline - (oam[offset] - 16)
+            if flags & 0x40:
+                line = height - 1 - line
+            address = 0x8000 + (tile_num * 16) + (2 * line)
+            byte_A = read(address)
+            byte_B = read(address + 1)
+            if flags & 0x20:
+                byte_A = FLIP[byte_A]
+                byte_B = FLIP[byte_B]
+            for pix, color_num in enumerate(tile_row(byte_A, byte_B), x):
+                if color_num != 0:
+                    obj_line[pix] = color_num
+                    obj_flags[pix] = flags
+        return obj_line[8:168], obj_flags[8:168]
 
     def is_set(self, address, bit):
         """
@@ -449,3 +503,13 @@ class GPU:
             return self.gb_screen
         else:
             return self.white_screen
+
+    def get_frame_as(self, fmt):
+        """
+        Returns the current gb screen converted to fmt,
+        'indexed', 'packed', 'rgb' or 'rgba'. The memoryview is
+        reused and overwritten by the next conversion.
+        """
+        screen = self.screen_arrays[0 if self.lcd_enabled() else 1]
+        return self.output.convert(screen, fmt)
+
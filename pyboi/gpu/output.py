@@ -0,0 +1,94 @@
+import numpy as np
+import logging
+log = logging.getLogger(name='output')
+
+# shade 0 (white) to 3 (black)
+DEFAULT_PALETTE = ((0xff, 0xff, 0xff), (0xaa, 0xaa, 0xaa),
+                   (0x55, 0x55, 0x55), (0x00, 0x00, 0x00))
+FORMATS = ('indexed', 'packed', 'rgb', 'rgba')
+
+
+class FrameOutput:
+    """
+    Converts frames of shades (0-3, one byte per pixel) to the
+    output formats. Each format has its own buffer allocated once,
+    conversions are numpy lookups writing into it, so the returned
+    memoryview is overwritten by the next conversion.
+
+    indexed : 1 byte per pixel, the shade 0-3
+    packed : 2 bits per pixel, 4 pixels per byte, first pixel in
+             the high bits
+    rgb : 3 bytes per pixel
+    rgba : 4 bytes per pixel, alpha 0xff
+
+    ...
+    Attributes
+    ----------
+    palette : tuple
+        the 4 (r, g, b) colors for shades 0-3
+    """
+    def __init__(self, palette=DEFAULT_PALETTE, pixels=23040):
+        self.indexed_buf = np.zeros(pixels, dtype=np.uint8)
+        self.packed_buf = np.zeros(pixels // 4, dtype=np.uint8)
+        self.rgb_buf = np.zeros((pixels, 3), dtype=np.uint8)
+        self.rgba_buf = np.zeros((pixels, 4), dtype=np.uint8)
+        self.pack_weights = np.array([64, 16, 4, 1], dtype=np.uint8)
+        self.views = {
+            'indexed': memoryview(self.indexed_buf),
+            'packed': memoryview(self.packed_buf),
+            'rgb': memoryview(self.rgb_buf).cast('B'),
+            'rgba': memoryview(self.rgba_buf).cast('B')
+        }
+        self.palette = None
+        self.rgb_lut = None
+        self.rgba_lut = None
+        self.set_palette(palette)
+
+    def set_palette(self, palette):
+        """
+        Sets the colors used by the rgb/rgba formats.
+
+        ...
+        Parameters
+        ----------
+        palette : sequence
+            4 (r, g, b) colors for shades 0-3
+        """
+        if len(palette) != 4:
+            log.error('palette needs 4 colors')
+            return
+        self.palette = tuple(tuple(color) for color in palette)
+        self.rgb_lut = np.array(self.palette, dtype=np.uint8)
+        self.rgba_lut = np.full((4, 4), 0xff, dtype=np.uint8)
+        self.rgba_lut[:, :3] = self.rgb_lut
+
+    def convert(self, frame, fmt):
+        """
+        Converts frame to fmt.
+
+        ...
+        Parameters
+        ----------
+        frame : ndarray
+            uint8 shades 0-3
+        fmt : string
+            one of FORMATS
+
+        Returns
+        -------
+        memoryview
+            the format's buffer, valid until the next conversion
+        """
+        if fmt == 'indexed':
+            np.copyto(self.indexed_buf, frame)
+        elif fmt == 'packed':
+            np.matmul(frame.reshape(-1, 4), self.pack_weights,
+                      out=self.packed_buf)
+        elif fmt == 'rgb':
+            np.take(self.rgb_lut, frame, axis=0, out=self.rgb_buf)
+        elif fmt == 'rgba':
+            np.take(self.rgba_lut, frame, axis=0, out=self.rgba_buf)
+        else:
+            log.error('unknown frame format ' + str(fmt))
+            return None
+        return self.views[fmt]
@@ -0,0 +1,43 @@
+import logging
+log = logging.getLogger(name='palette')
+
+# BGP, OBP0, OBP1
+PALETTE_ADDRESSES = (0xff47, 0xff48, 0xff49)
+
+
+class Palettes:
+    """
+    The decoded DMG palettes. Each palette register is decoded into
+    a 4 entry lookup table when written, so the renderers index the
+    table instead of reading and shifting the register per pixel.
+
+    ...
+    Attributes
+    ----------
+    colors : dict
+        palette address -> bytes, color number (0-3) to color (0-3)
+    tables : dict
+        palette address -> bytes.translate table for lines of
+        color numbers, the 4 colors repeated
+    """
+    def __init__(self):
+        self.colors = {}
+        self.tables = {}
+        for address in PALETTE_ADDRESSES:
+            self.write(address, 0)
+
+    def write(self, address, byte):
+        """
+        Decodes a palette register write.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            0xff47 - 0xff49
+        byte : int
+            the palette, 2 bits per color number
+        """
+        colors = bytes((byte >> (n * 2)) & 0x3 for n in range(4))
+        self.colors[address] = colors
+        self.tables[address] = colors * 64
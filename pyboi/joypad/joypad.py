@@ -0,0 +1,141 @@
+from collections import deque
+import time
+import logging
+log = logging.getLogger(name='joypad')
+
+# button name -> (line group, bit), group 0 is the directions
+# (selected by P14, bit 4) and group 1 the buttons (P15, bit 5)
+BUTTONS = {
+    'right': (0, 0),
+    'left': (0, 1),
+    'up': (0, 2),
+    'down': (0, 3),
+    'a': (1, 0),
+    'b': (1, 1),
+    'select': (1, 2),
+    'start': (1, 3)
+}
+
+
+class Joypad:
+    """
+    The joypad register 0xff00 (P1) and its input queue.
+
+    Frontends push button events from any thread, the emulation
+    thread applies them at the next instruction boundary (or at the
+    cycle given with the event). The joypad interrupt is requested
+    when a selected input line goes low.
+
+    ...
+    Attributes
+    ----------
+    events : deque
+        queued (cycle, button, pressed, host time) events,
+        cycle is None to apply as soon as possible
+    lines : list of ints
+        the 4 input lines for directions and buttons,
+        a bit is 0 while pressed
+    select : int
+        bits 4-5 of P1, a 0 bit selects a line group
+    stamps : list of floats
+        host times of the events applied since the last
+        call to photon_latency
+    """
+    def __init__(self, memory):
+        self.mem = memory
+        self.timer = memory.timer
+        self.events = deque()
+        self.lines = [0xf, 0xf]
+        self.select = 0x30
+        self.stamps = []
+
+    def push(self, button, pressed, cycle=None):
+        """
+        Queue a button event, safe to call from any thread.
+
+        ...
+        Parameters
+        ----------
+        button : string
+            one of BUTTONS
+        pressed : bool
+            True when pressed, False when released
+        cycle : int
+            timer clock to apply the event at,
+            None to apply it as soon as possible
+        """
+        if button not in BUTTONS:
+            log.error('unknown button ' + str(button))
+            return
+        self.events.append((cycle, button, pressed, time.monotonic()))
+
+    def update(self):
+        """
+        Applies the queued events that are due.
+        Called at instruction boundaries while events are queued.
+        """
+        clock = self.timer.clock
+        events = self.events
+        while events:
+            cycle, button, pressed, stamp = events[0]
+            if cycle is not None and cycle > clock:
+                break
+            events.popleft()
+            self.set_button(button, pressed)
+            self.stamps.append(stamp)
+
+    def set_button(self, button, pressed):
+        """
+        Presses/releases button right away.
+
+        ...
+        Parameters
+        ----------
+        button : string
+            one of BUTTONS
+        pressed : bool
+            True when pressed, False when released
+        """
+        group, bit = BUTTONS[button]
+        old = self.selected_lines()
+        if pressed:
+            self.lines[group] &= ~(1 << bit) & 0xf
+        else:
+            self.lines[group] |= 1 << bit
+        self.check_interrupt(old)
+
+    def selected_lines(self):
+        """ Returns the low nibble of P1, the selected lines ANDed. """
+        value = 0xf
+        if self.select & 0x10 == 0:
+            value &= self.lines[0]
+        if self.select & 0x20 == 0:
+            value &= self.lines[1]
+        return value
+
+    def check_interrupt(self, old):
+        """ Requests the joypad interrupt if a line went low. """
+        if old & ~self.selected_lines() & 0xf:
+            self.mem.request_interrupt(4)
+
+    def read(self):
+        """ Returns the value of P1 (0xff00). """
+        return 0xc0 | self.select | self.selected_lines()
+
+    def write(self, byte):
+        """ Selects the directions/buttons lines, bits 4-5 of byte. """
+        old = self.selected_lines()
+        self.select = byte & 0x30
+        self.check_interrupt(old)
+
+    def photon_latency(self):
+        """
+        Call when a frame is shown. Returns the seconds since the oldest
+        input applied before this frame was queued, None if no input
+        was applied since the last call.
+        """
+        if not self.stamps:
+            return None
+        latency = time.monotonic() - self.stamps[0]
+        self.stamps = []
+        return latency
@@ -0,0 +1,155 @@
+import hashlib
+import mmap
+import os
+import threading
+from .rambank import RAM_SIZES
+import logging
+log = logging.getLogger(name='cartridge')
+
+# cartridge type byte at 0x147 -> name
+MBC_NAMES = {
+    0x00: 'ROM ONLY', 0x01: 'MBC1', 0x02: 'MBC1+RAM',
+    0x03: 'MBC1+RAM+BATTERY', 0x05: 'MBC2', 0x06: 'MBC2+BATTERY',
+    0x08: 'ROM+RAM', 0x09: 'ROM+RAM+BATTERY',
+    0x0f: 'MBC3+TIMER+BATTERY', 0x10: 'MBC3+TIMER+RAM+BATTERY',
+    0x11: 'MBC3', 0x12: 'MBC3+RAM', 0x13: 'MBC3+RAM+BATTERY',
+    0x19: 'MBC5', 0x1a: 'MBC5+RAM', 0x1b: 'MBC5+RAM+BATTERY',
+    0x1c: 'MBC5+RUMBLE', 0x1d: 'MBC5+RUMBLE+RAM',
+    0x1e: 'MBC5+RUMBLE+RAM+BATTERY'
+}
+
+# cartridge types with battery backed ram (or clock)
+BATTERY_TYPES = (0x03, 0x06, 0x09, 0x0f, 0x10, 0x13, 0x1b, 0x1e)
+
+
+class RomHeader:
+    """
+    The cartridge header, 0x100 - 0x14f of the rom.
+
+    ...
+    Attributes
+    ----------
+    title : string
+        game title, 0x134 - 0x143
+    cgb_flag : int
+        0x143, 0x80/0xc0 for color gameboy games
+    mbc_type : int
+        cartridge type, 0x147
+    rom_size : int
+        rom size in bytes, from 0x148
+    rom_banks : int
+        number of 16kb rom banks
+    ram_size : int
+        external ram size in bytes, from 0x149
+    header_checksum : int
+        0x14d, checksum of 0x134 - 0x14c
+    global_checksum : int
+        0x14e - 0x14f, sum of all rom bytes except these two
+    header_ok : bool
+        True if header_checksum matches the header
+    """
+    def __init__(self, rom):
+        """
+        Parse the header.
+
+        ...
+        Parameters
+        ----------
+        rom : bytes-like
+            the whole rom, at least 0x150 bytes
+        """
+        title = bytes(rom[0x134:0x144]).split(b'\0')[0]
+        self.title = title.decode('ascii', 'replace').strip()
+        self.cgb_flag = rom[0x143]
+        self.mbc_type = rom[0x147]
+        self.rom_size = 0x8000 << rom[0x148]
+        self.rom_banks = self.rom_size // 0x4000
+        code = rom[0x149]
+        self.ram_size = RAM_SIZES[code] if code < len(RAM_SIZES) else 0
+        self.header_checksum = rom[0x14d]
+        self.global_checksum = (rom[0x14e] << 8) | rom[0x14f]
+        check = 0
+        for byte in rom[0x134:0x14d]:
+            check = (check - byte - 1) & 0xff
+        self.header_ok = check == self.header_checksum
+
+    def mbc_name(self):
+        """ Returns the name of the cartridge type. """
+        return MBC_NAMES.get(self.mbc_type, 'UNKNOWN ' + hex(self.mbc_type))
+
+    def has_battery(self):
+        """ Returns True if the cartridge ram is battery backed. """
+        return self.mbc_type in BATTERY_TYPES
+
+    def __repr__(self):
+        return "<RomHeader(title=%r, mbc=%s, rom=%d, ram=%d)>" % \
+               (self.title, self.mbc_name(), self.rom_size, self.ram_size)
+
+
+class RomRegistry:
+    """
+    Process wide cache of read only, memory mapped roms.
+
+    Every emulator instance loading the same game shares a single
+    mapping and parsed header. Roms are keyed by the sha1 of their
+    contents, paths are remembered by (size, mtime) so a known file
+    is not hashed again.
+
+    ...
+    Attributes
+    ----------
+    roms : dict
+        sha1 hex digest -> (mmap, RomHeader)
+    paths : dict
+        (real path, size, mtime) -> sha1 hex digest
+    """
+    def __init__(self):
+        self.roms = {}
+        self.paths = {}
+        self.lock = threading.Lock()
+
+    def load(self, path):
+        """
+        Map the rom at path, or return the already mapped copy.
+
+        ...
+        Parameters
+        ----------
+        path : string
+            path to the rom file
+
+        Returns
+        -------
+        (mmap, RomHeader, string)
+            the rom, its header and its sha1, None on failure
+        NOTE: Logs an appropriate error on Failure
+        """
+        if not os.path.isfile(path):
+            log.critical('rom file can not be opened')
+            return None
+        stat = os.stat(path)
+        if stat.st_size < 0x150:
+            log.critical('rom file is too small')
+            return None
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            digest = self.paths.get(key)
+            if digest is not None and digest in self.roms:
+                rom, header = self.roms[digest]
+                return rom, header, digest
+            with open(path, 'rb') as f:
+                rom = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            digest = hashlib.sha1(rom).hexdigest()
+            self.paths[key] = digest
+            if digest in self.roms:
+                # same contents under another path
+                rom.close()
+            else:
+                self.roms[digest] = (rom, RomHeader(rom))
+                log.info('MAPPED: ' + path + ' ' + digest)
+            rom, header = self.roms[digest]
+            return rom, header, digest
+
+
+# the registry shared by every Memory in the process
+ROMS = RomRegistry()
@@ -0,0 +1,106 @@
+import logging
+log = logging.getLogger(name='dma')
+
+# 160 bytes, one every 4 clock cycles
+DMA_CYCLES = 640
+
+
+class DMA:
+    """
+    OAM DMA engine, started by writing to 0xff46.
+
+    The whole source page is copied into OAM at once. For the
+    following 160 microseconds the external bus (ROM, cartridge RAM,
+    WRAM) is busy with the transfer, so while the source is on that
+    bus the memory sets dma_active and sends its accesses to that bus
+    through the engine: reads return the byte being transferred and
+    writes are dropped. VRAM stays accessible. The lock is released
+    lazily on the first access after the transfer is done.
+
+    ...
+    Attributes
+    ----------
+    mem : Memory
+        memory the engine copies in
+    start_clock : int
+        timer clock when the transfer started
+    end_clock : int
+        timer clock when the transfer is done
+    """
+    def __init__(self, memory):
+        self.mem = memory
+        self.start_clock = 0
+        self.end_clock = 0
+
+    def start(self, byte):
+        """
+        Copies page byte (0xXX00 - 0xXX9f) into OAM.
+
+        ...
+        Parameters
+        ----------
+        byte : int
+            upper byte of the source address
+        """
+        mem = self.mem
+        self.release()
+        source = (byte & 0xff) << 8
+        if source < 0xe000:
+            mem.oam[:] = mem.membanks.read_block(source, 0xa0)
+        elif source < 0xfe00:
+            # echo ram
+            mem.oam[:] = mem.membanks.read_block(source - 0x2000, 0xa0)
+        else:
+            for i in range(0xa0):
+                mem.oam[i] = mem.read(source + i) or 0
+
+        if source < 0x8000 or 0xa000 <= source < 0xfe00:
+            self.start_clock = mem.timer.clock
+            self.end_clock = self.start_clock + DMA_CYCLES
+            mem.dma_active = True
+
+    def release(self):
+        """ Ends the bus lock. """
+        self.mem.dma_active = False
+
+    def locked(self):
+        """
+        Returns True while the transfer is running,
+        releases the lock once it's done.
+        """
+        if self.mem.timer.clock < self.end_clock:
+            return True
+        self.release()
+        return False
+
+    def read(self, address):
+        """
+        Read a byte of 0x0000 - 0xdfff while dma_active is set.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            to read
+        """
+        if 0x8000 <= address < 0xa000 or not self.locked():
+            return self.mem.membanks.read(address)
+        # the cpu sees the byte currently on the bus
+        index = (self.mem.timer.clock - self.start_clock) >> 2
+        return self.mem.oam[index]
+
+    def write(self, byte, address):
+        """
+        Write a byte of 0x0000 - 0xdfff while dma_active is set,
+        dropped unless to VRAM.
+
+        ...
+        Parameters
+        ----------
+        byte : int
+            to write
+        address : int
+            to write to
+        """
+        if 0x8000 <= address < 0xa000 or not self.locked():
+            self.mem.membanks.write(byte, address)
@@ -60,3 +60,35 @@ class MBC0:
         else:
             log.critical('INVALID WRITE @ ' + hex(address))
 
+    def read_block(self, address, length):
+        """
+        Read length bytes starting at address, the block must not
+        cross from rom into ram.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            first byte to read
+        length : int
+            number of bytes
+
+        Returns
+        -------
+        bytearray
+            the bytes read
+        """
+        if address < 0x8000:
+            return self.rom[address:address + length]
+        return self.ram.read_block(address, length)
+
+    def set_battery(self, save):
+        """
+        Backs the cartridge ram with the SaveFile save.
+        """
+        self.ram.set_battery(save)
+
+    def get_rom_bank(self):
+        """ Returns the rom bank mapped at 0x4000, always 1. """
+        return 1
+
@@ -13,10 +13,12 @@ class MBC1:
     ...
     Attributes
     ----------
-    rom : bytearray 
+    rom : bytes-like
         the ROM of the entire cartridge
     cur_rom : int
         the current rom Bank selected
+    rom_bank : memoryview
+        the 16kb slice of rom for cur_rom, mapped at 0x4000
     """
     def __init__(self, cartridge):
         """
@@ -25,15 +27,24 @@ class MBC1:
         ...
         Parameters
         ----------
-        cartridge : bytearray
+        cartridge : bytes-like
             the ROM to initialize from
         """
         self.rom = cartridge
+        self.rom_banks = max(2, len(cartridge) // 0x4000)
         self.ram = RAMBank(cartridge[0x149])
         self.cur_rom = 1
+        self.rom_bank = None
         self.modes = Enum('BankMode', 'ROM RAM')
         self.mode = self.modes.ROM
+        self.switch_rom_bank()
 
+    def switch_rom_bank(self):
+        """
+        Maps the rom bank cur_rom at 0x4000.
+        """
+        offset = (self.cur_rom % self.rom_banks) * 0x4000
+        self.rom_bank = memoryview(self.rom)[offset:offset + 0x4000]
 
     def read_byte(self, address):
         """
@@ -49,8 +60,7 @@ class MBC1:
         if address < 0x4000:
             return self.rom[address]
         elif address < 0x8000:
-            address -= 0x4000
-            return self.rom[address + (self.cur_rom * 0x4000)]
+            return self.rom_bank[address - 0x4000]
         elif address < 0xe000:
             return self.ram.read_byte(address)
         else:
@@ -61,7 +71,7 @@ class MBC1:
         """
         Write a byte to MBC1. This controls/updates registers.
 
-        RAM ENABLE: 0x0 - 0x1fff 
+        RAM ENABLE: 0x0 - 0x1fff
         ROM BANK #: 0x2000 - 0x3ffff
         RAM BANK # or upper bits of ROM BANK: 0x4000 - 0x5fff
         ROM/RAM Select: 0x6000 - 0x7fff
@@ -87,6 +97,7 @@ class MBC1:
                 if byte == 0:
                     byte |= 0x1 #MBC 1 translates 0 -> 1
                 self.cur_rom |=  byte & 0x1f
+                self.switch_rom_bank()
             elif address < 0x6000:
                 # ram bank num or upper bits of rom bank #
                 if self.mode == self.modes.RAM:
@@ -94,6 +105,7 @@ class MBC1:
                 else:
                     self.cur_rom &= 0x1f
                     self.cur_rom |= (byte & 0x3) << 5
+                    self.switch_rom_bank()
             else: # address < 0x8000
                 #rom/ram mode select
                 if byte == 0x0:
@@ -104,3 +116,38 @@ class MBC1:
             self.ram.write_byte(byte, address)
         else:
             log.critical('INVALID WRITE TO: ' + hex(address))
+
+    def read_block(self, address, length):
+        """
+        Read length bytes starting at address, the block must not
+        cross a bank boundary.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            first byte to read
+        length : int
+            number of bytes
+
+        Returns
+        -------
+        bytes-like
+            the bytes read
+        """
+        if address < 0x4000:
+            return self.rom[address:address + length]
+        elif address < 0x8000:
+            address -= 0x4000
+            return self.rom_bank[address:address + length]
+        return self.ram.read_block(address, length)
+
+    def set_battery(self, save):
+        """
+        Backs the cartridge ram with the SaveFile save.
+        """
+        self.ram.set_battery(save)
+
+    def get_rom_bank(self):
+        """ Returns the rom bank currently mapped at 0x4000. """
+        return self.cur_rom
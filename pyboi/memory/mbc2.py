@@ -0,0 +1,168 @@
+from .rambank import RAMBank
+import copy
+import logging
+log = logging.getLogger(name='mbc2')
+
+class MBC2:
+    """
+    Memory Bank Controller 2
+    Up to 16 rom banks and a built in 512 x 4 bit ram.
+    Writes to 0x0-0x3fff control the registers, bit 8
+    of the address selects ram enable (0) or rom bank (1).
+
+    ...
+    Attributes
+    ----------
+    rom : bytes-like
+        the ROM of the entire cartridge
+    cur_rom : int
+        the current rom Bank selected
+    rom_bank : memoryview
+        the 16kb slice of rom for cur_rom, mapped at 0x4000
+    ram : RAMBank
+        vram/wram, the cartridge has no external ram
+    mbc_ram : bytearray
+        the built in ram, 512 nibbles at 0xa000 - 0xa1ff
+        repeated up to 0xbfff
+    mbc_ram_enabled : bool
+        if False reads/writes to mbc_ram are ignored
+    save : SaveFile
+        the .sav file backing mbc_ram, None if not battery backed
+    """
+    def __init__(self, cartridge):
+        """
+        Initialize MBC2.
+
+        ...
+        Parameters
+        ----------
+        cartridge : bytes-like
+            the ROM to initialize from
+        """
+        self.rom = cartridge
+        self.rom_banks = max(2, len(cartridge) // 0x4000)
+        self.ram = RAMBank(0)
+        self.mbc_ram = bytearray(0x200)
+        self.mbc_ram_enabled = False
+        self.save = None
+        self.cur_rom = 1
+        self.rom_bank = None
+        self.switch_rom_bank()
+
+    def switch_rom_bank(self):
+        """
+        Maps the rom bank cur_rom at 0x4000.
+        """
+        offset = (self.cur_rom % self.rom_banks) * 0x4000
+        self.rom_bank = memoryview(self.rom)[offset:offset + 0x4000]
+
+    def read_byte(self, address):
+        """
+        Read a byte from mbc2.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            to read
+
+        """
+        if address < 0x4000:
+            return self.rom[address]
+        elif address < 0x8000:
+            return self.rom_bank[address - 0x4000]
+        elif 0xa000 <= address < 0xc000:
+            if not self.mbc_ram_enabled:
+                return 0xff
+            return self.mbc_ram[address & 0x1ff] | 0xf0
+        elif address < 0xe000:
+            return self.ram.read_byte(address)
+        else:
+            log.critical('INVALID READ AT: ' + hex(address))
+            return 0xff
+
+    def write_byte(self, byte, address):
+        """
+        Write a byte to MBC2.
+
+        RAM ENABLE: 0x0 - 0x3fff, address bit 8 clear
+        ROM BANK #: 0x0 - 0x3fff, address bit 8 set
+
+        ...
+        Parameters
+        ----------
+        byte : int
+            to write
+        address : int
+            to write to
+        """
+        if address < 0x4000:
+            if address & 0x100 == 0:
+                enable = byte & 0xf == 0xa
+                if self.save is not None and self.mbc_ram_enabled and not enable:
+                    self.save.request_flush()
+                self.mbc_ram_enabled = enable
+            else:
+                self.cur_rom = byte & 0xf
+                if self.cur_rom == 0:
+                    self.cur_rom = 1
+                self.switch_rom_bank()
+        elif address < 0x8000:
+            pass
+        elif 0xa000 <= address < 0xc000:
+            if self.mbc_ram_enabled:
+                self.mbc_ram[address & 0x1ff] = byte & 0xf
+        elif address < 0xe000:
+            self.ram.write_byte(byte, address)
+        else:
+            log.critical('INVALID WRITE TO: ' + hex(address))
+
+    def read_block(self, address, length):
+        """
+        Read length bytes starting at address, the block must not
+        cross a bank boundary.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            first byte to read
+        length : int
+            number of bytes
+
+        Returns
+        -------
+        bytes-like
+            the bytes read
+        """
+        if address < 0x4000:
+            return self.rom[address:address + length]
+        elif address < 0x8000:
+            address -= 0x4000
+            return self.rom_bank[address:address + length]
+        elif 0xa000 <= address < 0xc000:
+            return bytearray(self.read_byte(address + i) for i in range(length))
+        return self.ram.read_block(address, length)
+
+    def set_battery(self, save):
+        """
+        Backs the built in ram with the SaveFile save.
+        """
+        self.save = save
+        self.mbc_ram = save.data
+
+    def get_rom_bank(self):
+        """ Returns the rom bank currently mapped at 0x4000. """
+        return self.cur_rom
+
+    def __deepcopy__(self, memo):
+        """
+        Copies the controller, the rom is shared. The copy of battery
+        backed ram holds its contents but is not backed by the .sav file.
+        """
+        mbc = copy.copy(self)
+        memo[id(self)] = mbc
+        mbc.ram = copy.deepcopy(self.ram, memo)
+        mbc.mbc_ram = bytearray(self.mbc_ram)
+        mbc.save = None
+        return mbc
@@ -0,0 +1,340 @@
+from .rambank import RAMBank
+import copy
+import struct
+import time
+import logging
+log = logging.getLogger(name='mbc3')
+
+# the clock saved after the ram in the .sav: the S, M, H, DL, DH
+# registers, the latched registers (4 bytes each) and the unix time
+# they were saved at (8 bytes)
+RTC_SAVE_FORMAT = '<10IQ'
+RTC_SAVE_SIZE = struct.calcsize(RTC_SAVE_FORMAT)
+
+class RTC:
+    """
+    The MBC3 real time clock.
+
+    The clock is never ticked, the time is derived from the host
+    clock whenever the registers are latched.
+
+    ...
+    Attributes
+    ----------
+    now : function
+        returns the current time in seconds, time.time by default
+    base : float
+        time (of now) when the clock read 0 seconds
+    halted_at : int
+        seconds on the clock while halted, None if running
+    carry : bool
+        day counter overflowed, stays set until written
+    latched : bytearray
+        the latched S, M, H, DL, DH registers (0x08 - 0x0c)
+    save : memoryview
+        the clock's RTC_SAVE_SIZE bytes of the .sav, None if
+        not battery backed
+    """
+    def __init__(self):
+        self.now = time.time
+        self.base = self.now()
+        self.halted_at = None
+        self.carry = False
+        self.latched = bytearray(5)
+        self.save = None
+        self.latch()
+
+    def seconds(self):
+        """ Returns the seconds elapsed on the clock. """
+        if self.halted_at is not None:
+            return self.halted_at
+        seconds = int(self.now() - self.base)
+        if seconds >= 512 * 86400:
+            # day counter overflows at 512 days
+            self.carry = True
+            self.base += 512 * 86400 * (seconds // (512 * 86400))
+            seconds %= 512 * 86400
+        return seconds
+
+    def set_seconds(self, seconds):
+        """ Sets the clock to read seconds. """
+        if self.halted_at is not None:
+            self.halted_at = seconds
+        else:
+            self.base = self.now() - seconds
+        self.store()
+
+    def set_clock(self, now):
+        """
+        Switches the time source to now (e.g. emulated time), keeping
+        the seconds on the clock.
+        """
+        seconds = self.seconds()
+        self.now = now
+        self.set_seconds(seconds)
+
+    def registers(self):
+        """ Returns the current S, M, H, DL, DH registers. """
+        seconds = self.seconds()
+        days = seconds // 86400
+        dh = (days >> 8) & 0x1
+        if self.halted_at is not None:
+            dh |= 0x40
+        if self.carry:
+            dh |= 0x80
+        return (seconds % 60, (seconds // 60) % 60,
+                (seconds // 3600) % 24, days & 0xff, dh)
+
+    def latch(self):
+        """ Copies the current time into the latched registers. """
+        self.latched[:] = bytes(self.registers())
+        self.store()
+
+    def load(self, save):
+        """
+        Backs the clock with the end of the .sav, a clock saved there
+        resumes with the time elapsed since it was saved.
+
+        ...
+        Parameters
+        ----------
+        save : memoryview
+            RTC_SAVE_SIZE bytes of the mapped .sav
+        """
+        self.save = save
+        values = struct.unpack_from(RTC_SAVE_FORMAT, save)
+        saved_at = values[10]
+        # a new .sav keeps the clock as it is
+        if saved_at != 0:
+            secs, mins, hours, dl, dh = (v & 0xff for v in values[:5])
+            days = ((dh & 0x1) << 8) | dl
+            seconds = ((days * 24 + hours) * 60 + mins) * 60 + secs
+            self.carry = dh & 0x80 != 0
+            if dh & 0x40:
+                self.halted_at = seconds
+            else:
+                self.halted_at = None
+                elapsed = max(0, int(time.time()) - saved_at)
+                self.base = self.now() - seconds - elapsed
+            self.latched[:] = bytes(v & 0xff for v in values[5:10])
+        self.store()
+
+    def store(self):
+        """ Writes the clock to the .sav, if battery backed. """
+        if self.save is None:
+            return
+        struct.pack_into(RTC_SAVE_FORMAT, self.save, 0, *self.registers(),
+                         *self.latched, int(time.time()))
+
+    def read(self, reg):
+        """
+        Read a latched register.
+
+        ...
+        Parameters
+        ----------
+        reg : int
+            0x08 - 0x0c
+        """
+        return self.latched[reg - 0x8]
+
+    def write(self, reg, byte):
+        """
+        Sets one of the clock's registers, the others keep
+        their current values.
+
+        ...
+        Parameters
+        ----------
+        reg : int
+            0x08 - 0x0c
+        byte : int
+            value to set
+        """
+        seconds = self.seconds()
+        secs = seconds % 60
+        mins = (seconds // 60) % 60
+        hours = (seconds // 3600) % 24
+        days = seconds // 86400
+        if reg == 0x8:
+            secs = byte % 60
+        elif reg == 0x9:
+            mins = byte % 60
+        elif reg == 0xa:
+            hours = byte % 24
+        elif reg == 0xb:
+            days = (days & 0x100) | byte
+        else: # reg == 0xc
+            days = (days & 0xff) | ((byte & 0x1) << 8)
+            self.carry = byte & 0x80 != 0
+        seconds = ((days * 24 + hours) * 60 + mins) * 60 + secs
+        if reg == 0xc:
+            if byte & 0x40 and self.halted_at is None:
+                self.halted_at = seconds
+            elif not byte & 0x40 and self.halted_at is not None:
+                self.halted_at = None
+        self.latched[reg - 0x8] = byte
+        self.set_seconds(seconds)
+
+    def __deepcopy__(self, memo):
+        """ The copy of a battery backed clock is not backed by the .sav. """
+        rtc = copy.copy(self)
+        memo[id(self)] = rtc
+        rtc.latched = bytearray(self.latched)
+        rtc.save = None
+        return rtc
+
+
+class MBC3:
+    """
+    Memory Bank Controller 3
+    Up to 128 rom banks, 4 ram banks and an optional real
+    time clock. Memory from 0x0-0x7fff is both read from and
+    writen to for control of MBC Registers
+
+    ...
+    Attributes
+    ----------
+    rom : bytes-like
+        the ROM of the entire cartridge
+    cur_rom : int
+        the current rom Bank selected
+    rom_bank : memoryview
+        the 16kb slice of rom for cur_rom, mapped at 0x4000
+    rtc : RTC
+        the clock, None if the cartridge has none
+    rtc_reg : int
+        clock register mapped at 0xa000 (0x08 - 0x0c),
+        None if a ram bank is mapped instead
+    """
+    def __init__(self, cartridge):
+        """
+        Initialize MBC3.
+
+        ...
+        Parameters
+        ----------
+        cartridge : bytes-like
+            the ROM to initialize from
+        """
+        self.rom = cartridge
+        self.rom_banks = max(2, len(cartridge) // 0x4000)
+        self.ram = RAMBank(cartridge[0x149])
+        self.rtc = RTC() if cartridge[0x147] in (0x0f, 0x10) else None
+        self.rtc_reg = None
+        self.latch_byte = 0xff
+        self.cur_rom = 1
+        self.rom_bank = None
+        self.switch_rom_bank()
+
+    def switch_rom_bank(self):
+        """
+        Maps the rom bank cur_rom at 0x4000.
+        """
+        offset = (self.cur_rom % self.rom_banks) * 0x4000
+        self.rom_bank = memoryview(self.rom)[offset:offset + 0x4000]
+
+    def read_byte(self, address):
+        """
+        Read a byte from mbc3.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            to read
+
+        """
+        if address < 0x4000:
+            return self.rom[address]
+        elif address < 0x8000:
+            return self.rom_bank[address - 0x4000]
+        elif self.rtc_reg is not None and 0xa000 <= address < 0xc000:
+            return self.rtc.read(self.rtc_reg)
+        elif address < 0xe000:
+            return self.ram.read_byte(address)
+        else:
+            log.critical('INVALID READ AT: ' + hex(address))
+            return 0xff
+
+    def write_byte(self, byte, address):
+        """
+        Write a byte to MBC3. This controls/updates registers.
+
+        RAM/RTC ENABLE: 0x0 - 0x1fff
+        ROM BANK #: 0x2000 - 0x3fff
+        RAM BANK # or RTC register: 0x4000 - 0x5fff
+        Latch clock: 0x6000 - 0x7fff, write 0 then 1
+
+        ...
+        Parameters
+        ----------
+        byte : int
+            to write
+        address : int
+            to write to
+        """
+        if address < 0x2000:
+            self.ram.set_ext_ram_enable(byte & 0xf == 0xa)
+        elif address < 0x4000:
+            self.cur_rom = byte & 0x7f
+            if self.cur_rom == 0:
+                self.cur_rom = 1
+            self.switch_rom_bank()
+        elif address < 0x6000:
+            if byte <= 0x3:
+                self.rtc_reg = None
+                self.ram.set_bank_num(byte)
+            elif 0x8 <= byte <= 0xc and self.rtc is not None:
+                self.rtc_reg = byte
+        elif address < 0x8000:
+            if self.latch_byte == 0 and byte == 1 and self.rtc is not None:
+                self.rtc.latch()
+            self.latch_byte = byte
+        elif self.rtc_reg is not None and 0xa000 <= address < 0xc000:
+            if self.ram.extram_enabled:
+                self.rtc.write(self.rtc_reg, byte)
+        elif address < 0xe000:
+            self.ram.write_byte(byte, address)
+        else:
+            log.critical('INVALID WRITE TO: ' + hex(address))
+
+    def read_block(self, address, length):
+        """
+        Read length bytes starting at address, the block must not
+        cross a bank boundary.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            first byte to read
+        length : int
+            number of bytes
+
+        Returns
+        -------
+        bytes-like
+            the bytes read
+        """
+        if address < 0x4000:
+            return self.rom[address:address + length]
+        elif address < 0x8000:
+            address -= 0x4000
+            return self.rom_bank[address:address + length]
+        elif self.rtc_reg is not None and 0xa000 <= address < 0xc000:
+            return bytearray([self.rtc.read(self.rtc_reg)] * length)
+        return self.ram.read_block(address, length)
+
+    def set_battery(self, save):
+        """
+        Backs the cartridge ram with the SaveFile save, the clock
+        is saved after the ram.
+        """
+        self.ram.set_battery(save)
+        if self.rtc is not None:
+            self.rtc.load(memoryview(save.data)[-RTC_SAVE_SIZE:])
+
+    def get_rom_bank(self):
+        """ Returns the rom bank currently mapped at 0x4000. """
+        return self.cur_rom
@@ -0,0 +1,133 @@
+from .rambank import RAMBank
+import logging
+log = logging.getLogger(name='mbc5')
+
+class MBC5:
+    """
+    Memory Bank Controller 5
+    Up to 512 rom banks (bank 0 can be mapped at 0x4000 too)
+    and 16 ram banks.
+
+    ...
+    Attributes
+    ----------
+    rom : bytes-like
+        the ROM of the entire cartridge
+    cur_rom : int
+        the current rom Bank selected, 9 bits
+    rom_bank : memoryview
+        the 16kb slice of rom for cur_rom, mapped at 0x4000
+    """
+    def __init__(self, cartridge):
+        """
+        Initialize MBC5.
+
+        ...
+        Parameters
+        ----------
+        cartridge : bytes-like
+            the ROM to initialize from
+        """
+        self.rom = cartridge
+        self.rom_banks = max(2, len(cartridge) // 0x4000)
+        self.ram = RAMBank(cartridge[0x149])
+        self.cur_rom = 1
+        self.rom_bank = None
+        self.switch_rom_bank()
+
+    def switch_rom_bank(self):
+        """
+        Maps the rom bank cur_rom at 0x4000.
+        """
+        offset = (self.cur_rom % self.rom_banks) * 0x4000
+        self.rom_bank = memoryview(self.rom)[offset:offset + 0x4000]
+
+    def read_byte(self, address):
+        """
+        Read a byte from mbc5.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            to read
+
+        """
+        if address < 0x4000:
+            return self.rom[address]
+        elif address < 0x8000:
+            return self.rom_bank[address - 0x4000]
+        elif address < 0xe000:
+            return self.ram.read_byte(address)
+        else:
+            log.critical('INVALID READ AT: ' + hex(address))
+            return 0xff
+
+    def write_byte(self, byte, address):
+        """
+        Write a byte to MBC5. This controls/updates registers.
+
+        RAM ENABLE: 0x0 - 0x1fff
+        ROM BANK # lower 8 bits: 0x2000 - 0x2fff
+        ROM BANK # bit 8: 0x3000 - 0x3fff
+        RAM BANK #: 0x4000 - 0x5fff
+
+        ...
+        Parameters
+        ----------
+        byte : int
+            to write
+        address : int
+            to write to
+        """
+        if address < 0x2000:
+            self.ram.set_ext_ram_enable(byte & 0xf == 0xa)
+        elif address < 0x3000:
+            self.cur_rom = (self.cur_rom & 0x100) | (byte & 0xff)
+            self.switch_rom_bank()
+        elif address < 0x4000:
+            self.cur_rom = (self.cur_rom & 0xff) | ((byte & 0x1) << 8)
+            self.switch_rom_bank()
+        elif address < 0x6000:
+            self.ram.set_bank_num(byte & 0xf)
+        elif address < 0x8000:
+            pass
+        elif address < 0xe000:
+            self.ram.write_byte(byte, address)
+        else:
+            log.critical('INVALID WRITE TO: ' + hex(address))
+
+    def read_block(self, address, length):
+        """
+        Read length bytes starting at address, the block must not
+        cross a bank boundary.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            first byte to read
+        length : int
+            number of bytes
+
+        Returns
+        -------
+        bytes-like
+            the bytes read
+        """
+        if address < 0x4000:
+            return self.rom[address:address + length]
+        elif address < 0x8000:
+            address -= 0x4000
+            return self.rom_bank[address:address + length]
+        return self.ram.read_block(address, length)
+
+    def set_battery(self, save):
+        """
+        Backs the cartridge ram with the SaveFile save.
+        """
+        self.ram.set_battery(save)
+
+    def get_rom_bank(self):
+        """ Returns the rom bank currently mapped at 0x4000. """
+        return self.cur_rom
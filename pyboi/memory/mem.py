@@ -1,9 +1,35 @@
 import os.path
 import logging
 from .membanks import MemBanks
+from .mbc3 import RTC_SAVE_SIZE
+from .dma import DMA
+from .cartridge import ROMS
+from .savefile import SaveFile
+from ..timer.timer import Timer
+from ..joypad.joypad import Joypad
+from ..apu.apu import APU
+from ..gpu.palette import Palettes
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(name='memory')
 
+# IO registers as the bios leaves them, in write order (sound on first)
+POST_BOOT_IO = (
+    (0xff26, 0xf1), (0xff10, 0x80), (0xff11, 0xbf), (0xff12, 0xf3),
+    (0xff14, 0xbf), (0xff16, 0x3f), (0xff17, 0x00), (0xff19, 0xbf),
+    (0xff1a, 0x7f), (0xff1b, 0xff), (0xff1c, 0x9f), (0xff1e, 0xbf),
+    (0xff20, 0xff), (0xff21, 0x00), (0xff22, 0x00), (0xff23, 0xbf),
+    (0xff24, 0x77), (0xff25, 0xf3), (0xff05, 0x00), (0xff06, 0x00),
+    (0xff07, 0x00), (0xff40, 0x91), (0xff42, 0x00), (0xff43, 0x00),
+    (0xff45, 0x00), (0xff47, 0xfc), (0xff48, 0xff), (0xff49, 0xff),
+    (0xff4a, 0x00), (0xff4b, 0x00), (0xff50, 0x01), (0xffff, 0x00))
+# the internal counter behind DIV when the bios is done
+POST_BOOT_COUNTER = 0xabcc
+# the bios's (R) tile, below the logo
+REGISTERED_TILE = (0x3c, 0x42, 0xb9, 0xa5, 0xb9, 0xa5, 0x42, 0x3c)
+# nibble -> byte with every bit doubled, the logo is drawn at 2x
+DOUBLED = tuple(sum(((nibble >> bit) & 1) * (3 << (2 * bit))
+                    for bit in range(4)) for nibble in range(16))
+
 class Memory:
     """
     Represents the memory of the GB.
@@ -15,6 +41,15 @@ class Memory:
         represents the following areas of memory
         0x0000 - 0x7fff : ROMBANKS
         0x8000 - 0xdfff : RAM + RAM banks
+    rom : mmap
+        the loaded rom, read only and shared with every
+        other Memory that loaded the same rom
+    header : RomHeader
+        the parsed cartridge header of rom
+    rom_hash : string
+        sha1 of the rom contents
+    save : SaveFile
+        .sav file backing battery ram, None if not loaded
     oam : bytearray
         sprite attribute table
         0xfe00 - 0xfe9f
@@ -24,26 +59,100 @@ class Memory:
     hram : bytearray
         0xff80 - 0xfffe 
         high ram
+    bios : bytearray
+        the bios, read from roms/bios.gb when it is first run
     bios_mode : bool
         if true, when accessing memory below 0x100, 
         reads from bios. defaults to False
+    read_wrappers : list of functions
+        wrapper(read) -> read put around every read, e.g. by the
+        memory profiler, see wrap_read
+    timer : Timer
+        DIV/TIMA timer, backs 0xff04 - 0xff07
+    dma : DMA
+        OAM DMA engine, started by writes to 0xff46
+    dma_active : bool
+        True while a DMA may hold the external bus, accesses to
+        it then go through dma
+    joypad : Joypad
+        button state and input queue, backs 0xff00
+    apu : APU
+        sound registers and synthesis, backs 0xff10 - 0xff3f
+    palettes : Palettes
+        BGP/OBP0/OBP1 lookup tables, updated on writes
+    serial : bytearray
+        the bytes sent over the link cable
+    serial_echo : bool
+        print the bytes sent to stdout, defaults to True
+    pending_interrupts : int
+        IE & IF, the interrupts enabled and requested,
+        updated whenever IE or IF change
 
     """
     def __init__(self):
         self.membanks = None
+        self.rom = None
+        self.header = None
+        self.rom_hash = None
+        self.save = None
         self.oam = bytearray(0xa0)
         self.regio = bytearray(0x80)
         self.regio[0x40] = 0x91 # DEFUALT
         self.hram = bytearray(0x80)
         self.bios_mode = False #default
+        self.read_wrappers = []
         self.interrupt_enable = 0
-        #requires bios.gb in directory
-        if not os.path.isfile('./roms/bios.gb'):
+        self.pending_interrupts = 0
+        self.timer = Timer(self)
+        self.dma = DMA(self)
+        self.dma_active = False
+        self.joypad = Joypad(self)
+        self.apu = APU(self)
+        self.palettes = Palettes()
+        self.serial = bytearray()
+        self.serial_echo = True
+        self.bios = None
+
+    def load_bios(self, path='./roms/bios.gb'):
+        """
+        Reads the bios, only needed to run it (see set_bios_mode).
+
+        ...
+        Parameters
+        ----------
+        path : string
+            the 256 byte bios
+        """
+        if not os.path.isfile(path):
             log.critical('no bios file')
             exit()
-        with open('./roms/bios.gb', 'rb') as f:
+        with open(path, 'rb') as f:
             self.bios = bytearray(f.read())
 
+    def init_post_boot(self):
+        """
+        Sets the IO registers and video ram as the bios leaves them:
+        sound on, LCD on, the logo from the cartridge header in the
+        tiles and background map. Requires a rom to be loaded.
+        """
+        for address, byte in POST_BOOT_IO:
+            self.write(byte, address)
+        self.timer.set_counter(POST_BOOT_COUNTER)
+        address = 0x8010
+        for byte in self.rom[0x104:0x134]:
+            for nibble in (byte >> 4, byte & 0xf):
+                # each row of the logo is drawn twice
+                self.write(DOUBLED[nibble], address)
+                self.write(DOUBLED[nibble], address + 2)
+                address += 4
+        for byte in REGISTERED_TILE:
+            self.write(byte, address)
+            address += 2
+        for tile in range(12):
+            self.write(tile + 1, 0x9904 + tile)
+            self.write(tile + 13, 0x9924 + tile)
+        self.write(0x19, 0x9910)
+
     def load_rom(self, rom):
         """
         Load a rom from file into memory.
@@ -61,17 +170,56 @@ class Memory:
         NOTE: Logs an appropriate error on Failure
 
         """
-        # cleaner to not use exception handling
-        if not os.path.isfile(rom):
-            log.critical('rom file can not be opened')
+        # the rom is mapped read only and shared between instances
+        loaded = ROMS.load(rom)
+        if loaded is None:
             quit()
-        with open(rom, 'rb') as f:
-            # this puts entire rom in RAM, but
-            # roms are quite small
-            self.membanks = MemBanks(bytearray(f.read()))
-            log.info('LOADING: ' + rom)
+        self.rom, self.header, self.rom_hash = loaded
+        if not self.header.header_ok:
+            log.error('header checksum mismatch')
+        self.dma.release()
+        self.membanks = MemBanks(self.rom)
+        log.info('LOADING: ' + rom + ' ' + repr(self.header))
         return True
 
+    def load_save(self, path):
+        """
+        Back the cartridge's battery ram (and clock) with the .sav file
+        at path, created if it doesn't exist. Requires a rom to be loaded.
+
+        ...
+        Parameters
+        ----------
+        path : string
+            path to the .sav file, None for ram that is not saved
+
+        Returns
+        -------
+        boolean
+            False if the cartridge has no battery ram, True on success
+        """
+        if not self.header.has_battery():
+            return False
+        # MBC2 has 512 bytes built in
+        if self.header.mbc_type in (0x5, 0x6):
+            size = 0x200
+        else:
+            size = self.header.ram_size
+        if getattr(self.membanks.bank, 'rtc', None) is not None:
+            size += RTC_SAVE_SIZE
+        if size == 0:
+            return False
+        self.close_save()
+        self.save = SaveFile(path, size)
+        self.membanks.set_battery(self.save)
+        return True
+
+    def close_save(self):
+        """ Flushes and closes the save file, if any. """
+        if self.save is not None:
+            self.save.close()
+            self.save = None
+
     def read_bios(self, address):
         """
         Read a byte from the bios in memory.
@@ -89,7 +237,7 @@ class Memory:
         if address < 0:
             #log.critical('reading from negative address in bios')
             return 0
-        elif address <= 0x100:
+        elif address < 0x100:
             return self.bios[address]
         else:
             #log.critical('reading from out of bounds address in bios')
@@ -113,11 +261,13 @@ class Memory:
         """
         if address < 0:
             log.error('negative address read!')
-        elif self.bios_mode and address <= 0x100:
-            return self.read_bios(address)
         elif address < 0xe000:
+            if self.dma_active:
+                return self.dma.read(address)
             return self.membanks.read(address)
         elif address < 0xfe00:
+            if self.dma_active:
+                return self.dma.read(address - 0x1e00)
             return self.membanks.read(address - 0x1e00) #echo ram
         elif address < 0xfea0:
             return self.oam[address - 0xfe00]
@@ -126,6 +276,12 @@ class Memory:
             log.error(hex(address))
         elif address == 0xff00:
             return self.get_input_state()
+        elif address == 0xff04:
+            return self.timer.read_div()
+        elif address == 0xff05:
+            return self.timer.read_tima()
+        elif 0xff10 <= address < 0xff40:
+            return self.apu.read(address)
         elif address < 0xff80:
             return self.regio[address - 0xff00]
         elif address < 0xffff:
@@ -133,6 +289,16 @@ class Memory:
         elif address == 0xffff:
             return self.interrupt_enable
 
+    def read_with_bios(self, address):
+        """
+        Read a byte from memory with the bios mapped at 0x0000 - 0x00ff.
+        Replaces read while in bios mode, so the check costs nothing
+        once the bios is done.
+        """
+        if 0 <= address < 0x100:
+            return self.bios[address]
+        return Memory.read(self, address)
+
     def read_word(self, address):
         """
         Reads two bytes (a word) from memory.
@@ -163,16 +329,18 @@ class Memory:
             address to write to
 
         """
-        # for test roms
-        if address == 0xff01:
-            print(chr(byte), end='', flush=True)
-
         if address < 0:
             log.error('writing to negative address!')
         elif address < 0xe000:
-            self.membanks.write(byte, address)
+            if self.dma_active:
+                self.dma.write(byte, address)
+            else:
+                self.membanks.write(byte, address)
         elif address < 0xfe00:
-            self.membanks.write(byte, address - 0x1e00) #echo ram
+            if self.dma_active:
+                self.dma.write(byte, address - 0x1e00)
+            else:
+                self.membanks.write(byte, address - 0x1e00) #echo ram
         elif address < 0xfea0:
             self.oam[address - 0xfe00] = byte & 0xff
         elif address < 0xff00:
@@ -184,6 +352,7 @@ class Memory:
             self.hram[address - 0xff80] = byte & 0xff
         elif address == 0xffff:
             self.interrupt_enable = byte & 0xff
+            self.pending_interrupts = self.interrupt_enable & self.regio[0xf] & 0x1f
 
 
     # TODO
@@ -201,11 +370,28 @@ class Memory:
 
         """
         if address == 0xff00:
-            #IO PORTS TODO INPUT
-            self.regio[0] |= (byte & 0xf0)
+            # select directions/buttons
+            self.joypad.write(byte)
+        elif address == 0xff02:
+            self.regio[0x2] = byte & 0xff
+            if byte & 0x81 == 0x81:
+                self.serial_transfer()
         elif address == 0xff04:
             # divider, reset on write
-            self.regio[0x4] = 0
+            self.timer.write_div()
+        elif address == 0xff05:
+            self.timer.write_tima(byte)
+        elif address == 0xff06:
+            self.regio[0x6] = byte & 0xff
+            self.timer.write_tma(byte)
+        elif address == 0xff07:
+            self.regio[0x7] = byte & 0xff
+            self.timer.write_tac(byte)
+        elif address == 0xff0f:
+            self.regio[0xf] = byte & 0xff
+            self.pending_interrupts = self.interrupt_enable & byte & 0x1f
+        elif 0xff10 <= address < 0xff40:
+            self.apu.write(address, byte & 0xff)
         elif address == 0xff41:
             #LCD STAT
             byte &= 0xf8
@@ -215,12 +401,34 @@ class Memory:
         elif address == 0xff44:
             self.regio[0x44] = 0
         elif address == 0xff46:
-            dma_addr = byte * 0x100
-            for i in range(0xa0):
-                self.oam[i] = self.read(dma_addr + i)
+            self.regio[0x46] = byte & 0xff
+            self.dma.start(byte)
+        elif 0xff47 <= address <= 0xff49:
+            self.regio[address - 0xff00] = byte & 0xff
+            self.palettes.write(address, byte & 0xff)
+        elif address == 0xff50:
+            # any write unmaps the bios for good
+            self.regio[0x50] = byte & 0xff
+            if self.bios_mode:
+                self.set_bios_mode(False)
         else:
             self.regio[address - 0xff00] = byte & 0xff
 
+    def serial_transfer(self):
+        """
+        Sends SB (0xff01) over the link cable, started by writing
+        0x81 to SC (0xff02). Nothing is connected, so the transfer
+        completes right away receiving 0xff.
+        """
+        byte = self.regio[0x1]
+        self.serial.append(byte)
+        if self.serial_echo:
+            # for test roms
+            print(chr(byte), end='', flush=True)
+        self.regio[0x1] = 0xff
+        self.regio[0x2] &= 0x7f
+        self.request_interrupt(3)
+
     def lcd_stat_write(self, byte):
         """
         Writes the mode to the LCD status register.
@@ -233,14 +441,43 @@ class Memory:
         """
         Sets read_bios flag in memory to val, if true
         when memory accessed below 0x100 reads from
-        bios not cartridge.
+        bios not cartridge. Reads the bios if needed.
 
         Parameters
         ----------
         val : bool
         
         """
+        if val and self.bios is None:
+            self.load_bios()
         self.bios_mode = val
+        self.route_reads()
+
+    def wrap_read(self, wrapper):
+        """
+        Puts wrapper(read) -> read around every read, it stays on top
+        of the bios mapping when that changes.
+        """
+        self.read_wrappers.append(wrapper)
+        self.route_reads()
+
+    def unwrap_read(self, wrapper):
+        """ Removes a wrapper added by wrap_read. """
+        self.read_wrappers.remove(wrapper)
+        self.route_reads()
+
+    def route_reads(self):
+        """
+        Shadows read on the instance with read_with_bios in bios mode,
+        inside the read wrappers. The class's read is used as is when
+        there are neither, so they cost nothing once gone.
+        """
+        self.__dict__.pop('read', None)
+        read = self.read_with_bios if self.bios_mode else self.read
+        for wrapper in self.read_wrappers:
+            read = wrapper(read)
+        if self.bios_mode or self.read_wrappers:
+            self.read = read
 
     def request_interrupt(self, int_id):
         """
@@ -254,6 +491,15 @@ class Memory:
         ir = self.regio[0xf]
         ir |= 1 << int_id
         self.regio[0xf] = ir
+        self.pending_interrupts = self.interrupt_enable & ir & 0x1f
+
+    def clear_interrupt(self, int_id):
+        """
+        Clears the request for interrupt int_id,
+        when it is serviced.
+        """
+        self.regio[0xf] &= ~(1 << int_id) & 0xff
+        self.pending_interrupts &= ~(1 << int_id)
 
     def set_lcd_coincidence(self, bit):
         """
@@ -274,25 +520,5 @@ class Memory:
     def get_scanline(self):
         return self.regio[0x44]
 
-    #TODO
     def get_input_state(self):
-        return self.regio[0] | 0xf
-
-    def inc_div(self):
-        """
-        Increments the div timer by 1.
-        """
-        self.regio[0x4] = (1 + self.regio[0x4]) & 0xff
-
-    def inc_tima(self):
-        """
-        Increments the tima register, requests an interrupt if needed.
-        """
-        new_val = self.regio[0x5] + 1
-        self.regio[0x5] = new_val & 0xff
-        if new_val > 0xff:
-            # overflow
-            self.regio[0x5] = self.regio[0x6]
-            self.request_interrupt(2)
-
-
+        return self.joypad.read()
@@ -1,6 +1,8 @@
 from .mbc0 import MBC0
 from .mbc1 import MBC1
-from .rambank import RAMBank
+from .mbc2 import MBC2
+from .mbc3 import MBC3
+from .mbc5 import MBC5
 import logging
 log = logging.getLogger(name='membanks')
 
@@ -21,16 +23,26 @@ class MemBanks:
         ...
         Parameters
         ----------
-        cartridge : bytearray
+        cartridge : bytes-like
             the ROM to initialize from
 
         """
-        if cartridge[0x147] == 0x0:
+        mbc_type = cartridge[0x147]
+        if mbc_type in (0x0, 0x8, 0x9):
             self.bank = MBC0(cartridge)
             log.info("MBC0")
-        elif cartridge[0x147] >= 0x1 and cartridge[0x147] <= 0x3:
+        elif mbc_type >= 0x1 and mbc_type <= 0x3:
             self.bank = MBC1(cartridge)
             log.info("MBC1")
+        elif mbc_type in (0x5, 0x6):
+            self.bank = MBC2(cartridge)
+            log.info("MBC2")
+        elif mbc_type >= 0xf and mbc_type <= 0x13:
+            self.bank = MBC3(cartridge)
+            log.info("MBC3")
+        elif mbc_type >= 0x19 and mbc_type <= 0x1e:
+            self.bank = MBC5(cartridge)
+            log.info("MBC5")
         else:
             log.critical('MBC NOT IMPLEMENTED: '  + str(cartridge[0x147]))
             quit() #just stop
@@ -66,3 +78,41 @@ class MemBanks:
             self.bank.write_byte(byte, address)
         else:
             log.error('Invalid write to membanks!')
+
+    def read_block(self, address, length):
+        """
+        Read a block of bytes from the memory banks.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            first byte to read, below 0xe000
+        length : int
+            number of bytes, must not cross a bank boundary
+
+        Returns
+        -------
+        bytearray
+            the bytes read
+        """
+        return self.bank.read_block(address, length)
+
+    def set_battery(self, save):
+        """
+        Backs the cartridge ram with a memory mapped save file.
+
+        ...
+        Parameters
+        ----------
+        save : SaveFile
+            the mapped .sav file
+        """
+        self.bank.set_battery(save)
+
+    def get_rom_bank(self):
+        """
+        Returns the number of the rom bank currently
+        mapped into 0x4000 - 0x7fff.
+        """
+        return self.bank.get_rom_bank()
@@ -1,6 +1,10 @@
+import copy
 import logging
 log = logging.getLogger(name='rambanks')
 
+# external ram size in bytes for the cartridge header code at 0x149
+RAM_SIZES = (0, 0x800, 0x2000, 0x8000, 0x20000, 0x10000)
+
 class RAMBank:
     """
     Represents the optional RAM banks in the cartridge.
@@ -8,30 +12,38 @@ class RAMBank:
     ...
     Attributes
     ----------
-    TODO
-
-
+    vram : bytearray
+        0x8000 - 0x9fff video ram
+    wram : bytearray
+        0xc000 - 0xdfff work ram
+    extram : bytearray
+        all of the cartridge's external ram, None if it has none
+    ext_bank : memoryview
+        the 8kb bank of extram mapped at 0xa000 - 0xbfff
+    bank_num : int
+        number of the bank mapped at 0xa000
+    extram_enabled : bool
+        if False reads/writes to extram are ignored
+    save : SaveFile
+        the .sav file backing extram, None if not battery backed
     """
     def __init__(self, ramsize):
         """
         Ramsize is specified in cartridge at 0x149
-        is 0,1,2,3.
+        is 0-5.
         """
         self.vram = bytearray(0x2000)
         self.wram = bytearray(0x2000)
         self.extram_enabled = True
-        self.bank_size = 0
-        self.ram_offset = 0
-        if ramsize == 0:
+        self.ext_bank = None
+        self.bank_num = 0
+        self.save = None
+        if ramsize == 0 or ramsize >= len(RAM_SIZES):
             self.extram = None
-        elif ramsize == 1:
-            self.extram = bytearray(0x800)
-        elif ramsize == 2:
-            self.extram = bytearray(0x2000)
-        elif ramsize == 3:
-            self.extram = bytearray(0x8000)
-            self.bank_size = 0x2000
-    
+        else:
+            self.extram = bytearray(RAM_SIZES[ramsize])
+            self.set_bank_num(0)
+
     def read_byte(self, address):
         """
         Read a byte from the rambanks.
@@ -51,11 +63,11 @@ class RAMBank:
         elif address < 0xa000:
             return self.vram[address - 0x8000]
         elif address < 0xc000:
-            if self.extram == None:
+            if self.extram is None:
                 log.critical('Invalid read from nonexistant external ram!')
                 quit()
             elif self.extram_enabled:
-                return self.extram[(address - 0xa000) + self.ram_offset]
+                return self.ext_bank[address - 0xa000]
             else:
                 log.error('EXTRAM DISABLED')
                 return 0
@@ -82,12 +94,39 @@ class RAMBank:
             self.vram[address - 0x8000] = byte & 0xff
         elif address < 0xc000:
             if self.extram_enabled and self.extram is not None:
-                self.extram[(address - 0xa000) + self.ram_offset] = byte & 0xff
+                self.ext_bank[address - 0xa000] = byte & 0xff
         elif address < 0xe000:
             self.wram[address - 0xc000] = byte & 0xff
         else:
             log.error('invalid write to ram')
 
+    def read_block(self, address, length):
+        """
+        Read length bytes starting at address.
+
+        Parameters
+        ----------
+        address : int
+            Address in range 0x8000-0xdfff
+        length : int
+            number of bytes, must stay in one area
+        Returns
+        -------
+        bytes-like
+            bytes read
+        """
+        if address < 0xa000:
+            address -= 0x8000
+            return self.vram[address:address + length]
+        elif address < 0xc000:
+            if self.extram is None or not self.extram_enabled:
+                return bytearray(length)
+            address -= 0xa000
+            return self.ext_bank[address:address + length]
+        else:
+            address -= 0xc000
+            return self.wram[address:address + length]
+
     def set_ext_ram_enable(self, is_enabled):
         """
         Enables/Disables access to External ram
@@ -96,14 +135,47 @@ class RAMBank:
             log.debug('RAM ENABLED')
         else:
             log.debug('RAM DISABLED')
+            # games disable ram once done saving
+            if self.save is not None and self.extram_enabled:
+                self.save.request_flush()
         self.extram_enabled = is_enabled
 
+    def set_battery(self, save):
+        """
+        Backs extram with the memory mapped save file save.
+        """
+        if self.extram is None:
+            return
+        self.save = save
+        # an MBC3 clock is saved after the ram
+        self.extram = memoryview(save.data)[:len(self.extram)]
+        self.set_bank_num(0)
+
 
     def set_bank_num(self, num):
         """
-        Changes the current RAM Bank selected.
-        Only used with 4 blocks of 8kb ram. 
-        num : 0-3
+        Changes the current RAM Bank selected, swapping
+        the memoryview mapped at 0xa000.
+        num : 0-15, wraps around the number of banks
         """
-        self.ram_offset = num * self.bank_size
+        if self.extram is None:
+            return
+        self.bank_num = num
+        banks = max(1, len(self.extram) // 0x2000)
+        offset = (num % banks) * 0x2000
+        self.ext_bank = memoryview(self.extram)[offset:offset + 0x2000]
 
+    def __deepcopy__(self, memo):
+        """
+        Copies the ram. The copy of a battery backed ram holds its
+        contents but is not backed by the .sav file.
+        """
+        ram = copy.copy(self)
+        memo[id(self)] = ram
+        ram.vram = bytearray(self.vram)
+        ram.wram = bytearray(self.wram)
+        ram.save = None
+        if self.extram is not None:
+            ram.extram = bytearray(self.extram)
+            ram.set_bank_num(self.bank_num)
+        return ram
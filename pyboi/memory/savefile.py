@@ -0,0 +1,99 @@
+import mmap
+import os
+import threading
+import logging
+log = logging.getLogger(name='savefile')
+
+class SaveFile:
+    """
+    Battery backed cartridge ram, memory mapped from a .sav file.
+
+    Writes to the ram land straight in the page cache, nothing has
+    to be copied to save. A background thread flushes the mapping to
+    disk every interval seconds, or sooner when requested (the game
+    disabling its ram after saving), so the emulation never waits
+    on disk I/O.
+
+    ...
+    With no path the ram is an anonymous mapping that is never
+    written to disk (replays and other throwaway sessions).
+
+    ...
+    Attributes
+    ----------
+    path : string
+        the .sav file, None if in memory only
+    data : mmap
+        the mapped ram, used by the MBC in place of a bytearray
+    interval : float
+        seconds between background flushes
+    """
+    def __init__(self, path, size, interval=5.0):
+        """
+        Map path, creating it (or growing it) to size bytes.
+
+        ...
+        Parameters
+        ----------
+        path : string
+            the .sav file, None to keep the ram in memory
+        size : int
+            size of the cartridge ram in bytes
+        interval : float
+            seconds between background flushes
+        """
+        self.path = path
+        self.interval = interval
+        self.closed = False
+        if path is None:
+            self.data = mmap.mmap(-1, size)
+            self.thread = None
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        mode = 'r+b' if os.path.isfile(path) else 'w+b'
+        with open(path, mode) as f:
+            if os.path.getsize(path) < size:
+                f.truncate(size)
+            self.data = mmap.mmap(f.fileno(), size)
+        log.info('SAVE FILE: ' + path)
+        self.flush_requested = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """ Background loop flushing the mapping. """
+        while not self.closed:
+            self.flush_requested.wait(self.interval)
+            self.flush_requested.clear()
+            self.flush()
+
+    def flush(self):
+        """ Writes dirty pages of the mapping to disk. """
+        if self.path is None:
+            return
+        try:
+            self.data.flush()
+        except (ValueError, OSError) as e:
+            log.error('could not flush ' + self.path + ': ' + str(e))
+
+    def request_flush(self):
+        """ Asks the background thread to flush now, does not block. """
+        if self.thread is not None:
+            self.flush_requested.set()
+
+    def close(self):
+        """ Stops the background thread and flushes one last time. """
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread is not None:
+            self.flush_requested.set()
+            self.thread.join()
+            self.flush()
+        try:
+            self.data.close()
+        except BufferError:
+            # an MBC still holds a view of the ram, unmapped on exit
+            pass
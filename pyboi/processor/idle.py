@@ -0,0 +1,196 @@
+import logging
+log = logging.getLogger(name='idle')
+
+# IO registers a busy wait loop may poll
+POLLED = (0xff44, 0xff41, 0xff0f, 0xff00)
+
+# opcodes allowed in a polling loop: opcode -> (length, cycles)
+# cycles are as this interpreter counts them
+LOOP_OPCODES = {
+    0x00: (1, 4),   # nop
+    0xf0: (2, 12),  # ldh a,(n)
+    0xfa: (3, 16),  # ld a,(nn)
+    0xfe: (2, 8),   # cp n
+    0xe6: (2, 8),   # and n
+    0xa7: (1, 4),   # and a
+    0xb7: (1, 4),   # or a
+    0xbf: (1, 4),   # cp a
+    0xcb: (2, 4)    # bit b,a
+}
+
+# conditional jumps that may leave the loop: opcode -> (length, cycles)
+# the cycles are for the jump not being taken
+EXIT_OPCODES = {
+    0x20: (2, 12),
+    0x28: (2, 12),
+    0x30: (2, 12),
+    0x38: (2, 12),
+    0xc2: (3, 12),
+    0xca: (3, 12),
+    0xd2: (3, 12),
+    0xda: (3, 12)
+}
+
+
+class IdleLoopDetector:
+    """
+    Detects busy wait loops polling IO registers and skips them.
+
+    A loop qualifies if it lives in ROM and its body only loads A
+    from one of the POLLED registers, tests A and conditionally
+    jumps out. Nothing but A and F is changed by such a loop, so
+    while the polled registers keep their values every iteration
+    does exactly the same thing and the cpu can jump ahead to just
+    before the next event that could change them.
+
+    ...
+    Attributes
+    ----------
+    z80 : Z80
+        the cpu whose backward jumps are checked
+    budget : function
+        returns the number of cycles until the next event (GPU mode
+        change, timer overflow...) that may change a polled register,
+        None disables the detector
+    loops : dict
+        (bank, loop head, jump address) -> cycles of one iteration
+        without the closing jump, or None if not a polling loop.
+        bank is None for loops in the bios
+    last : tuple
+        (loop, polled values) seen at the previous backward jump
+    skipped : int
+        total number of cycles skipped
+    """
+    def __init__(self, z80):
+        self.z80 = z80
+        self.budget = None
+        self.loops = {}
+        self.last = None
+        self.skipped = 0
+
+    def set_budget(self, budget):
+        """
+        Sets the function returning the cycles to the next event.
+        Detection is disabled until set.
+        """
+        self.budget = budget
+
+    def cached_loops(self):
+        """
+        Returns the loops found in rom code as (bank, loop head,
+        jump address, cycles) tuples, for the code cache.
+        """
+        return [key + (cycles,) for key, cycles in self.loops.items()
+                if key[0] is not None]
+
+    def add_cached_loops(self, loops):
+        """ Adds loops returned by cached_loops in an earlier session. """
+        for bank, head, jump, cycles in loops:
+            self.loops.setdefault((bank, head, jump), cycles)
+
+    def check(self, address, cycles):
+        """
+        Called after a backwards jump was taken.
+
+        ...
+        Parameters
+        ----------
+        address : int
+            address of the jump instruction
+        cycles : int
+            cycles the jump took
+
+        Returns
+        -------
+        int
+            number of cycles skipped, 0 if not idle
+        """
+        if self.budget is None or address >= 0x8000:
+            return 0
+        z80 = self.z80
+        mem = z80.mem
+        if address < 0x100 and mem.bios_mode:
+            bank = None
+        elif address < 0x4000:
+            bank = 0
+        else:
+            bank = mem.membanks.get_rom_bank()
+        key = (bank, z80.pc, address)
+        if key not in self.loops:
+            self.loops[key] = self.analyze(z80.pc, address)
+        loop = self.loops[key]
+        if loop is None:
+            return 0
+
+        # only skip once the polled registers were the same at the
+        # start and end of a whole iteration
+        values = (mem.read(0xff44), mem.read(0xff41),
+                  mem.read(0xff0f), mem.read(0xff00))
+        if self.last != (key, values):
+            self.last = (key, values)
+            return 0
+        if mem.pending_interrupts:
+            return 0
+
+        iteration = loop + cycles
+        # stop short of the event, this jump's cycles are not counted yet
+        iterations = (self.budget() - cycles - 1) // iteration
+        if iterations <= 0:
+            return 0
+        self.skipped += iterations * iteration
+        return iterations * iteration
+
+    def analyze(self, start, end):
+        """
+        Decodes the loop from start up to the jump at end.
+
+        ...
+        Parameters
+        ----------
+        start : int
+            loop head (target of the jump)
+        end : int
+            address of the backward jump closing the loop
+
+        Returns
+        -------
+        int
+            cycles of one iteration without the closing jump,
+            None if the loop is not a polling loop
+        """
+        read = self.z80.mem.read
+        address = start
+        cycles = 0
+        polls = False
+        while address < end:
+            opcode = read(address)
+            if opcode in LOOP_OPCODES:
+                length, op_cycles = LOOP_OPCODES[opcode]
+                if opcode == 0xf0 and 0xff00 + read(address + 1) not in POLLED:
+                    return None
+                elif opcode == 0xfa and \
+                     (read(address + 2) << 8 | read(address + 1)) not in POLLED:
+                    return None
+                elif opcode == 0xcb and read(address + 1) & 0xc7 != 0x47:
+                    # only bit b,a
+                    return None
+                polls = polls or opcode in (0xf0, 0xfa)
+            elif opcode in EXIT_OPCODES:
+                length, op_cycles = EXIT_OPCODES[opcode]
+                if length == 2:
+                    offset = read(address + 1)
+                    offset -= 0x100 if offset > 0x7f else 0
+                    target = address + 2 + offset
+                else:
+                    target = read(address + 2) << 8 | read(address + 1)
+                if start <= target <= end:
+                    # branches inside the loop, not a simple poll
+                    return None
+            else:
+                return None
+            cycles += op_cycles
+            address += length
+        if address != end or not polls:
+            return None
+        log.debug('idle loop @ ' + hex(start) + '-' + hex(end))
+        return cycles
@@ -3,6 +3,8 @@ from sqlalchemy import Column, Integer, String, PickleType
 from ..base import Base
 from ctypes import c_int8
 from enum import Enum
+from .idle import IdleLoopDetector
+import copy
 import pickle
 import logging
 logging.basicConfig(level=logging.DEBUG)
@@ -55,8 +57,18 @@ class Z80():
         stack pointer
     mem : Memory
         memory object for this processor's memory
+    timer : Timer
+        the memory's DIV/TIMA timer, advanced after each instruction
     opcodes : Dictionary
         function dictionary for dispatching the opcodes
+    idle : IdleLoopDetector
+        skips busy wait loops polling IO registers
+    interrupt_enable : bool
+        the interrupt master enable (IME) flag
+    ime_pending : bool
+        True after EI, IME is set once the next instruction ran
+    halted : bool
+        True while halted waiting for an interrupt
 
     """
 
@@ -69,8 +81,6 @@ class Z80():
 
         """
 
-        self.count = 0
-
         self.reg = [0 for _ in range(8)]
         # register index constants
         self.A = 0
@@ -96,10 +106,12 @@ class Z80():
         self.pc = 0x100
         self.sp = 0xfffe
         self.interrupt_enable = False
+        self.ime_pending = False
+        self.halted = False
         self.mem = mem
-        #timers
-        self.div_clock = 0
-        self.tima_clock = 0
+        self.timer = mem.timer
+        self.joypad = mem.joypad
+        self.idle = IdleLoopDetector(self)
         self.opcodes = {
             0x76: lambda: self.halt(),
             0xcb: lambda: self.extended_opcode(),
@@ -619,6 +631,23 @@ class Z80():
             0xbe: lambda: self.set_b_r(self.HL, 7, 0)
         }
 
+    def __deepcopy__(self, memo):
+        """
+        Copies the cpu and its memory. The opcode tables are made
+        again, bound to the copy.
+        """
+        z80 = Z80(copy.deepcopy(self.mem, memo))
+        memo[id(self)] = z80
+        z80.reg = self.reg[:]
+        z80.pc = self.pc
+        z80.sp = self.sp
+        z80.interrupt_enable = self.interrupt_enable
+        z80.ime_pending = self.ime_pending
+        z80.halted = self.halted
+        z80.idle.loops = dict(self.idle.loops)
+        z80.idle.last = self.idle.last
+        return z80
+
     def save_state(self, name, session):
         """
         Save the cpu state into the SQLAlchemy session session.
@@ -643,6 +672,18 @@ class Z80():
         session.commit()
 
 
+    def init_post_boot(self):
+        """
+        Sets the registers as the bios leaves them on a DMG, a game
+        starts at 0x100 with A = 0x01.
+        """
+        self.reg[:] = [0x01, 0x00, 0x13, 0x00, 0xd8, 0xb0, 0x01, 0x4d]
+        self.sp = 0xfffe
+        self.pc = 0x100
+        self.interrupt_enable = False
+        self.ime_pending = False
+        self.halted = False
+
     def init_boot(self):
         """
         Initializes the cpu for running the bootstrap "bios".
@@ -693,15 +734,44 @@ class Z80():
             number of clock cycles taken to execute
 
         """
+        if self.joypad.events:
+            self.joypad.update()
+        if self.halted:
+            return self.execute_halted()
         opcode = self.mem.read(self.pc)
         self.pc += 1
+        # an EI before this instruction takes effect after it
+        ime_pending = self.ime_pending
         try:
             cycles = self.opcodes[opcode]()
         except KeyError:
             log.critical('INVALID OPCODE ' + hex(opcode) + ' @ ' + hex(self.pc))
             quit()
-        cycles += self.check_interrupts()
-        self.update_timers(cycles)
+        if ime_pending and self.ime_pending:
+            self.ime_pending = False
+            self.interrupt_enable = True
+        if self.mem.pending_interrupts:
+            cycles += self.check_interrupts()
+        self.timer.tick(cycles)
+        return cycles
+
+    def execute_halted(self):
+        """
+        Lets time pass while halted. Nothing can wake the cpu before the
+        next GPU/timer event, so the clock jumps straight to it.
+
+        Returns
+        -------
+        int
+            number of clock cycles elapsed
+        """
+        if self.mem.pending_interrupts:
+            cycles = 4 + self.check_interrupts()
+        elif self.idle.budget is None:
+            cycles = 4
+        else:
+            cycles = max(4, self.idle.budget())
+        self.timer.tick(cycles)
         return cycles
 
     def extended_opcode(self):
@@ -726,57 +796,28 @@ class Z80():
 
     def check_interrupts(self):
         """
-        Checks to see if any interrupts need to be serviced
+        Services the highest priority pending interrupt if enabled.
+        Called when mem.pending_interrupts is not zero, any pending
+        interrupt wakes the cpu from halt even if IME is off.
+
+        Returns
+        -------
+        int
+            number of cycles taken
         """
-        if not self.interrupt_enable:
+        self.halted = False
+        pending = self.mem.pending_interrupts
+        if not self.interrupt_enable or not pending:
             return 0
-        ie = self.mem.read(0xffff)
-        ir = self.mem.read(0xff0f)
-        for bit in range(5):
-            if self.is_set(ie, bit) and self.is_set(ir, bit):
-                self.push_pc()
-                self.pc = 0x40 + (bit << 3)
-                ir &= ~(1 << bit) 
-                self.mem.write(ir & 0xff, 0xff0f)
-                self.interrupt_enable = False
-                return 20
-        return 0
-
-
+        # lowest bit has the highest priority
+        bit = (pending & -pending).bit_length() - 1
+        self.mem.clear_interrupt(bit)
+        self.interrupt_enable = False
+        self.push_pc()
+        self.pc = 0x40 + (bit << 3)
+        return 20
 
 
-    def update_timers(self, cycles):
-        """
-        Updates the timers, requests interrupts if needed.
-        """
-        self.div_clock += cycles
-        if self.div_clock >= 256:
-            self.div_clock = self.div_clock % 256
-            self.mem.inc_div()
-        tima_ctrl = self.mem.read(0xff07)
-        if tima_ctrl & 0x4 == 0:
-            self.tima_clock = 0
-        else:
-            self.tima_clock += cycles 
-            rate = self.get_tima_rate(tima_ctrl)
-            if self.tima_clock >= rate:
-                self.tima_clock = self.tima_clock % rate
-                self.mem.inc_tima()
-        
-        
-    def get_tima_rate(self, ctrl):
-        """
-        Gets the increment rate from tima ctrl.
-        """
-        speed = ctrl & 0x3
-        if speed == 0:
-            return 1024
-        elif speed == 1:
-            return 16
-        elif speed == 2:
-            return 64
-        else:
-            return 256
 
 
     def request_interrupt(self, num):
@@ -788,9 +829,7 @@ class Z80():
                3 - Serial
                4 - Joypad
         """
-        ir = self.mem.read(0xff0f)
-        ir |= 1 << num
-        self.mem.write(ir, 0xff0f)
+        self.mem.request_interrupt(num)
 
 
 
@@ -1561,8 +1600,11 @@ class Z80():
         """
         Jump to nn.
         """
+        address = self.pc - 1
         val = self.mem.read_word(self.pc)
         self.pc = val
+        if val <= address:
+            return 12 + self.idle.check(address, 12)
         return 12
 
     def jump_cc(self, isSet, flag, immmediate_jump=False):
@@ -1610,6 +1652,8 @@ class Z80():
         val = c_int8(self.mem.read(self.pc)).value
         self.pc += 1
         self.pc += val
+        if val < 0:
+            return 8 + self.idle.check(self.pc - val - 2, 8)
         return 8
 
     def dec_adjust(self):
@@ -1978,16 +2022,26 @@ class Z80():
         log.critical("IMPLEMENT STOP")
         return 0
 
-    #TODO
     def disable_interrupts(self):
+        """ Disables interrupts (DI), cancels a pending EI. """
         self.interrupt_enable = False
+        self.ime_pending = False
         return 4
 
-    #TODO
     def enable_interrupts(self):
-        self.interrupt_enable = True
+        """
+        Enables interrupts (EI). Interrupts are only serviced after
+        the instruction following EI, execute_opcode sets IME once
+        that instruction ran.
+
+        Returns
+        -------
+        int
+            cycles taken
+        """
+        self.ime_pending = True
         return 4
-        
+
 
     def call(self):
         """
@@ -2285,7 +2339,6 @@ class Z80():
         self.pc = offset
         return 16
     
-    #TODO
     def ret_interrupts(self):
         """
         Returns and enables interrupts
@@ -2295,8 +2348,11 @@ class Z80():
 
     def halt(self):
         """
-        TODO
+        Halts the cpu until an interrupt is pending.
+        Does nothing if one already is.
         """
+        if not self.mem.pending_interrupts:
+            self.halted = True
         return 4
     
 
@@ -0,0 +1,187 @@
+from array import array
+from .profiler import REGIONS
+import logging
+log = logging.getLogger(name='memprofiler')
+
+# names of the commonly polled IO registers
+IO_NAMES = {
+    0xff00: 'P1',
+    0xff01: 'SB',
+    0xff02: 'SC',
+    0xff04: 'DIV',
+    0xff05: 'TIMA',
+    0xff06: 'TMA',
+    0xff07: 'TAC',
+    0xff0f: 'IF',
+    0xff40: 'LCDC',
+    0xff41: 'STAT',
+    0xff42: 'SCY',
+    0xff43: 'SCX',
+    0xff44: 'LY',
+    0xff45: 'LYC',
+    0xff46: 'DMA',
+    0xff47: 'BGP',
+    0xff48: 'OBP0',
+    0xff49: 'OBP1',
+    0xff4a: 'WY',
+    0xff4b: 'WX',
+    0xffff: 'IE'
+}
+
+
+class MemoryProfiler:
+    """
+    Opt-in access counters for the memory subsystem.
+
+    While attached the memory's reads go through a counting wrapper
+    (Memory.wrap_read) and write is shadowed by a counting version on
+    the instance, detaching removes both again. Every access through
+    read/write is counted, the cpu's and the GPU's register and tile
+    reads. The OAM DMA copies its page in one slice, it isn't counted.
+
+    ...
+    Attributes
+    ----------
+    reads : array
+        read count for each of the 0x10000 addresses
+    writes : array
+        write count for each of the 0x10000 addresses
+    """
+    def __init__(self):
+        self.mem = None
+        self.read_wrapper = None
+        self.saved_write = None
+        self.reset()
+
+    def reset(self):
+        """ Clears all the counters. """
+        self.reads = array('Q', bytes(8 * 0x10000))
+        self.writes = array('Q', bytes(8 * 0x10000))
+
+    def attach(self, mem):
+        """
+        Start counting accesses to mem.
+
+        ...
+        Parameters
+        ----------
+        mem : Memory
+            memory to instrument
+        """
+        if self.mem is not None:
+            log.error('memory profiler already attached')
+            return
+        self.mem = mem
+        reads = self.reads
+        writes = self.writes
+
+        def count_reads(read):
+            def counted_read(address):
+                reads[address & 0xffff] += 1
+                return read(address)
+            return counted_read
+
+        # write is wrapped as it is now, put back as it was
+        self.saved_write = mem.__dict__.get('write')
+        write = mem.write
+
+        def counted_write(byte, address):
+            writes[address & 0xffff] += 1
+            write(byte, address)
+
+        self.read_wrapper = count_reads
+        mem.wrap_read(count_reads)
+        mem.write = counted_write
+
+    def detach(self):
+        """ Stop counting, the memory goes back to what it ran before. """
+        if self.mem is None:
+            return
+        self.mem.unwrap_read(self.read_wrapper)
+        if self.saved_write is None:
+            del self.mem.write
+        else:
+            self.mem.write = self.saved_write
+        self.mem = None
+        self.read_wrapper = None
+        self.saved_write = None
+
+    def heatmap(self, bucket=0x100, writes=False):
+        """
+        Exports the access counts summed into buckets.
+
+        ...
+        Parameters
+        ----------
+        bucket : int
+            number of addresses summed into each entry,
+            the default gives one entry per 256 byte page
+        writes : bool
+            if True counts writes instead of reads
+
+        Returns
+        -------
+        list of ints
+            0x10000 // bucket access counts
+        """
+        counts = self.writes if writes else self.reads
+        return [sum(counts[start:start + bucket])
+                for start in range(0, 0x10000, bucket)]
+
+    def region_counts(self):
+        """
+        Returns a list of (region name, reads, writes) for every
+        region of the address space.
+        """
+        return [(name, sum(self.reads[first:last + 1]),
+                 sum(self.writes[first:last + 1]))
+                for name, first, last in REGIONS]
+
+    def io_counts(self):
+        """
+        Returns a list of (address, reads, writes) for every
+        IO register that was accessed, busiest first.
+        """
+        registers = list(range(0xff00, 0xff80)) + [0xffff]
+        counts = [(address, self.reads[address], self.writes[address])
+                  for address in registers
+                  if self.reads[address] or self.writes[address]]
+        counts.sort(key=lambda item: item[1] + item[2], reverse=True)
+        return counts
+
+    def summary(self, top=10):
+        """
+        Generates a table of accesses per region and the
+        busiest IO registers.
+
+        ...
+        Parameters
+        ----------
+        top : int
+            number of IO registers to list
+
+        Returns
+        -------
+        string
+            the summary table
+        """
+        total = sum(self.reads) + sum(self.writes)
+        lines = ['memory accesses: ' + str(total)]
+        if total == 0:
+            return lines[0]
+
+        lines.append('')
+        lines.append('%-10s %12s %12s %7s' % ('region', 'reads', 'writes', '%'))
+        for name, reads, writes in self.region_counts():
+            if reads or writes:
+                lines.append('%-10s %12d %12d %6.2f%%' %
+                             (name, reads, writes,
+                              100 * (reads + writes) / total))
+
+        lines.append('')
+        lines.append('%-12s %12s %12s %7s' % ('io register', 'reads', 'writes', '%'))
+        for address, reads, writes in self.io_counts()[:top]:
+            name = '%04x %s' % (address, IO_NAMES.get(address, ''))
+            lines.append('%-12s %12d %12d %6.2f%%' %
+                         (name, reads, writes, 100 * (reads + writes) / total))
+        return '\n'.join(lines)
@@ -0,0 +1,267 @@
+from time import perf_counter
+import logging
+log = logging.getLogger(name='profiler')
+
+# named regions of the GB address space, (name, first, last)
+REGIONS = (
+    ('ROM0', 0x0000, 0x3fff),
+    ('ROMX', 0x4000, 0x7fff),
+    ('VRAM', 0x8000, 0x9fff),
+    ('SRAM', 0xa000, 0xbfff),
+    ('WRAM', 0xc000, 0xdfff),
+    ('ECHO', 0xe000, 0xfdff),
+    ('OAM', 0xfe00, 0xfe9f),
+    ('UNUSED', 0xfea0, 0xfeff),
+    ('IO', 0xff00, 0xff7f),
+    ('HRAM', 0xff80, 0xfffe),
+    ('IE', 0xffff, 0xffff)
+)
+
+# jp/jr opcodes, a backwards jump taken by one of these closes a loop
+JUMP_OPCODES = (0x18, 0x20, 0x28, 0x30, 0x38,
+                0xc3, 0xc2, 0xca, 0xd2, 0xda)
+
+
+def region_name(address):
+    """
+    Returns the name of the memory region containing address.
+    """
+    for name, first, last in REGIONS:
+        if first <= address <= last:
+            return name
+    return 'INVALID'
+
+
+class Profiler:
+    """
+    Opt-in execution profiler for the Z80.
+
+    While attached every entry of the cpu's opcode tables is
+    wrapped with a counting/timing version. Detaching puts the
+    original handlers back, so when profiling is off the cpu
+    runs exactly the same code as if it never existed.
+
+    ...
+    Attributes
+    ----------
+    op_counts, op_time : lists
+        executions and host seconds per base opcode
+    cb_counts, cb_time : lists
+        executions and host seconds per 0xcb prefixed opcode
+    pc_counts, pc_time : dicts
+        executions and host seconds per (bank, address),
+        bank is None for code running outside of ROM
+    bank_counts, bank_time : dicts
+        executions and host seconds per rom bank
+    loops : dict
+        (bank, target, jump address) -> times a backwards
+        jump was taken
+    """
+    def __init__(self):
+        self.z80 = None
+        self.saved_opcodes = None
+        self.saved_ext_opcodes = None
+        self.reset()
+
+    def reset(self):
+        """ Clears all collected statistics. """
+        self.op_counts = [0] * 0x100
+        self.op_time = [0.0] * 0x100
+        self.cb_counts = [0] * 0x100
+        self.cb_time = [0.0] * 0x100
+        self.pc_counts = {}
+        self.pc_time = {}
+        self.bank_counts = {}
+        self.bank_time = {}
+        self.loops = {}
+
+    def attach(self, z80):
+        """
+        Start profiling z80 by wrapping its opcode handlers.
+
+        ...
+        Parameters
+        ----------
+        z80 : Z80
+            cpu to profile
+        """
+        if self.z80 is not None:
+            log.error('profiler already attached')
+            return
+        self.z80 = z80
+        self.saved_opcodes = z80.opcodes
+        self.saved_ext_opcodes = z80.ext_opcodes
+        opcodes = dict(z80.opcodes)
+        for opcode, handler in z80.opcodes.items():
+            # the 0xcb prefix is accounted for by the ext opcode
+            if opcode != 0xcb:
+                opcodes[opcode] = self.wrap(opcode, handler, False)
+        ext_opcodes = {}
+        for opcode, handler in z80.ext_opcodes.items():
+            ext_opcodes[opcode] = self.wrap(opcode, handler, True)
+        z80.opcodes = opcodes
+        z80.ext_opcodes = ext_opcodes
+
+    def detach(self):
+        """
+        Stop profiling, restores the original opcode handlers.
+        """
+        if self.z80 is None:
+            return
+        self.z80.opcodes = self.saved_opcodes
+        self.z80.ext_opcodes = self.saved_ext_opcodes
+        self.z80 = None
+        self.saved_opcodes = None
+        self.saved_ext_opcodes = None
+
+    def wrap(self, opcode, handler, extended):
+        """
+        Builds a profiled version of an opcode handler.
+
+        ...
+        Parameters
+        ----------
+        opcode : int
+            opcode the handler executes
+        handler : function
+            the original handler
+        extended : bool
+            True if opcode is 0xcb prefixed
+
+        Returns
+        -------
+        function
+            handler recording stats before returning the cycles
+        """
+        z80 = self.z80
+        mem = z80.mem
+        counts = self.cb_counts if extended else self.op_counts
+        times = self.cb_time if extended else self.op_time
+        pc_counts = self.pc_counts
+        pc_time = self.pc_time
+        bank_counts = self.bank_counts
+        bank_time = self.bank_time
+        loops = self.loops
+        length = 2 if extended else 1
+        is_jump = not extended and opcode in JUMP_OPCODES
+
+        def profiled():
+            address = z80.pc - length
+            if address < 0x4000:
+                bank = 0
+            elif address < 0x8000:
+                # looked up now, the banks can be replaced after attach
+                bank = mem.membanks.get_rom_bank()
+            else:
+                bank = None
+            start = perf_counter()
+            cycles = handler()
+            elapsed = perf_counter() - start
+            counts[opcode] += 1
+            times[opcode] += elapsed
+            key = (bank, address)
+            pc_counts[key] = pc_counts.get(key, 0) + 1
+            pc_time[key] = pc_time.get(key, 0.0) + elapsed
+            bank_counts[bank] = bank_counts.get(bank, 0) + 1
+            bank_time[bank] = bank_time.get(bank, 0.0) + elapsed
+            if is_jump and z80.pc <= address:
+                loop = (bank, z80.pc, address)
+                loops[loop] = loops.get(loop, 0) + 1
+            return cycles
+
+        return profiled
+
+    def total_instructions(self):
+        """ Returns the number of instructions profiled. """
+        return sum(self.op_counts) + sum(self.cb_counts)
+
+    def region_counts(self):
+        """
+        Returns a dict of region name -> [count, time] of the
+        instructions executed from each memory region.
+        """
+        regions = {}
+        for key, count in self.pc_counts.items():
+            stats = regions.setdefault(region_name(key[1]), [0, 0.0])
+            stats[0] += count
+            stats[1] += self.pc_time[key]
+        return regions
+
+    def report(self, top=10):
+        """
+        Generates a human readable hot-spot report.
+
+        ...
+        Parameters
+        ----------
+        top : int
+            number of entries to list in each section
+
+        Returns
+        -------
+        string
+            the report
+        """
+        total = self.total_instructions()
+        lines = ['instructions profiled: ' + str(total)]
+        if total == 0:
+            return lines[0]
+
+        ops = [(self.op_counts[op], self.op_time[op], '%02x' % op)
+               for op in range(0x100) if self.op_counts[op]]
+        ops += [(self.cb_counts[op], self.cb_time[op], 'cb %02x' % op)
+                for op in range(0x100) if self.cb_counts[op]]
+        ops.sort(reverse=True)
+        lines.append('')
+        lines.append('hot opcodes')
+        lines.append('%-8s %12s %7s %12s' % ('opcode', 'count', '%', 'time ms'))
+        for count, elapsed, name in ops[:top]:
+            lines.append('%-8s %12d %6.2f%% %12.3f' %
+                         (name, count, 100 * count / total, elapsed * 1000))
+
+        addresses = sorted(self.pc_counts.items(),
+                           key=lambda item: item[1], reverse=True)
+        lines.append('')
+        lines.append('hot addresses')
+        lines.append('%-10s %12s %7s %12s' % ('address', 'count', '%', 'time ms'))
+        for key, count in addresses[:top]:
+            lines.append('%-10s %12d %6.2f%% %12.3f' %
+                         (self.format_address(*key), count,
+                          100 * count / total, self.pc_time[key] * 1000))
+
+        loops = sorted(self.loops.items(),
+                       key=lambda item: item[1], reverse=True)
+        lines.append('')
+        lines.append('hot loops')
+        lines.append('%-21s %12s %7s' % ('loop', 'iterations', 'bytes'))
+        for (bank, target, address), count in loops[:top]:
+            span = self.format_address(bank, target) + '-' + \
+                   self.format_address(bank, address)
+            lines.append('%-21s %12d %7d' % (span, count, address - target + 1))
+
+        regions = sorted(self.region_counts().items(),
+                         key=lambda item: item[1][0], reverse=True)
+        lines.append('')
+        lines.append('memory regions')
+        lines.append('%-10s %12s %7s %12s' % ('region', 'count', '%', 'time ms'))
+        for name, (count, elapsed) in regions:
+            lines.append('%-10s %12d %6.2f%% %12.3f' %
+                         (name, count, 100 * count / total, elapsed * 1000))
+
+        banks = sorted(self.bank_counts.items(),
+                       key=lambda item: item[1], reverse=True)
+        lines.append('')
+        lines.append('rom banks')
+        lines.append('%-10s %12s %7s %12s' % ('bank', 'count', '%', 'time ms'))
+        for bank, count in banks:
+            name = 'RAM' if bank is None else '%02x' % bank
+            lines.append('%-10s %12d %6.2f%% %12.3f' %
+                         (name, count, 100 * count / total,
+                          self.bank_time[bank] * 1000))
+        return '\n'.join(lines)
+
+    def format_address(self, bank, address):
+        """ Formats an address as bank:address. """
+        if bank is None:
+            return '--:%04x' % address
+        return '%02x:%04x' % (bank, address)
@@ -0,0 +1,23 @@
+import argparse
+import logging
+import sys
+from .movie import Movie, replay
+
+parser = argparse.ArgumentParser(prog='python -m pyboi.replay',
+                                 description='replay a movie headless')
+parser.add_argument('movie', help='the recorded movie')
+parser.add_argument('rom', help='the rom the movie was recorded with')
+parser.add_argument('--video', action='store_true',
+                    help='draw every frame, not only the checkpoints')
+args = parser.parse_args()
+
+logging.disable(logging.CRITICAL)
+movie = Movie.load(args.movie)
+result = replay(movie, args.rom, args.video) if movie else None
+if result is None:
+    sys.exit(2)
+print('{frames} frames in {seconds}s ({fps} fps), '
+      '{checkpoints} checkpoints matched'.format(**result))
+if result['diverged'] is not None:
+    print('DIVERGED at frame {}'.format(result['diverged']))
+    sys.exit(1)
@@ -0,0 +1,271 @@
+import struct
+import time
+import zlib
+import logging
+from ..joypad.joypad import BUTTONS
+log = logging.getLogger(name='movie')
+
+MAGIC = b'PYBOIMOV'
+VERSION = 1
+# magic, version, rom sha1, rtc seconds (-1 if none), checkpoint
+# interval, frames, battery ram size, boot
+HEADER = struct.Struct('<8sB20sqIIIB')
+# Pyboi.booted of the recorded session, by its index in the file
+BOOTS = (None, 'state', 'bios')
+CLOCK_RATE = 4194304
+BUTTON_NAMES = tuple(BUTTONS)
+
+
+def write_varint(out, value):
+    """ Appends value to out as an unsigned LEB128 varint. """
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """ Returns (value, next position) of the varint at data[pos]. """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def frame_hash(gb):
+    """ Returns the crc32 of the frame currently on screen. """
+    return zlib.crc32(gb.gpu.get_frame_buffer())
+
+
+def rtc_of(mem):
+    """ Returns the cartridge's real time clock, None if it has none. """
+    return getattr(mem.membanks.bank, 'rtc', None)
+
+
+def emulated_clock(timer):
+    """ Returns a time source counting emulated seconds from power on. """
+    return lambda: timer.clock / CLOCK_RATE
+
+
+class Movie:
+    """
+    A recorded session: the initial state and the input log.
+
+    The initial state is the power on state of the rom (identified by
+    its hash), booted the same way as when recorded, plus the battery
+    ram and the real time clock, the input is (cycle, button, pressed)
+    events applied at those cycles. Frame hashes every interval frames
+    are the checkpoints a replay is verified against.
+
+    ...
+    Attributes
+    ----------
+    rom_hash : string
+        sha1 of the rom
+    ram : bytes
+        battery ram at power on, empty if none
+    rtc : int
+        seconds on the real time clock at power on, None if none
+    boot : string
+        how the session was booted, None, 'state' or 'bios'
+        (see Pyboi.boot)
+    events : list of tuples
+        (cycle, button, pressed) in order
+    interval : int
+        frames between checkpoints
+    checkpoints : list of ints
+        crc32 of frames interval, 2 * interval, ...
+    frames : int
+        number of frames recorded
+    """
+    def __init__(self, rom_hash, ram=b'', rtc=None, interval=60, boot=None):
+        self.rom_hash = rom_hash
+        self.ram = ram
+        self.rtc = rtc
+        self.boot = boot
+        self.events = []
+        self.interval = interval
+        self.checkpoints = []
+        self.frames = 0
+
+    def save(self, path):
+        """ Writes the movie to path in the binary format. """
+        out = bytearray(HEADER.pack(
+            MAGIC, VERSION, bytes.fromhex(self.rom_hash),
+            -1 if self.rtc is None else self.rtc,
+            self.interval, self.frames, len(self.ram),
+            BOOTS.index(self.boot)))
+        ram = zlib.compress(self.ram)
+        write_varint(out, len(ram))
+        out += ram
+        write_varint(out, len(self.events))
+        last = 0
+        for cycle, button, pressed in self.events:
+            # cycle deltas, then the button index with bit 3 pressed
+            write_varint(out, cycle - last)
+            out.append(BUTTON_NAMES.index(button) | (0x8 if pressed else 0))
+            last = cycle
+        write_varint(out, len(self.checkpoints))
+        for checkpoint in self.checkpoints:
+            out += struct.pack('<I', checkpoint)
+        with open(path, 'wb') as f:
+            f.write(out)
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a movie written by save, None if it isn't one. """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size or data[:8] != MAGIC:
+            log.error(path + ' is not a pyboi movie')
+            return None
+        magic, version, sha1, rtc, interval, frames, ram_size, boot = \
+            HEADER.unpack_from(data)
+        if version != VERSION:
+            log.error('unsupported movie version ' + str(version))
+            return None
+        pos = HEADER.size
+        length, pos = read_varint(data, pos)
+        ram = zlib.decompress(data[pos:pos + length])
+        pos += length
+        if len(ram) != ram_size:
+            log.error(path + ' has a corrupt battery ram')
+            return None
+        movie = cls(sha1.hex(), ram, None if rtc < 0 else rtc, interval,
+                    BOOTS[boot])
+        movie.frames = frames
+        count, pos = read_varint(data, pos)
+        cycle = 0
+        for _ in range(count):
+            delta, pos = read_varint(data, pos)
+            cycle += delta
+            code = data[pos]
+            pos += 1
+            movie.events.append((cycle, BUTTON_NAMES[code & 0x7],
+                                 code & 0x8 != 0))
+        count, pos = read_varint(data, pos)
+        movie.checkpoints = list(struct.unpack_from('<%dI' % count, data, pos))
+        return movie
+
+
+class Recorder:
+    """
+    Records a Pyboi session into a Movie. Must be started at power on,
+    right after the rom is loaded and booted. The real time clock is switched to
+    emulated time so the session can be reproduced.
+
+    ...
+    Attributes
+    ----------
+    movie : Movie
+        the recording
+    """
+    def __init__(self, gb, interval=60):
+        self.gb = gb
+        mem = gb.mem
+        ram = bytes(mem.save.data) if mem.save is not None else b''
+        rtc = rtc_of(mem)
+        self.movie = Movie(mem.rom_hash, ram,
+                           None if rtc is None else rtc.seconds(), interval,
+                           gb.booted)
+        if rtc is not None:
+            rtc.set_clock(emulated_clock(mem.timer))
+            rtc.set_seconds(self.movie.rtc)
+            rtc.latch()
+        self.attach()
+
+    def attach(self):
+        """ Logs every button change, as the joypad applies it. """
+        joypad = self.gb.mem.joypad
+        timer = self.gb.mem.timer
+        events = self.movie.events
+        set_button = joypad.set_button
+
+        def record(button, pressed):
+            events.append((timer.clock, button, pressed))
+            set_button(button, pressed)
+        joypad.set_button = record
+
+    def detach(self):
+        """ Stops recording, the instance attribute shadows the method. """
+        del self.gb.mem.joypad.set_button
+
+    def end_frame(self):
+        """ Counts a frame, called after each frame is done. """
+        movie = self.movie
+        movie.frames += 1
+        if movie.frames % movie.interval == 0:
+            movie.checkpoints.append(frame_hash(self.gb))
+
+
+def replay(movie, rom, video=False):
+    """
+    Replays movie headless as fast as possible, checking the frame
+    hashes at every checkpoint.
+
+    ...
+    Parameters
+    ----------
+    movie : Movie
+        the recording
+    rom : string
+        path to the movie's rom
+    video : bool
+        draw every frame, otherwise only the frames a checkpoint
+        hashes are drawn
+
+    Returns
+    -------
+    dict
+        frames run, seconds, fps, checkpoints passed and the
+        first diverging frame (None if all matched)
+    """
+    # imported here, the emulator imports this module
+    from ..emulator.pyboi import Pyboi
+    gb = Pyboi()
+    mem = gb.mem
+    mem.serial_echo = False
+    mem.load_rom(rom)
+    if mem.rom_hash != movie.rom_hash:
+        log.error('the movie was recorded with another rom')
+        return None
+    if movie.ram:
+        mem.load_save(None)
+        mem.save.data[:] = movie.ram
+    if movie.boot is not None:
+        gb.boot(bios=movie.boot == 'bios')
+    rtc = rtc_of(mem)
+    if rtc is not None and movie.rtc is not None:
+        rtc.set_clock(emulated_clock(mem.timer))
+        rtc.set_seconds(movie.rtc)
+        rtc.latch()
+    for cycle, button, pressed in movie.events:
+        mem.joypad.push(button, pressed, cycle)
+
+    interval = movie.interval
+    diverged = None
+    checked = 0
+    start = time.time()
+    for frame in range(1, movie.frames + 1):
+        if not video:
+            # draw the two frames before a checkpoint, so every line
+            # and the window's line counter match the recording
+            gb.gpu.video_enabled = frame % interval in (0, interval - 1)
+        gb.get_frame()
+        if frame % interval == 0 and checked < len(movie.checkpoints):
+            if frame_hash(gb) != movie.checkpoints[checked]:
+                diverged = frame
+                break
+            checked += 1
+    seconds = time.time() - start
+    gb.close()
+    return {'frames': frame if movie.frames else 0,
+            'seconds': round(seconds, 3),
+            'fps': round(frame / seconds, 1) if movie.frames else 0.0,
+            'checkpoints': checked,
+            'diverged': diverged}
@@ -0,0 +1,228 @@
+import argparse
+import importlib
+import logging
+from collections import deque
+from ..processor.z80 import Z80
+from ..memory.mem import Memory
+from ..gpu.gpu import GPU
+from ..disasm.decoder import decode
+log = logging.getLogger(name='differential')
+
+REG_NAMES = ('A', 'B', 'C', 'D', 'E', 'F', 'H', 'L')
+
+
+def load_class(spec):
+    """ Returns the class named by 'package.module:Class'. """
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def describe_flags(f):
+    """ Returns the Z N H C flags of register F as a string. """
+    return ''.join(name if f & bit else '-' for name, bit in
+                   (('Z', 0x80), ('N', 0x40), ('H', 0x20), ('C', 0x10)))
+
+
+class Machine:
+    """
+    A cpu/memory pair run headless, with every memory write logged.
+    Both are booted to the post-bios state, as Pyboi.boot does.
+
+    ...
+    Attributes
+    ----------
+    cpu : Z80 or a candidate
+        anything with execute_opcode(), init_post_boot(), reg, pc and sp
+    mem : Memory or a candidate
+        anything with load_rom() and init_post_boot(), its write()
+        is shadowed to log the writes
+    writes : list of tuples
+        (address, byte) written since the last compare
+    """
+    def __init__(self, cpu_class, memory_class, rom):
+        self.mem = memory_class()
+        self.mem.serial_echo = False
+        self.cpu = cpu_class(self.mem)
+        self.gpu = GPU(self.mem)
+        self.gpu.video_enabled = False
+        idle = getattr(self.cpu, 'idle', None)
+        if idle is not None:
+            idle.set_budget(self.idle_budget)
+        self.mem.load_rom(rom)
+        self.mem.init_post_boot()
+        self.cpu.init_post_boot()
+        self.writes = []
+        writes = self.writes
+        write = self.mem.write
+
+        def logged_write(byte, address):
+            writes.append((address, byte & 0xff))
+            write(byte, address)
+        self.mem.write = logged_write
+
+    def idle_budget(self):
+        """ Same idle budget as Pyboi. """
+        return min(self.gpu.cycles_to_next_mode(),
+                   self.mem.timer.cycles_to_event())
+
+    def step(self):
+        """ Executes one instruction, returns its cycles. """
+        cycles = self.cpu.execute_opcode()
+        self.gpu.update_graphics(cycles)
+        return cycles
+
+    def state(self):
+        """ Returns the registers compared after each step/block. """
+        cpu = self.cpu
+        return (tuple(cpu.reg), cpu.pc, cpu.sp,
+                getattr(cpu, 'interrupt_enable', None),
+                getattr(cpu, 'halted', None))
+
+    def format_state(self):
+        regs, pc, sp, ime, halted = self.state()
+        text = ' '.join('{}={:02x}'.format(name, value)
+                        for name, value in zip(REG_NAMES, regs))
+        return '{} PC={:04x} SP={:04x} IME={} HALT={} flags {}'.format(
+            text, pc, sp, ime, halted, describe_flags(regs[5]))
+
+
+class Lockstep:
+    """
+    Runs the reference Z80/Memory and a candidate on the same rom in
+    lockstep, comparing registers, flags and memory writes after every
+    block of instructions.
+
+    ...
+    Attributes
+    ----------
+    context : deque
+        (instruction number, pc, rom bank, bytes at pc) of the last
+        instructions the reference executed
+    """
+    def __init__(self, rom, cpu_class=Z80, memory_class=Memory,
+                 context=16):
+        self.rom = rom
+        self.cpu_class = cpu_class
+        self.memory_class = memory_class
+        self.context_size = context
+        self.reset()
+
+    def reset(self):
+        self.reference = Machine(Z80, Memory, self.rom)
+        self.candidate = Machine(self.cpu_class, self.memory_class, self.rom)
+        self.context = deque(maxlen=self.context_size)
+        self.steps = 0
+
+    def remember(self):
+        """ Adds the instruction about to run to the context window. """
+        mem = self.reference.mem
+        pc = self.reference.cpu.pc
+        code = bytes(mem.read((pc + i) & 0xffff) for i in range(3))
+        self.context.append((self.steps, pc, mem.membanks.get_rom_bank(),
+                             code))
+
+    def run_block(self, block):
+        """ Steps both machines block instructions, True if they agree. """
+        reference = self.reference
+        candidate = self.candidate
+        for _ in range(block):
+            self.remember()
+            reference.step()
+            candidate.step()
+            self.steps += 1
+        same = reference.state() == candidate.state() and \
+            reference.writes == candidate.writes
+        if same:
+            del reference.writes[:]
+            del candidate.writes[:]
+        return same
+
+    def run(self, steps, block=1):
+        """
+        Runs up to steps instructions. On a divergence inside a block
+        the run is repeated one instruction at a time to find the
+        exact instruction. Bigger blocks are faster, but a difference
+        that is overwritten within the block (e.g. flags) is missed.
+
+        Returns
+        -------
+        int
+            the instruction number that diverged, None if none did
+        """
+        while self.steps < steps:
+            size = min(block, steps - self.steps)
+            if self.run_block(size):
+                continue
+            if size == 1:
+                return self.steps - 1
+            # machines are deterministic, replay up to the block
+            start = self.steps - size
+            self.reset()
+            self.run(start, block)
+            return self.run(start + size, 1)
+        return None
+
+    def report(self, diverged):
+        """ Returns a text report of the divergence. """
+        reference = self.reference
+        candidate = self.candidate
+        lines = ['DIVERGED at instruction {}'.format(diverged),
+                 '  reference: ' + reference.format_state(),
+                 '  candidate: ' + candidate.format_state()]
+        ref_regs = reference.state()[0]
+        cand_regs = candidate.state()[0]
+        differing = [name for name, a, b in zip(REG_NAMES, ref_regs, cand_regs)
+                     if a != b]
+        if differing:
+            lines.append('  registers: ' + ' '.join(differing))
+        if reference.writes != candidate.writes:
+            lines.append('  writes: reference ' + self.format_writes(
+                reference.writes))
+            lines.append('          candidate ' + self.format_writes(
+                candidate.writes))
+        lines.append('context:')
+        for steps, pc, bank, code in self.context:
+            marker = '>' if steps == diverged else ' '
+            instruction = decode(lambda address: code[address - pc], pc)
+            lines.append('{} {:8} {:02x}:{:04x}  {:8}  {}'.format(
+                marker, steps, bank, pc,
+                code[:instruction.length].hex(' '), instruction.text))
+        return '\n'.join(lines)
+
+    def format_writes(self, writes):
+        return ' '.join('{:04x}={:02x}'.format(address, byte)
+                        for address, byte in writes) or '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pyboi.testrunner.differential',
+        description='run a candidate cpu/memory in lockstep with pyboi')
+    parser.add_argument('rom')
+    parser.add_argument('--cpu', default=None,
+                        help='candidate cpu class, package.module:Class')
+    parser.add_argument('--memory', default=None,
+                        help='candidate memory class, package.module:Class')
+    parser.add_argument('--steps', type=int, default=1000000,
+                        help='instructions to run')
+    parser.add_argument('--block', type=int, default=1,
+                        help='instructions between compares')
+    parser.add_argument('--context', type=int, default=16,
+                        help='instructions shown before a divergence')
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    cpu_class = load_class(args.cpu) if args.cpu else Z80
+    memory_class = load_class(args.memory) if args.memory else Memory
+    lockstep = Lockstep(args.rom, cpu_class, memory_class, args.context)
+    diverged = lockstep.run(args.steps, args.block)
+    if diverged is None:
+        print('{} instructions in lockstep, no divergence'.format(
+            lockstep.steps))
+        return 0
+    print(lockstep.report(diverged))
+    return 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
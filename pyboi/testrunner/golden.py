@@ -0,0 +1,176 @@
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import zlib
+import numpy as np
+from .runner import find_roms
+log = logging.getLogger(name='golden')
+
+FRAME_SIZE = 23040
+# shade 0-3 -> gray level for the diff images
+GRAYS = np.array([0xff, 0xaa, 0x55, 0x00], dtype=np.uint8)
+
+
+def golden_paths(golden_dir, name):
+    """ Returns the (hashes, frames) files of rom name. """
+    return (os.path.join(golden_dir, name + '.json'),
+            os.path.join(golden_dir, name + '.frames.z'))
+
+
+def run_frames(path, frames):
+    """
+    Runs rom path headless for frames frames.
+
+    Returns
+    -------
+    tuple
+        (rom sha1, list of frame crc32s, the frames concatenated)
+    """
+    from ..emulator.pyboi import Pyboi
+    logging.disable(logging.CRITICAL)
+    gb = Pyboi()
+    gb.mem.serial_echo = False
+    gb.mem.load_rom(path)
+    gb.boot()
+    hashes = []
+    data = bytearray()
+    for _ in range(frames):
+        frame = gb.get_frame()
+        hashes.append(zlib.crc32(frame))
+        data += frame
+    gb.close()
+    return gb.mem.rom_hash, hashes, data
+
+
+def write_diff(path, expected, actual):
+    """
+    Writes a PPM image of the expected frame, the actual frame and
+    their difference (differing pixels red) side by side.
+    """
+    expected = np.frombuffer(expected, dtype=np.uint8).reshape(144, 160)
+    actual = np.frombuffer(actual, dtype=np.uint8).reshape(144, 160)
+    image = np.zeros((144, 160 * 3, 3), dtype=np.uint8)
+    image[:, :160] = GRAYS[expected][:, :, None]
+    image[:, 160:320] = GRAYS[actual][:, :, None]
+    image[:, 320:] = (GRAYS[actual] // 4)[:, :, None]
+    image[:, 320:][expected != actual] = (0xff, 0x00, 0x00)
+    with open(path, 'wb') as f:
+        f.write(b'P6 480 144 255\n')
+        f.write(image.tobytes())
+
+
+def check_rom(path, frames, golden_dir, update=False, dump_dir=None):
+    """
+    Runs rom path and compares its frame hashes with the golden ones,
+    or stores them with update. Runs in the pool's workers.
+
+    ...
+    Parameters
+    ----------
+    path : string
+        the rom
+    frames : int
+        frames to run
+    golden_dir : string
+        directory of the golden hashes/frames
+    update : bool
+        store the frames as the new golden ones
+    dump_dir : string
+        write a diff image of the first mismatching frame here
+
+    Returns
+    -------
+    dict
+        name, status (match/mismatch/missing/updated/error), the
+        first mismatching frame and the error, if any
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    result = {'name': name, 'status': 'match', 'frame': None}
+    rom_hash, hashes, data = run_frames(path, frames)
+    hash_path, frames_path = golden_paths(golden_dir, name)
+    if update:
+        os.makedirs(golden_dir, exist_ok=True)
+        with open(hash_path, 'w') as f:
+            json.dump({'rom': rom_hash, 'frames': frames,
+                       'hashes': hashes}, f)
+        with open(frames_path, 'wb') as f:
+            # consecutive frames are mostly equal, zlib's window
+            # covers the previous frame
+            f.write(zlib.compress(bytes(data), 9))
+        result['status'] = 'updated'
+        return result
+    if not os.path.isfile(hash_path):
+        result['status'] = 'missing'
+        return result
+    with open(hash_path) as f:
+        golden = json.load(f)
+    if golden['rom'] != rom_hash:
+        result['status'] = 'error'
+        result['error'] = 'golden hashes are for another rom'
+        return result
+    for frame, (expected, actual) in enumerate(zip(golden['hashes'], hashes)):
+        if expected != actual:
+            result['status'] = 'mismatch'
+            result['frame'] = frame
+            break
+    else:
+        if len(golden['hashes']) < frames:
+            result['status'] = 'missing'
+        return result
+
+    if dump_dir is not None and os.path.isfile(frames_path):
+        os.makedirs(dump_dir, exist_ok=True)
+        with open(frames_path, 'rb') as f:
+            golden_frames = zlib.decompress(f.read())
+        frame = result['frame']
+        start = frame * FRAME_SIZE
+        image = os.path.join(dump_dir, '{}_{:05}.ppm'.format(name, frame))
+        write_diff(image, golden_frames[start:start + FRAME_SIZE],
+                   data[start:start + FRAME_SIZE])
+        result['diff'] = image
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pyboi.testrunner.golden',
+                                     description='compare rom frames with '
+                                                 'golden frame hashes')
+    parser.add_argument('path', help='rom or directory of roms')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--golden', default='golden',
+                        help='directory of the golden hashes')
+    parser.add_argument('--update', action='store_true',
+                        help='store the current frames as golden')
+    parser.add_argument('--dump', default='golden_diff',
+                        help='directory for diff images of mismatches')
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    roms = find_roms(args.path)
+    if not roms:
+        print('no roms in ' + args.path)
+        return 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(check_rom, rom, args.frames, args.golden,
+                               args.update, args.dump) for rom in roms]
+        results = [future.result() for future in futures]
+
+    ok = True
+    for result in results:
+        line = '{:9} {}'.format(result['status'].upper(), result['name'])
+        if result['status'] == 'mismatch':
+            line += ' at frame {}'.format(result['frame'])
+            if 'diff' in result:
+                line += ', diff in ' + result['diff']
+        elif result['status'] == 'error':
+            line += ': ' + result['error']
+        if result['status'] in ('mismatch', 'missing', 'error'):
+            ok = False
+        print(line)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
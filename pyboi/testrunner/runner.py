@@ -0,0 +1,174 @@
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+log = logging.getLogger(name='testrunner')
+
+# serial output patterns (blargg's test roms)
+PASS_PATTERN = re.compile(rb'Passed')
+FAIL_PATTERN = re.compile(rb'Failed')
+# mooneye test roms report through B, C, D, E, H, L
+MOONEYE_PASS = (3, 5, 8, 13, 21, 34)
+MOONEYE_FAIL = (0x42,) * 6
+ROM_EXTENSIONS = ('.gb', '.gbc')
+
+
+def find_roms(path):
+    """
+    Returns the test roms in directory path (recursively) sorted,
+    or [path] if path is a rom.
+    """
+    if os.path.isfile(path):
+        return [path]
+    roms = []
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.lower().endswith(ROM_EXTENSIONS):
+                roms.append(os.path.join(root, name))
+    return sorted(roms)
+
+
+def check_status(gb):
+    """
+    Returns 'pass' or 'fail' if the rom reported a result, None while
+    still running.
+    """
+    serial = gb.mem.serial
+    if FAIL_PATTERN.search(serial):
+        return 'fail'
+    if PASS_PATTERN.search(serial):
+        return 'pass'
+    z80 = gb.z80
+    regs = (z80.reg[z80.B], z80.reg[z80.C], z80.reg[z80.D],
+            z80.reg[z80.E], z80.reg[z80.H], z80.reg[z80.L])
+    if regs == MOONEYE_PASS:
+        return 'pass'
+    if regs == MOONEYE_FAIL:
+        return 'fail'
+    return None
+
+
+def run_rom(path, max_frames, check_every=10):
+    """
+    Runs one test rom headless until it reports a result or
+    max_frames frames have passed. Runs in the pool's workers.
+
+    ...
+    Parameters
+    ----------
+    path : string
+        the test rom
+    max_frames : int
+        the cycle budget, in frames (70224 cycles)
+    check_every : int
+        frames between checks for a result
+
+    Returns
+    -------
+    dict
+        name, path, status (pass/fail/timeout/error), frames,
+        seconds and the serial output
+    """
+    # imported here so the workers start without the parent's state
+    from ..emulator.pyboi import Pyboi
+    logging.disable(logging.CRITICAL)
+    start = time.time()
+    result = {'name': os.path.splitext(os.path.basename(path))[0],
+              'path': path, 'status': 'timeout', 'frames': 0}
+    gb = None
+    try:
+        gb = Pyboi()
+        gb.mem.serial_echo = False
+        # test roms leave no save files or code cache behind
+        gb.load_rom(path, save_dir=None, cache_dir=None)
+        gb.boot()
+        for frame in range(1, max_frames + 1):
+            gb.get_frame()
+            if frame % check_every == 0 or frame == max_frames:
+                status = check_status(gb)
+                if status is not None:
+                    result['status'] = status
+                    break
+        result['frames'] = frame
+    except (Exception, SystemExit) as error:
+        # the emulator quit()s on fatal errors
+        result['status'] = 'error'
+        result['error'] = repr(error)
+    result['seconds'] = round(time.time() - start, 3)
+    result['output'] = gb.mem.serial.decode('latin-1') if gb else ''
+    if gb is not None:
+        gb.close()
+    return result
+
+
+def run_all(roms, max_frames, jobs=None):
+    """
+    Runs roms in a process pool with jobs workers (all cores by
+    default). Returns the results in the order of roms.
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_rom, rom, max_frames) for rom in roms]
+        return [future.result() for future in futures]
+
+
+def junit_report(results, seconds):
+    """ Returns the results as a JUnit xml string. """
+    failures = sum(1 for r in results if r['status'] in ('fail', 'timeout'))
+    errors = sum(1 for r in results if r['status'] == 'error')
+    suite = ET.Element('testsuite', name='pyboi', tests=str(len(results)),
+                       failures=str(failures), errors=str(errors),
+                       time=str(round(seconds, 3)))
+    for result in results:
+        case = ET.SubElement(suite, 'testcase', name=result['name'],
+                             classname='pyboi.roms',
+                             time=str(result['seconds']))
+        if result['status'] in ('fail', 'timeout'):
+            failure = ET.SubElement(case, 'failure', message=result['status'])
+            failure.text = result['output']
+        elif result['status'] == 'error':
+            error = ET.SubElement(case, 'error',
+                                  message=result.get('error', ''))
+            error.text = result['output']
+        ET.SubElement(case, 'system-out').text = result['output']
+    return ET.tostring(suite, encoding='unicode')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pyboi.testrunner',
+                                     description='run test roms headless')
+    parser.add_argument('path', help='test rom or directory of test roms')
+    parser.add_argument('--frames', type=int, default=4000,
+                        help='frames to run each rom before timing out')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='worker processes, defaults to all cores')
+    parser.add_argument('--json', help='write a JSON report here')
+    parser.add_argument('--junit', help='write a JUnit xml report here')
+    args = parser.parse_args(argv)
+
+    roms = find_roms(args.path)
+    if not roms:
+        print('no test roms in ' + args.path)
+        return 1
+    start = time.time()
+    results = run_all(roms, args.frames, args.jobs)
+    seconds = time.time() - start
+
+    for result in results:
+        print('{:8} {:40} {:6} frames {:8.2f}s'.format(
+            result['status'].upper(), result['name'],
+            result['frames'], result['seconds']))
+    passed = sum(1 for r in results if r['status'] == 'pass')
+    print('{}/{} passed in {:.2f}s'.format(passed, len(results), seconds))
+
+    if args.json:
+        with open(args.json, 'w') as report:
+            json.dump({'seconds': round(seconds, 3), 'results': results},
+                      report, indent=2)
+    if args.junit:
+        with open(args.junit, 'w') as report:
+            report.write(junit_report(results, seconds))
+    return 0 if passed == len(results) else 1
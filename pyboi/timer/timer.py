@@ -0,0 +1,134 @@
+import logging
+log = logging.getLogger(name='timer')
+
+# next_event when no overflow is scheduled
+NEVER = 1 << 62
+
+
+class Timer:
+    """
+    The DIV/TIMA timer of the GB.
+
+    Nothing is counted per instruction. DIV and TIMA are computed
+    from the cycle counter when they are read, the only scheduled
+    work is the TIMA overflow which reloads TMA and requests the
+    timer interrupt. Writes to DIV/TIMA/TAC recompute the schedule.
+
+    ...
+    Attributes
+    ----------
+    clock : int
+        total cpu cycles elapsed
+    div_base : int
+        clock when DIV was last reset, the internal 16 bit
+        counter is clock - div_base
+    tima : int
+        value of TIMA when it was last latched
+    tima_ref : int
+        internal counter value when TIMA was last latched
+    tma : int
+        TIMA reload value
+    tac : int
+        timer control, bit 2 enable, bits 0-1 input clock
+    period : int
+        cycles per TIMA increment
+    next_event : int
+        clock of the next TIMA overflow, NEVER if stopped
+    """
+    def __init__(self, memory):
+        self.mem = memory
+        self.clock = 0
+        self.div_base = 0
+        self.tima = 0
+        self.tima_ref = 0
+        self.tma = 0
+        self.tac = 0
+        self.period = 1024
+        self.next_event = NEVER
+
+    def tick(self, cycles):
+        """
+        Advances the clock, handles TIMA overflows.
+
+        ...
+        Parameters
+        ----------
+        cycles : int
+            number of cycles elapsed
+        """
+        self.clock += cycles
+        while self.clock >= self.next_event:
+            self.overflow()
+
+    def overflow(self):
+        """
+        TIMA overflowed: reload from TMA and request the timer interrupt.
+        """
+        self.tima = self.tma
+        self.tima_ref = self.next_event - self.div_base
+        self.mem.request_interrupt(2)
+        self.schedule()
+
+    def schedule(self):
+        """ Computes the clock of the next TIMA overflow. """
+        if self.tac & 0x4 == 0:
+            self.next_event = NEVER
+            return
+        ticks = (self.tima_ref // self.period) + 0x100 - self.tima
+        self.next_event = self.div_base + ticks * self.period
+
+    def cycles_to_event(self):
+        """ Returns the number of cycles until TIMA overflows next. """
+        return self.next_event - self.clock
+
+    def latch(self):
+        """ Stores the current TIMA value and counter. """
+        self.tima = self.read_tima()
+        self.tima_ref = self.clock - self.div_base
+
+    def read_div(self):
+        """ Returns the DIV register, the upper byte of the counter. """
+        return ((self.clock - self.div_base) >> 8) & 0xff
+
+    def read_tima(self):
+        """ Returns the TIMA register. """
+        if self.tac & 0x4 == 0:
+            return self.tima
+        counter = self.clock - self.div_base
+        ticks = counter // self.period - self.tima_ref // self.period
+        return (self.tima + ticks) & 0xff
+
+    def write_div(self):
+        """ Any write to DIV resets the counter. """
+        self.latch()
+        self.div_base = self.clock
+        self.tima_ref = 0
+        self.schedule()
+
+    def set_counter(self, counter):
+        """ Sets the internal 16 bit counter, DIV is its upper byte. """
+        self.latch()
+        self.div_base = self.clock - counter
+        self.tima_ref = counter
+        self.schedule()
+
+    def write_tima(self, byte):
+        """ Sets TIMA to byte. """
+        self.tima = byte & 0xff
+        self.tima_ref = self.clock - self.div_base
+        self.schedule()
+
+    def write_tma(self, byte):
+        """ Sets the TIMA reload value. """
+        self.tma = byte & 0xff
+
+    def write_tac(self, byte):
+        """
+        Sets the timer control register.
+        Bit 2 starts/stops TIMA, bits 0-1 select the rate:
+        0 - 1024, 1 - 16, 2 - 64, 3 - 256 cycles per increment
+        """
+        self.latch()
+        self.tac = byte & 0x7
+        self.period = (1024, 16, 64, 256)[byte & 0x3]
+        self.schedule()
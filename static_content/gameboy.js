@@ -14,16 +14,33 @@ $(document).ready(function () {
     $('#controls').css('height', new_height.toString());
     $('#controls').css('display', 'inline-block');
 
-    //websocket stuff
-    var ws = new WebSocket("ws://localhost:8888/")//"ws://" + location.host + ":8888/");
+    //websocket stuff, #watch spectates the game instead of playing it
+    var path = (location.hash == "#watch") ? "/watch/" : "/";
+    var ws = new WebSocket("ws://localhost:8888" + path)//"ws://" + location.host + ":8888/");
     ws.binaryType = 'arraybuffer';
     ws.onopen = function() {
         console.log("Starting the game");
     };
     
+    // the screen, 160x144 shades, changed by key frames and deltas
+    var screen = new Uint8Array(23040);
+
     // called when a message received from server
     ws.onmessage = function (evt) {
-        updateCanvas(evt.data);
+        var msg = new Uint8Array(evt.data);
+        if (msg.length == 23040) {
+            // key frame, the whole screen
+            screen.set(msg);
+        } else if (msg[0] == 100) {
+            // 'd' delta, per changed row: row number then 160 pixels
+            for (var i = 1; i + 161 <= msg.length; i += 161) {
+                screen.set(msg.subarray(i + 1, i + 161), msg[i] * 160);
+            }
+        } else {
+            // sound, not played yet
+            return;
+        }
+        updateCanvas(screen.buffer);
     //    appendLog(evt.data)
     };
     
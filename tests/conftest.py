@@ -0,0 +1,69 @@
+import logging
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """ Runs each test in its own directory, nothing is left behind. """
+    monkeypatch.chdir(tmp_path)
+    logging.disable(logging.CRITICAL)
+    yield tmp_path
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def rom():
+    """ Path of the test rom in the repository. """
+    return os.path.join(ROOT, 'roms', 'cpu_instrs.gb')
+
+
+@pytest.fixture
+def gb(rom):
+    """ A Pyboi with the test rom loaded, not booted. """
+    from pyboi import Pyboi
+    gb = Pyboi()
+    gb.mem.serial_echo = False
+    gb.load_rom(rom)
+    yield gb
+    gb.close()
+
+
+@pytest.fixture
+def load_code(gb):
+    """ Returns load(code): puts code at 0xc000, the cpu runs it next. """
+    def load(code):
+        for i, byte in enumerate(code):
+            gb.mem.write(byte, 0xc000 + i)
+        gb.z80.pc = 0xc000
+    return load
+
+
+@pytest.fixture
+def make_rom(workdir):
+    """
+    Returns make(mbc_type, banks, ram_code): writes a rom whose banks
+    start with their number and returns its path.
+    """
+    def make(mbc_type, banks=4, ram_code=0, name='test'):
+        rom = bytearray(banks * 0x4000)
+        for bank in range(banks):
+            rom[bank * 0x4000] = bank & 0xff
+        title = name.upper().encode('ascii')[:15]
+        rom[0x134:0x134 + len(title)] = title
+        rom[0x147] = mbc_type
+        rom[0x148] = max(0, banks.bit_length() - 2)
+        rom[0x149] = ram_code
+        check = 0
+        for byte in rom[0x134:0x14d]:
+            check = (check - byte - 1) & 0xff
+        rom[0x14d] = check
+        path = str(workdir / (name + '.gb'))
+        with open(path, 'wb') as f:
+            f.write(rom)
+        return path
+    return make
@@ -0,0 +1,116 @@
+import numpy as np
+from pyboi.apu.apu import APU, CLOCK_RATE, SAMPLE_RATE
+from pyboi.timer.timer import Timer
+
+
+class Machine:
+    """ The parts of the memory the APU uses. """
+    def __init__(self):
+        self.timer = Timer(self)
+
+    def request_interrupt(self, int_id):
+        pass
+
+
+def make_apu():
+    machine = Machine()
+    apu = APU(machine)
+    # power on, full volume, every channel on both sides
+    apu.write(0xff26, 0x80)
+    apu.write(0xff24, 0x77)
+    apu.write(0xff25, 0xff)
+    return apu, machine.timer
+
+
+def play_square(apu, freq, length_enabled=False, length=0):
+    # 50% duty, full volume, no envelope
+    apu.write(0xff11, 0x80 | length)
+    apu.write(0xff12, 0xf0)
+    apu.write(0xff13, freq & 0xff)
+    control = 0x80 | (freq >> 8)
+    if length_enabled:
+        control |= 0x40
+    apu.write(0xff14, control)
+
+
+def stereo(apu):
+    pcm = np.frombuffer(apu.read_samples(), dtype=np.int16)
+    return pcm[0::2], pcm[1::2]
+
+
+def test_register_reads_are_masked():
+    apu, _ = make_apu()
+    apu.write(0xff11, 0x80)
+    # only the duty reads back
+    assert apu.read(0xff11) == 0xbf
+    assert apu.read(0xff13) == 0xff
+
+
+def test_writes_ignored_while_powered_off():
+    apu, _ = make_apu()
+    apu.write(0xff26, 0x00)
+    apu.write(0xff12, 0xf0)
+    assert apu.read(0xff12) == 0x00
+    # wave ram can still be written
+    apu.write(0xff30, 0x12)
+    assert apu.read(0xff30) == 0x12
+
+
+def test_silent_until_a_channel_plays():
+    apu, timer = make_apu()
+    timer.tick(CLOCK_RATE // 60)
+    apu.render()
+    left, right = stereo(apu)
+    assert len(left) == round(SAMPLE_RATE / 60)
+    assert not left.any() and not right.any()
+
+
+def test_square_plays_its_frequency():
+    apu, timer = make_apu()
+    # 131072 / (2048 - 1792) = 512 Hz
+    play_square(apu, 1792)
+    timer.tick(CLOCK_RATE)
+    apu.render()
+    left, right = stereo(apu)
+    assert len(left) == SAMPLE_RATE
+    assert (left == right).all()
+    crossings = np.count_nonzero(np.diff(np.sign(left)))
+    assert abs(crossings - 2 * 512) <= 2
+    assert apu.read(0xff26) & 0x1
+
+
+def test_panning_routes_the_channel():
+    apu, timer = make_apu()
+    # channel 1 on the left only
+    apu.write(0xff25, 0x10)
+    play_square(apu, 1792)
+    timer.tick(CLOCK_RATE // 60)
+    apu.render()
+    left, right = stereo(apu)
+    assert left.any()
+    assert not right.any()
+
+
+def test_length_counter_stops_the_channel():
+    apu, timer = make_apu()
+    # 64 - 62 = 2 length clocks at 256 Hz
+    play_square(apu, 1792, length_enabled=True, length=62)
+    assert apu.read(0xff26) & 0x1
+    timer.tick(CLOCK_RATE // 60)
+    assert not apu.read(0xff26) & 0x1
+    left, _ = stereo(apu)
+    # sound for 2 / 256 of a second, then silence
+    assert left[:300].any()
+    assert not left[-300:].any()
+
+
+def test_writes_applied_at_their_cycle():
+    apu, timer = make_apu()
+    timer.tick(CLOCK_RATE // 120)
+    play_square(apu, 1792)
+    timer.tick(CLOCK_RATE // 120)
+    apu.render()
+    left, _ = stereo(apu)
+    half = len(left) // 2
+    assert not left[:half - 1].any()
+    assert left[half + 1:].any()
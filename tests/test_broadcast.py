@@ -0,0 +1,106 @@
+from pyboi.frontend.bus import FrameBus
+from pyboi.frontend.broadcast import (Broadcast, EncodedFrame, FRAME_SIZE,
+                                      DELTA, encode_delta)
+
+
+def screen(changed=(), shade=3):
+    """ A blank screen with the rows in changed drawn in shade. """
+    video = bytearray(FRAME_SIZE)
+    for row in changed:
+        video[row * 160:row * 160 + 160] = bytes([shade]) * 160
+    return bytes(video)
+
+
+def apply_delta(video, delta):
+    """ Applies a delta message as the page does. """
+    video = bytearray(video)
+    for i in range(1, len(delta), 161):
+        row = delta[i]
+        video[row * 160:row * 160 + 160] = delta[i + 1:i + 161]
+    return bytes(video)
+
+
+def test_delta_holds_the_changed_rows():
+    old = screen()
+    new = screen((3, 100))
+    delta = encode_delta(old, new)
+    assert delta[:1] == DELTA
+    assert len(delta) == 1 + 2 * 161
+    assert apply_delta(old, delta) == new
+
+
+def test_delta_of_same_frame_is_empty():
+    assert encode_delta(screen(), screen()) == b''
+
+
+def test_no_delta_when_a_key_frame_is_smaller():
+    assert encode_delta(screen(), screen(range(144))) is None
+
+
+def test_message_is_a_key_frame_unless_following_the_last():
+    frame = EncodedFrame(5, b'key', b'delta', b'pcm')
+    assert frame.message(4) == b'delta'
+    assert frame.message(3) == b'key'
+    assert frame.message(None) == b'key'
+    assert EncodedFrame(5, b'key', b'', b'pcm').message(4) is None
+
+
+def test_nothing_is_encoded_without_spectators():
+    bus = FrameBus()
+    broadcast = Broadcast(bus)
+    encoded = []
+    encode = broadcast.encode
+    broadcast.encode = lambda frame: encoded.append(frame) or encode(frame)
+    bus.publish(screen())
+    assert encoded == []
+    assert broadcast.previous is None
+    spectator = broadcast.watch()
+    bus.publish(screen())
+    assert len(encoded) == 1
+    broadcast.leave(spectator)
+    bus.publish(screen())
+    assert len(encoded) == 1
+
+
+def test_spectators_share_the_encoded_frames():
+    bus = FrameBus()
+    broadcast = Broadcast(bus)
+    first = broadcast.watch()
+    second = broadcast.watch()
+    bus.publish(screen())
+    bus.publish(screen((7,)))
+    latest = first.poll()
+    assert latest is second.poll()
+    # 'latest' spectators only hold the newest frame
+    assert latest.number == 1
+    assert first.poll() is None
+
+
+def test_spectator_following_along_gets_deltas():
+    bus = FrameBus()
+    broadcast = Broadcast(bus)
+    spectator = broadcast.watch()
+    shown = None
+    last = None
+    for rows in ((), (1,), (1, 2), (9,)):
+        video = screen(rows)
+        bus.publish(video)
+        frame = spectator.poll()
+        message = frame.message(last)
+        last = frame.number
+        if shown is None:
+            assert message == video
+            shown = message
+        elif message is not None:
+            assert message[:1] == DELTA
+            shown = apply_delta(shown, message)
+        assert shown == video
+
+
+def test_closing_the_session_ends_the_spectators():
+    bus = FrameBus()
+    broadcast = Broadcast(bus)
+    spectator = broadcast.watch()
+    bus.close()
+    assert spectator.closed
+    assert spectator.get(timeout=0) is None
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from pyboi.frontend.bus import FrameBus
+from pyboi.frontend.loop import EmulatorLoop
+
+
+def publish(bus, count):
+    for i in range(count):
+        bus.publish(bytes([i]) * 4)
+
+
+def test_policies():
+    bus = FrameBus()
+    every = bus.subscribe()
+    latest = bus.subscribe('latest')
+    third = bus.subscribe('nth', n=3)
+    publish(bus, 7)
+    assert [frame.number for frame in every.frames] == list(range(7))
+    assert [frame.number for frame in latest.frames] == [6]
+    assert latest.dropped == 6
+    assert [frame.number for frame in third.frames] == [0, 3, 6]
+
+
+def test_subscribers_share_one_copy():
+    bus = FrameBus()
+    first = bus.subscribe()
+    second = bus.subscribe()
+    video = bytearray(4)
+    bus.publish(video, b'pcm')
+    video[0] = 9
+    frame = first.poll()
+    assert frame is second.poll()
+    assert frame.video == bytes(4)
+    assert frame.audio == b'pcm'
+    assert first.poll() is None
+
+
+def test_limit_drops_the_oldest():
+    bus = FrameBus()
+    subscription = bus.subscribe(limit=2)
+    publish(bus, 5)
+    assert [frame.number for frame in subscription.frames] == [3, 4]
+    assert subscription.dropped == 3
+
+
+def test_unsubscribe_and_close():
+    bus = FrameBus()
+    gone = bus.subscribe()
+    kept = bus.subscribe()
+    bus.unsubscribe(gone)
+    publish(bus, 1)
+    assert gone.closed and gone.poll() is None
+    bus.close()
+    assert kept.closed
+    # what was queued can still be taken
+    assert [frame.number for frame in kept] == [0]
+
+
+def test_get_waits_for_another_thread():
+    bus = FrameBus()
+    subscription = bus.subscribe()
+    thread = threading.Thread(target=publish, args=(bus, 3))
+    thread.start()
+    numbers = [subscription.get(timeout=5).number for _ in range(3)]
+    thread.join()
+    assert numbers == [0, 1, 2]
+    assert subscription.get(timeout=0.01) is None
+
+
+def test_loop_publishes_every_frame(gb):
+    gb.boot()
+    loop = EmulatorLoop(gb, fps=None)
+    frames = loop.bus.subscribe()
+    thumbnails = loop.bus.subscribe('nth', n=2)
+    assert loop.run(frames=4) == 4
+    assert [frame.number for frame in frames] == [0, 1, 2, 3]
+    assert [frame.number for frame in thumbnails] == [0, 2]
+
+
+def test_next_frame_in_asyncio(gb):
+    gb.boot()
+    loop = EmulatorLoop(gb, fps=None)
+    subscription = loop.bus.subscribe()
+
+    async def consume():
+        numbers = []
+        while True:
+            frame = await subscription.next_frame()
+            if frame is None:
+                return numbers
+            numbers.append(frame.number)
+
+    async def main():
+        consumer = asyncio.ensure_future(consume())
+        await loop.run_async(frames=3)
+        return await consumer
+    assert asyncio.run(main()) == [0, 1, 2]
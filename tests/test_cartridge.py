@@ -0,0 +1,72 @@
+import hashlib
+import shutil
+from pyboi.memory.cartridge import RomHeader, RomRegistry
+from pyboi.memory.mem import Memory
+
+
+def test_header_of_the_test_rom(rom):
+    with open(rom, 'rb') as f:
+        header = RomHeader(f.read())
+    assert header.title == 'CPU_INSTRS'
+    assert header.mbc_name() == 'MBC1'
+    assert header.rom_size == 0x10000
+    assert header.rom_banks == 4
+    assert header.ram_size == 0
+    assert header.header_ok
+    assert not header.has_battery()
+
+
+def test_header_fields(make_rom):
+    with open(make_rom(0x1b, banks=8, ram_code=3, name='zelda'), 'rb') as f:
+        header = RomHeader(f.read())
+    assert header.title == 'ZELDA'
+    assert header.mbc_name() == 'MBC5+RAM+BATTERY'
+    assert header.rom_banks == 8
+    assert header.ram_size == 0x8000
+    assert header.has_battery()
+    assert header.header_ok
+
+
+def test_bad_header_checksum(make_rom):
+    path = make_rom(0x00, banks=2)
+    with open(path, 'r+b') as f:
+        f.seek(0x14d)
+        f.write(b'\x00')
+    with open(path, 'rb') as f:
+        assert not RomHeader(f.read()).header_ok
+
+
+def test_registry_maps_a_rom_once(rom, workdir):
+    roms = RomRegistry()
+    mapped, header, digest = roms.load(rom)
+    with open(rom, 'rb') as f:
+        assert digest == hashlib.sha1(f.read()).hexdigest()
+    assert roms.load(rom)[0] is mapped
+    # the same contents under another path share the mapping
+    copy = str(workdir / 'copy.gb')
+    shutil.copy(rom, copy)
+    again = roms.load(copy)
+    assert again[0] is mapped
+    assert again[1] is header
+    assert len(roms.roms) == 1
+
+
+def test_registry_rejects_missing_and_short_files(workdir):
+    roms = RomRegistry()
+    assert roms.load(str(workdir / 'missing.gb')) is None
+    short = workdir / 'short.gb'
+    short.write_bytes(bytes(0x100))
+    assert roms.load(str(short)) is None
+
+
+def test_memories_share_the_rom(rom):
+    first = Memory()
+    first.load_rom(rom)
+    second = Memory()
+    second.load_rom(rom)
+    assert first.rom is second.rom
+    assert first.rom_hash == second.rom_hash
+    # the mapping is read only, banks are switched per instance
+    first.write(0x02, 0x2000)
+    assert first.membanks.get_rom_bank() == 2
+    assert second.membanks.get_rom_bank() == 1
@@ -0,0 +1,50 @@
+import os
+import pytest
+from pyboi import Pyboi
+
+
+@pytest.fixture
+def ly_rom(workdir):
+    """ A rom waiting for LY 0x90 forever, a busy wait loop. """
+    data = bytearray(0x8000)
+    # jp $0150
+    data[0x100:0x103] = b'\xc3\x50\x01'
+    # ldh a,($44); cp $90; jr nz,-6; jr -8
+    data[0x150:0x158] = b'\xf0\x44\xfe\x90\x20\xfa\x18\xf8'
+    path = str(workdir / 'ly.gb')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def files(directory):
+    return sorted(os.path.relpath(os.path.join(root, name), directory)
+                  for root, _, names in os.walk(directory) for name in names)
+
+
+def test_nothing_is_written_by_default(gb, workdir):
+    gb.boot()
+    gb.get_frame()
+    gb.close()
+    assert files(workdir) == []
+
+
+def test_loops_found_are_cached(ly_rom, workdir):
+    gb = Pyboi()
+    gb.load_rom(ly_rom, cache_dir='cache')
+    gb.boot()
+    for _ in range(3):
+        gb.get_frame()
+    loops = gb.z80.idle.cached_loops()
+    # the ldh/cp/jr loop polls LY
+    assert (0, 0x150, 0x154, 20) in loops
+    gb.close()
+    cached = files(workdir / 'cache')
+    assert len(cached) == 1
+    assert cached[0].startswith(gb.mem.rom_hash + os.sep + 'loops-')
+
+    gb = Pyboi()
+    gb.load_rom(ly_rom, cache_dir='cache')
+    assert gb.code_cache.loaded == len(loops)
+    assert sorted(gb.z80.idle.cached_loops()) == sorted(loops)
+    gb.close()
@@ -0,0 +1,53 @@
+from pyboi import Pyboi
+from pyboi.processor.z80 import Z80
+from pyboi.testrunner.differential import Lockstep, Machine, main
+
+
+class FlakyZ80(Z80):
+    """ A candidate whose stack pointer goes wrong at instruction 100. """
+    def __init__(self, mem):
+        super().__init__(mem)
+        self.executed = 0
+
+    def execute_opcode(self):
+        cycles = super().execute_opcode()
+        self.executed += 1
+        if self.executed == 100:
+            self.sp ^= 0x2
+        return cycles
+
+
+def test_machines_start_booted(rom):
+    gb = Pyboi()
+    gb.mem.serial_echo = False
+    gb.load_rom(rom)
+    gb.boot()
+    machine = Machine(Z80, type(gb.mem), rom)
+    assert machine.cpu.pc == 0x100
+    assert machine.cpu.reg == gb.z80.reg
+    assert machine.cpu.sp == gb.z80.sp
+    assert machine.mem.timer.clock == gb.mem.timer.clock
+    assert machine.writes == []
+    gb.close()
+
+
+def test_reference_agrees_with_itself(rom):
+    lockstep = Lockstep(rom)
+    assert lockstep.run(20000, block=64) is None
+    assert lockstep.steps == 20000
+
+
+def test_divergence_found_in_a_block(rom):
+    lockstep = Lockstep(rom, cpu_class=FlakyZ80)
+    assert lockstep.run(1000, block=64) == 99
+    report = lockstep.report(99)
+    assert report.startswith('DIVERGED at instruction 99')
+    assert 'SP=' in report
+    assert '>       99' in report
+
+
+def test_main(rom, capsys):
+    assert main([rom, '--steps', '500']) == 0
+    assert '500 instructions in lockstep' in capsys.readouterr().out
+    assert main([rom, '--steps', '500',
+                 '--cpu', 'tests.test_differential:FlakyZ80']) == 1
@@ -0,0 +1,51 @@
+from pyboi.memory.cartridge import ROMS
+from pyboi.disasm.analysis import RomAnalysis
+from pyboi.disasm.decoder import decode, JUMP, BRANCH, CALL
+
+
+def decode_bytes(code, address=0x150):
+    return decode(lambda a: code[a - address], address)
+
+
+def test_decodes_operands_and_flow():
+    instruction = decode_bytes(b'\x3e\x42')
+    assert (instruction.length, instruction.text) == (2, 'ld a,$42')
+    instruction = decode_bytes(b'\xc3\x20\xc2')
+    assert instruction.text == 'jp $c220'
+    assert (instruction.flow, instruction.target) == (JUMP, 0xc220)
+    assert decode_bytes(b'\xcb\x37').text == 'swap a'
+
+
+def test_relative_and_rst_targets():
+    # jr nz,-6 lands 4 bytes before the jr
+    instruction = decode_bytes(b'\x20\xfa')
+    assert instruction.flow == BRANCH
+    assert instruction.target == 0x150 + 2 - 6
+    instruction = decode_bytes(b'\xff')
+    assert (instruction.flow, instruction.target) == (CALL, 0x38)
+
+
+def test_entry_points_are_explored(rom):
+    analysis = RomAnalysis(*ROMS.load(rom))
+    analysis.explore_entry_points()
+    block = analysis.block_at(0x100)
+    assert block is not None
+    assert analysis.successors(0x100)
+    # the analysis survives the cache round trip
+    copy = RomAnalysis(*ROMS.load(rom))
+    assert copy.from_cache(analysis.to_cache())
+    assert set(copy.instructions) == set(analysis.instructions)
+    assert not copy.from_cache({'rom': '00' * 20})
+
+
+def test_unreached_banks_can_be_swept(rom):
+    analysis = RomAnalysis(*ROMS.load(rom))
+    analysis.explore_entry_points()
+    assert 0 in analysis.reached_banks()
+    assert 2 not in analysis.reached_banks()
+    instructions = analysis.sweep(2)
+    assert instructions[0].address == 0x4000
+    assert instructions[0].text == 'jp $c220'
+    assert instructions[-1].next_address() >= 0x8000
+    # sweeping adds nothing to the analysis
+    assert 2 not in analysis.reached_banks()
@@ -0,0 +1,36 @@
+from pyboi.memory.dma import DMA_CYCLES
+
+
+def fill_wram_page(mem):
+    for i in range(0xa0):
+        mem.write(i, 0xc000 + i)
+
+
+def test_copies_the_page_into_oam(gb):
+    mem = gb.mem
+    fill_wram_page(mem)
+    mem.write(0xc0, 0xff46)
+    assert bytes(mem.oam) == bytes(range(0xa0))
+
+
+def test_locks_the_external_bus_until_done(gb):
+    mem = gb.mem
+    fill_wram_page(mem)
+    before = mem.read(0xc100)
+    mem.write(0x12, 0xff80)
+    mem.write(0xc0, 0xff46)
+    # the cpu sees the byte being transferred, writes are dropped
+    assert mem.read(0xc005) == 0
+    mem.write((before + 1) & 0xff, 0xc100)
+    assert mem.read(0xff80) == 0x12
+    mem.timer.tick(DMA_CYCLES)
+    assert mem.read(0xc005) == 5
+    assert mem.read(0xc100) == before
+    assert not mem.dma_active
+
+
+def test_membanks_stay_in_place(gb):
+    banks = gb.mem.membanks
+    gb.mem.write(0xc0, 0xff46)
+    assert gb.mem.membanks is banks
+    assert gb.mem.dma_active
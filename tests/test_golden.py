@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import zlib
+from pyboi.testrunner.golden import (check_rom, golden_paths, run_frames,
+                                     main)
+
+
+def test_frames_are_of_the_booted_rom(gb, rom):
+    gb.boot()
+    frames = [zlib.crc32(gb.get_frame()) for _ in range(3)]
+    rom_hash, hashes, data = run_frames(rom, 3)
+    assert rom_hash == gb.mem.rom_hash
+    assert hashes == frames
+    assert len(data) == 3 * 23040
+
+
+def test_update_then_match(rom, workdir):
+    assert check_rom(rom, 5, 'golden', update=True)['status'] == 'updated'
+    hash_path, frames_path = golden_paths('golden', 'cpu_instrs')
+    assert os.path.isfile(hash_path) and os.path.isfile(frames_path)
+    result = check_rom(rom, 5, 'golden')
+    assert result['status'] == 'match'
+    # more frames than the golden ones
+    assert check_rom(rom, 6, 'golden')['status'] == 'missing'
+
+
+def test_mismatch_dumps_a_diff(rom, workdir):
+    check_rom(rom, 5, 'golden', update=True)
+    hash_path, _ = golden_paths('golden', 'cpu_instrs')
+    with open(hash_path) as f:
+        golden = json.load(f)
+    golden['hashes'][3] ^= 1
+    with open(hash_path, 'w') as f:
+        json.dump(golden, f)
+    result = check_rom(rom, 5, 'golden', dump_dir='diff')
+    assert result['status'] == 'mismatch'
+    assert result['frame'] == 3
+    with open(result['diff'], 'rb') as f:
+        assert f.read(15) == b'P6 480 144 255\n'
+
+
+def test_golden_of_another_rom_is_an_error(rom, workdir):
+    check_rom(rom, 2, 'golden', update=True)
+    hash_path, _ = golden_paths('golden', 'cpu_instrs')
+    with open(hash_path) as f:
+        golden = json.load(f)
+    golden['rom'] = '00' * 20
+    with open(hash_path, 'w') as f:
+        json.dump(golden, f)
+    result = check_rom(rom, 2, 'golden')
+    assert result['status'] == 'error'
+    assert 'another rom' in result['error']
+
+
+def test_main_fails_unless_all_match(rom, workdir):
+    roms = workdir / 'roms'
+    roms.mkdir()
+    shutil.copy(rom, str(roms))
+    args = [str(roms), '--frames', '2', '--jobs', '1']
+    assert main(args) == 1
+    assert main(args + ['--update']) == 0
+    assert main(args) == 0
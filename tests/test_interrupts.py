@@ -0,0 +1,71 @@
+def request_vblank(gb):
+    gb.mem.write(0x01, 0xffff)
+    gb.mem.request_interrupt(0)
+
+
+def test_ei_takes_effect_after_the_next_instruction(gb, load_code):
+    gb.boot()
+    # ei, nop, nop
+    load_code((0xfb, 0x00, 0x00))
+    request_vblank(gb)
+    z80 = gb.z80
+    z80.execute_opcode()
+    assert z80.pc == 0xc001
+    assert not z80.interrupt_enable
+    z80.execute_opcode()
+    # the nop ran, then the interrupt was serviced
+    assert z80.pc == 0x40
+    assert gb.mem.read_word(z80.sp) == 0xc002
+
+
+def test_di_cancels_a_pending_ei(gb, load_code):
+    gb.boot()
+    # ei, di, nop
+    load_code((0xfb, 0xf3, 0x00))
+    request_vblank(gb)
+    z80 = gb.z80
+    for _ in range(3):
+        z80.execute_opcode()
+    assert z80.pc == 0xc003
+    assert not z80.interrupt_enable
+    assert not z80.ime_pending
+
+
+def test_ei_before_halt_wakes_on_the_interrupt(gb, load_code):
+    gb.boot()
+    # ei, halt
+    load_code((0xfb, 0x76))
+    z80 = gb.z80
+    z80.execute_opcode()
+    z80.execute_opcode()
+    assert z80.halted
+    assert z80.interrupt_enable
+    request_vblank(gb)
+    z80.execute_opcode()
+    assert not z80.halted
+    assert z80.pc == 0x40
+
+
+def test_pending_follows_ie_and_if_writes(gb):
+    gb.mem.write(0x00, 0xffff)
+    gb.mem.write(0x05, 0xff0f)
+    assert gb.mem.pending_interrupts == 0
+    gb.mem.write(0x04, 0xffff)
+    assert gb.mem.pending_interrupts == 0x4
+    gb.mem.write(0x00, 0xff0f)
+    assert gb.mem.pending_interrupts == 0
+
+
+def test_interrupt_clears_its_flag(gb, load_code):
+    gb.boot()
+    # ei, nop
+    load_code((0xfb, 0x00))
+    gb.mem.write(0x05, 0xffff)
+    gb.mem.request_interrupt(2)
+    gb.mem.request_interrupt(0)
+    gb.z80.execute_opcode()
+    gb.z80.execute_opcode()
+    # vblank has the highest priority
+    assert gb.z80.pc == 0x40
+    assert gb.mem.read(0xff0f) & 0x1f == 0x4
+    assert gb.mem.pending_interrupts == 0x4
@@ -0,0 +1,92 @@
+import threading
+
+
+def select_buttons(gb):
+    # P15 low selects a, b, select, start
+    gb.mem.write(0x10, 0xff00)
+
+
+def test_nothing_pressed(gb):
+    select_buttons(gb)
+    assert gb.mem.read(0xff00) & 0xf == 0xf
+
+
+def test_press_applies_at_the_next_instruction(gb, load_code):
+    load_code((0x00, 0x00))
+    select_buttons(gb)
+    gb.press('start')
+    assert gb.mem.read(0xff00) & 0xf == 0xf
+    gb.z80.execute_opcode()
+    assert gb.mem.read(0xff00) & 0xf == 0x7
+    gb.release('start')
+    gb.z80.execute_opcode()
+    assert gb.mem.read(0xff00) & 0xf == 0xf
+
+
+def test_timed_event_waits_for_its_cycle(gb, load_code):
+    load_code((0x00,) * 8)
+    select_buttons(gb)
+    clock = gb.mem.timer.clock
+    gb.press('a', cycle=clock + 8)
+    gb.z80.execute_opcode()
+    gb.z80.execute_opcode()
+    assert gb.mem.read(0xff00) & 0x1
+    gb.z80.execute_opcode()
+    assert not gb.mem.read(0xff00) & 0x1
+    assert not gb.mem.joypad.events
+
+
+def test_only_the_selected_group_is_read(gb):
+    joypad = gb.mem.joypad
+    joypad.set_button('down', True)
+    select_buttons(gb)
+    assert gb.mem.read(0xff00) & 0xf == 0xf
+    # P14 low selects the directions
+    gb.mem.write(0x20, 0xff00)
+    assert gb.mem.read(0xff00) & 0xf == 0x7
+
+
+def test_interrupt_when_a_selected_line_goes_low(gb):
+    joypad = gb.mem.joypad
+    gb.mem.write(0x00, 0xff0f)
+    gb.mem.write(0x30, 0xff00)
+    joypad.set_button('b', True)
+    # not selected, no interrupt
+    assert not gb.mem.read(0xff0f) & 0x10
+    # selecting a pressed line pulls it low
+    select_buttons(gb)
+    assert gb.mem.read(0xff0f) & 0x10
+    gb.mem.write(0x00, 0xff0f)
+    joypad.set_button('b', False)
+    assert not gb.mem.read(0xff0f) & 0x10
+    joypad.set_button('select', True)
+    assert gb.mem.read(0xff0f) & 0x10
+
+
+def test_events_pushed_from_threads_keep_their_order(gb):
+    joypad = gb.mem.joypad
+    presses = [threading.Thread(target=gb.press, args=(button,))
+               for button in ('a', 'b', 'select', 'start')]
+    for thread in presses:
+        thread.start()
+    for thread in presses:
+        thread.join()
+    gb.release('a')
+    joypad.update()
+    select_buttons(gb)
+    assert gb.mem.read(0xff00) & 0xf == 0x1
+    assert len(joypad.stamps) == 5
+
+
+def test_unknown_buttons_are_ignored(gb):
+    gb.press('turbo')
+    assert not gb.mem.joypad.events
+
+
+def test_photon_latency(gb):
+    joypad = gb.mem.joypad
+    assert joypad.photon_latency() is None
+    gb.press('up')
+    joypad.update()
+    assert joypad.photon_latency() >= 0
+    assert joypad.photon_latency() is None
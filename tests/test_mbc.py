@@ -0,0 +1,160 @@
+import struct
+from pyboi.memory.mem import Memory
+from pyboi.memory.mbc3 import RTC, RTC_SAVE_SIZE
+
+
+class Clock:
+    """ A time source the test moves by hand. """
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+def make_rtc():
+    clock = Clock()
+    rtc = RTC()
+    rtc.set_clock(clock)
+    rtc.set_seconds(0)
+    return rtc, clock
+
+
+def load(path, save=None):
+    mem = Memory()
+    mem.serial_echo = False
+    mem.load_rom(path)
+    if save is not None:
+        mem.load_save(save)
+    return mem
+
+
+def test_mbc5_switches_rom_and_ram_banks(make_rom):
+    mem = load(make_rom(0x1a, banks=0x200, ram_code=3))
+    mem.write(0x05, 0x2000)
+    assert mem.read(0x4000) == 0x05
+    mem.write(0x01, 0x3000)
+    assert mem.read(0x4000) == 0x05
+    assert mem.membanks.get_rom_bank() == 0x105
+    # bank 0 can be mapped at 0x4000
+    mem.write(0x00, 0x3000)
+    mem.write(0x00, 0x2000)
+    assert mem.read(0x4000) == 0x00
+    mem.write(0x0a, 0x0000)
+    mem.write(0x02, 0x4000)
+    mem.write(0x42, 0xa000)
+    mem.write(0x00, 0x4000)
+    assert mem.read(0xa000) == 0x00
+    mem.write(0x02, 0x4000)
+    assert mem.read(0xa000) == 0x42
+
+
+def test_mbc2_bank_select_and_nibble_ram(make_rom):
+    mem = load(make_rom(0x05, banks=16))
+    # address bit 8 set selects the rom bank
+    mem.write(0x07, 0x2100)
+    assert mem.read(0x4000) == 0x07
+    mem.write(0x00, 0x2100)
+    assert mem.read(0x4000) == 0x01
+    # bit 8 clear enables the ram, only 4 bits per byte
+    mem.write(0x0a, 0x0000)
+    mem.write(0xab, 0xa000)
+    assert mem.read(0xa000) & 0xf == 0xb
+    # 512 bytes, mirrored through 0xbfff
+    assert mem.read(0xa200) & 0xf == 0xb
+
+
+def test_mbc3_latches_the_clock(make_rom):
+    mem = load(make_rom(0x10, ram_code=3))
+    rtc = mem.membanks.bank.rtc
+    clock = Clock()
+    rtc.set_clock(clock)
+    rtc.set_seconds(0)
+    mem.write(0x0a, 0x0000)
+    mem.write(0x00, 0x6000)
+    mem.write(0x01, 0x6000)
+    clock.time += 3725
+    # the seconds register reads the latched value until latched again
+    mem.write(0x08, 0x4000)
+    assert mem.read(0xa000) == 0
+    mem.write(0x00, 0x6000)
+    mem.write(0x01, 0x6000)
+    assert mem.read(0xa000) == 5
+    mem.write(0x09, 0x4000)
+    assert mem.read(0xa000) == 2
+    mem.write(0x0a, 0x4000)
+    assert mem.read(0xa000) == 1
+    # back to the ram bank
+    mem.write(0x00, 0x4000)
+    mem.write(0x33, 0xa000)
+    assert mem.read(0xa000) == 0x33
+
+
+def test_rtc_day_counter_rolls_over():
+    rtc, clock = make_rtc()
+    clock.time += 511 * 86400 + 86399
+    rtc.latch()
+    assert tuple(rtc.latched) == (59, 59, 23, 0xff, 0x01)
+    clock.time += 1
+    rtc.latch()
+    # the day counter wrapped, the carry stays set until written
+    assert tuple(rtc.latched) == (0, 0, 0, 0, 0x80)
+    clock.time += 86400
+    rtc.latch()
+    assert tuple(rtc.latched) == (0, 0, 0, 1, 0x80)
+    rtc.write(0xc, 0x00)
+    rtc.latch()
+    assert rtc.latched[4] == 0
+
+
+def test_rtc_halt_stops_the_clock():
+    rtc, clock = make_rtc()
+    clock.time += 10
+    rtc.write(0xc, 0x40)
+    clock.time += 100
+    rtc.latch()
+    assert rtc.latched[0] == 10
+    rtc.write(0xc, 0x00)
+    clock.time += 5
+    rtc.latch()
+    assert rtc.latched[0] == 15
+
+
+def test_rtc_saved_with_the_ram(make_rom):
+    path = make_rom(0x10, ram_code=2)
+    mem = load(path, 'game.sav')
+    mem.write(0x0a, 0x0000)
+    mem.write(0x5a, 0xa000)
+    # set the clock to 1 day, 2 hours
+    mem.write(0x0a, 0x4000)
+    mem.write(0x02, 0xa000)
+    mem.write(0x0b, 0x4000)
+    mem.write(0x01, 0xa000)
+    mem.close_save()
+    with open('game.sav', 'rb') as f:
+        data = f.read()
+    assert len(data) == 0x2000 + RTC_SAVE_SIZE
+    assert data[0] == 0x5a
+    # as the clock was saved an hour ago
+    saved = bytearray(data)
+    stamp = struct.unpack_from('<Q', saved, len(saved) - 8)[0]
+    struct.pack_into('<Q', saved, len(saved) - 8, stamp - 3600)
+    with open('game.sav', 'wb') as f:
+        f.write(saved)
+
+    mem = load(path, 'game.sav')
+    assert mem.read(0xa000) == 0x5a
+    mem.write(0x00, 0x6000)
+    mem.write(0x01, 0x6000)
+    mem.write(0x0a, 0x4000)
+    assert mem.read(0xa000) == 3
+    mem.write(0x0b, 0x4000)
+    assert mem.read(0xa000) == 1
+    mem.close_save()
+
+
+def test_clock_only_cartridge_has_a_save(make_rom):
+    mem = load(make_rom(0x0f), 'clock.sav')
+    assert mem.save is not None
+    assert len(mem.save.data) == RTC_SAVE_SIZE
+    mem.close_save()
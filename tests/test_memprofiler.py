@@ -0,0 +1,70 @@
+import pytest
+
+
+@pytest.fixture
+def bios(gb):
+    """ A bios of 0xaa bytes, so no bios file is needed. """
+    gb.mem.bios = bytearray([0xaa]) * 0x100
+    return gb.mem.bios
+
+
+def test_counts_reads_and_writes(gb):
+    profiler = gb.start_memory_profiling()
+    gb.mem.read(0xc000)
+    gb.mem.read(0xc000)
+    gb.mem.write(1, 0xff80)
+    assert profiler.reads[0xc000] == 2
+    assert profiler.writes[0xff80] == 1
+    summary = gb.stop_memory_profiling()
+    assert summary.startswith('memory accesses: 3')
+    assert 'read' not in gb.mem.__dict__
+    assert 'write' not in gb.mem.__dict__
+
+
+def test_independent_of_the_cpu_profiler(gb):
+    gb.boot()
+    gb.start_profiling()
+    mem_profiler = gb.start_memory_profiling()
+    gb.get_frame()
+    gb.stop_profiling()
+    assert gb.mem_profiler is mem_profiler
+    reads = sum(mem_profiler.reads)
+    gb.get_frame()
+    assert sum(mem_profiler.reads) > reads
+    assert gb.stop_memory_profiling().startswith('memory accesses: ')
+    assert 'read' not in gb.mem.__dict__
+
+
+def test_stopping_memory_profiling_keeps_the_cpu_profiler(gb):
+    profiler = gb.start_profiling()
+    gb.start_memory_profiling()
+    gb.stop_memory_profiling()
+    assert gb.profiler is profiler
+    assert gb.stop_profiling().startswith('instructions profiled')
+
+
+def test_bios_unmapped_while_profiling(gb, bios):
+    mem = gb.mem
+    rom_byte = mem.rom[0]
+    mem.set_bios_mode(True)
+    profiler = gb.start_memory_profiling()
+    assert mem.read(0) == 0xaa
+    mem.write(1, 0xff50)
+    assert mem.read(0) == rom_byte
+    assert profiler.reads[0] == 2
+    gb.stop_memory_profiling()
+    assert 'read' not in mem.__dict__
+
+
+def test_bios_mapped_while_profiling(gb, bios):
+    mem = gb.mem
+    profiler = gb.start_memory_profiling()
+    mem.set_bios_mode(True)
+    assert mem.read(0) == 0xaa
+    assert profiler.reads[0] == 1
+    gb.stop_memory_profiling()
+    # the bios stays mapped without the profiler
+    assert mem.read(0) == 0xaa
+    mem.set_bios_mode(False)
+    assert 'read' not in mem.__dict__
+    assert mem.read(0) == mem.rom[0]
@@ -0,0 +1,59 @@
+import numpy as np
+from pyboi.gpu.output import FrameOutput, DEFAULT_PALETTE
+
+
+def frame(shades):
+    return np.array(shades, dtype=np.uint8)
+
+
+def test_packed_holds_four_pixels_per_byte():
+    output = FrameOutput(pixels=8)
+    packed = output.convert(frame((3, 2, 1, 0, 0, 0, 0, 1)), 'packed')
+    # first pixel in the high bits
+    assert bytes(packed) == bytes((0b11100100, 0b00000001))
+
+
+def test_rgb_and_rgba_pixels():
+    output = FrameOutput(pixels=4)
+    shades = frame((0, 1, 2, 3))
+    rgb = bytes(output.convert(shades, 'rgb'))
+    assert rgb == bytes(c for color in DEFAULT_PALETTE for c in color)
+    rgba = bytes(output.convert(shades, 'rgba'))
+    assert rgba == bytes(c for color in DEFAULT_PALETTE
+                         for c in color + (0xff,))
+
+
+def test_indexed_is_a_copy():
+    output = FrameOutput(pixels=4)
+    shades = frame((3, 0, 1, 2))
+    indexed = output.convert(shades, 'indexed')
+    shades[0] = 0
+    assert bytes(indexed) == bytes((3, 0, 1, 2))
+
+
+def test_custom_palette():
+    green = ((0xe0, 0xf8, 0xd0), (0x88, 0xc0, 0x70),
+             (0x34, 0x68, 0x56), (0x08, 0x18, 0x20))
+    output = FrameOutput(green, pixels=2)
+    assert bytes(output.convert(frame((0, 3)), 'rgba')) == \
+        bytes((0xe0, 0xf8, 0xd0, 0xff, 0x08, 0x18, 0x20, 0xff))
+    # not 4 colors, kept as is
+    output.set_palette(DEFAULT_PALETTE[:3])
+    assert output.palette == green
+
+
+def test_buffers_are_reused():
+    output = FrameOutput(pixels=4)
+    first = output.convert(frame((0, 0, 0, 0)), 'rgb')
+    output.convert(frame((3, 3, 3, 3)), 'rgb')
+    # the white frame's view now shows the black one
+    assert bytes(first) == bytes(12)
+    assert output.convert(frame((0,) * 4), 'hsv') is None
+
+
+def test_screen_formats(gb):
+    gb.gpu.gb_screen[:4] = bytes((3, 2, 1, 0))
+    assert len(gb.gpu.get_frame_as('indexed')) == 23040
+    assert len(gb.gpu.get_frame_as('packed')) == 23040 // 4
+    assert gb.gpu.get_frame_as('packed')[0] == 0b11100100
+    assert bytes(gb.gpu.get_frame_as('rgba')[:4]) == bytes((0, 0, 0, 0xff))
@@ -0,0 +1,46 @@
+from pyboi.gpu.palette import Palettes
+
+
+def test_decodes_two_bits_per_color():
+    palettes = Palettes()
+    palettes.write(0xff47, 0b00011011)
+    assert palettes.colors[0xff47] == bytes((3, 2, 1, 0))
+    line = bytes((0, 1, 2, 3, 3))
+    assert line.translate(palettes.tables[0xff47]) == bytes((3, 2, 1, 0, 0))
+
+
+def test_palettes_start_all_white():
+    palettes = Palettes()
+    for address in (0xff47, 0xff48, 0xff49):
+        assert palettes.colors[address] == bytes(4)
+
+
+def test_register_writes_update_the_tables(gb):
+    gb.mem.write(0xe4, 0xff47)
+    gb.mem.write(0x1b, 0xff49)
+    assert gb.mem.read(0xff47) == 0xe4
+    assert gb.mem.palettes.colors[0xff47] == bytes((0, 1, 2, 3))
+    assert gb.mem.palettes.colors[0xff49] == bytes((3, 2, 1, 0))
+
+
+def test_background_line_through_bgp(gb):
+    gb.mem.write(0x1b, 0xff47)
+    bg_line = bytearray((0, 1, 2, 3) * 40)
+    assert gb.gpu.composite(bg_line, None, 0x91) == bytes((3, 2, 1, 0) * 40)
+    # background off is white whatever the palette
+    assert gb.gpu.composite(bg_line, None, 0x90) == bytes(160)
+
+
+def test_sprites_through_their_palette(gb):
+    gb.mem.write(0xe4, 0xff47)
+    gb.mem.write(0xff, 0xff48)
+    gb.mem.write(0x55, 0xff49)
+    bg_line = bytearray(160)
+    bg_line[2] = 2
+    obj_line = bytearray(160)
+    obj_flags = bytearray(160)
+    obj_line[0:4] = (2, 2, 2, 0)
+    # obp1, obp0, obp0 behind the background
+    obj_flags[0:3] = (0x10, 0x00, 0x80)
+    row = gb.gpu.composite(bg_line, (obj_line, obj_flags), 0x93)
+    assert row[:4] == bytes((1, 3, 2, 0))
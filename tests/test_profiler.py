@@ -0,0 +1,53 @@
+def test_profiles_a_frame(gb):
+    gb.boot()
+    opcodes = gb.z80.opcodes
+    profiler = gb.start_profiling()
+    gb.get_frame()
+    report = gb.stop_profiling()
+    # detaching puts the original handlers back
+    assert gb.z80.opcodes is opcodes
+    total = profiler.total_instructions()
+    assert total > 0
+    assert sum(profiler.pc_counts.values()) == total
+    assert sum(profiler.bank_counts.values()) == total
+    assert report.startswith('instructions profiled: {}'.format(total))
+    for section in ('hot opcodes', 'hot addresses', 'hot loops',
+                    'memory regions', 'rom banks'):
+        assert section in report
+
+
+def test_nothing_is_profiled_after_stopping(gb):
+    gb.boot()
+    profiler = gb.start_profiling()
+    gb.get_frame()
+    gb.stop_profiling()
+    total = profiler.total_instructions()
+    gb.get_frame()
+    assert profiler.total_instructions() == total
+    assert gb.stop_profiling() == ''
+
+
+def test_profiler_attached_during_dma(gb):
+    gb.boot()
+    # the rom bank is looked up when profiling, whatever the memory
+    # went through since the profiler was attached
+    gb.mem.write(0xc0, 0xff46)
+    profiler = gb.start_profiling()
+    gb.get_frame()
+    gb.z80.pc = 0x4000
+    gb.z80.execute_opcode()
+    gb.stop_profiling()
+    assert profiler.bank_counts[1] >= 1
+
+
+def test_ei_is_profiled_once(gb, load_code):
+    gb.boot()
+    # ei, nop
+    load_code((0xfb, 0x00))
+    profiler = gb.start_profiling()
+    gb.z80.execute_opcode()
+    gb.z80.execute_opcode()
+    gb.stop_profiling()
+    assert profiler.op_counts[0xfb] == 1
+    assert profiler.op_counts[0x00] == 1
+    assert profiler.total_instructions() == 2
@@ -0,0 +1,136 @@
+import pytest
+from pyboi import Pyboi
+from pyboi.emulator.snapshot import SnapshotPool
+from pyboi.replay.movie import Movie, replay, write_varint, read_varint
+
+
+@pytest.fixture
+def div_rom(workdir):
+    """
+    A rom copying DIV into the background palette forever, every
+    frame it draws depends on the timer.
+    """
+    data = bytearray(0x8000)
+    # jp $0150
+    data[0x100:0x103] = b'\xc3\x50\x01'
+    # ldh a,($04); ldh ($47),a; jr -6
+    data[0x150:0x156] = b'\xf0\x04\xe0\x47\x18\xfa'
+    path = str(workdir / 'div.gb')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def record(gb, path, frames=20):
+    """ Records frames with the a button going down and up. """
+    assert gb.start_recording(interval=5) is not None
+    for frame in range(frames):
+        if frame % 4 == 0:
+            gb.press('a')
+        elif frame % 4 == 2:
+            gb.release('a')
+        gb.get_frame()
+    return gb.stop_recording(path)
+
+
+def test_varints():
+    out = bytearray()
+    for value in (0, 0x7f, 0x80, 70224, 1 << 40):
+        write_varint(out, value)
+    pos = 0
+    for value in (0, 0x7f, 0x80, 70224, 1 << 40):
+        read, pos = read_varint(out, pos)
+        assert read == value
+    assert pos == len(out)
+
+
+def test_movie_round_trip(workdir):
+    movie = Movie('ab' * 20, ram=bytes(range(256)) * 32, rtc=3600,
+                  interval=30, boot='bios')
+    movie.events = [(100, 'a', True), (70324, 'a', False),
+                    (1 << 33, 'start', True)]
+    movie.checkpoints = [0xdeadbeef, 1]
+    movie.frames = 60
+    movie.save('movie.pbm')
+    loaded = Movie.load('movie.pbm')
+    for name in ('rom_hash', 'ram', 'rtc', 'boot', 'interval', 'events',
+                 'checkpoints', 'frames'):
+        assert getattr(loaded, name) == getattr(movie, name)
+
+
+def test_not_a_movie(workdir):
+    with open('junk.pbm', 'wb') as f:
+        f.write(b'PYBOISAV' + bytes(64))
+    assert Movie.load('junk.pbm') is None
+
+
+def test_replay_matches_the_recording(div_rom):
+    gb = Pyboi()
+    gb.load_rom(div_rom)
+    recorded = record(gb, 'session.pbm')
+    gb.close()
+    assert len(recorded.events) == 10
+    assert recorded.frames == 20
+    result = replay(Movie.load('session.pbm'), div_rom)
+    assert result['diverged'] is None
+    assert result['checkpoints'] == 4
+
+
+def test_replay_reports_the_diverging_frame(div_rom):
+    gb = Pyboi()
+    gb.load_rom(div_rom)
+    movie = record(gb, 'session.pbm')
+    gb.close()
+    movie.checkpoints[2] ^= 1
+    assert replay(movie, div_rom)['diverged'] == 15
+
+
+def test_replay_needs_the_same_rom(div_rom, rom):
+    gb = Pyboi()
+    gb.load_rom(div_rom)
+    movie = record(gb, None, frames=5)
+    gb.close()
+    assert replay(movie, rom) is None
+
+
+@pytest.mark.parametrize('boot', [None, 'state'])
+def test_replay_boots_as_recorded(div_rom, boot):
+    gb = Pyboi()
+    gb.load_rom(div_rom)
+    if boot is not None:
+        gb.boot()
+    recorded = record(gb, 'session.pbm')
+    gb.close()
+    movie = Movie.load('session.pbm')
+    assert movie.boot == boot
+    assert movie.events == recorded.events
+    assert movie.checkpoints == recorded.checkpoints
+    result = replay(movie, div_rom)
+    assert result['diverged'] is None
+    assert result['checkpoints'] == 4
+
+
+def test_replay_of_a_pool_session(rom):
+    gb = SnapshotPool().session(rom)
+    gb.mem.serial_echo = False
+    record(gb, 'session.pbm')
+    gb.close()
+    movie = Movie.load('session.pbm')
+    assert movie.boot == 'state'
+    assert replay(movie, rom)['diverged'] is None
+
+
+def test_replay_without_the_boot_diverges(div_rom):
+    gb = Pyboi()
+    gb.load_rom(div_rom)
+    gb.boot()
+    movie = record(gb, 'session.pbm')
+    gb.close()
+    movie.boot = None
+    assert replay(movie, div_rom)['diverged'] == 5
+
+
+def test_recording_has_to_start_at_the_boot(gb):
+    gb.boot()
+    gb.get_frame()
+    assert gb.start_recording() is None
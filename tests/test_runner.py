@@ -0,0 +1,64 @@
+import json
+import xml.etree.ElementTree as ET
+from pyboi.testrunner.runner import (find_roms, check_status, run_rom,
+                                     junit_report, main)
+
+
+def test_find_roms(workdir):
+    (workdir / 'roms' / 'sub').mkdir(parents=True)
+    for name in ('b.gb', 'sub/a.GBC', 'notes.txt'):
+        (workdir / 'roms' / name).write_bytes(b'')
+    assert find_roms(str(workdir / 'roms')) == [
+        str(workdir / 'roms' / 'b.gb'), str(workdir / 'roms' / 'sub' / 'a.GBC')]
+    assert find_roms(str(workdir / 'roms' / 'b.gb')) == \
+        [str(workdir / 'roms' / 'b.gb')]
+
+
+def test_status_from_serial_and_registers(gb):
+    assert check_status(gb) is None
+    gb.mem.serial += b'01:ok\nPassed'
+    assert check_status(gb) == 'pass'
+    gb.mem.serial += b'\nFailed'
+    assert check_status(gb) == 'fail'
+    gb.mem.serial = bytearray()
+    z80 = gb.z80
+    for reg, value in zip((z80.B, z80.C, z80.D, z80.E, z80.H, z80.L),
+                          (3, 5, 8, 13, 21, 34)):
+        z80.reg[reg] = value
+    assert check_status(gb) == 'pass'
+
+
+def test_run_rom_boots_and_times_out(rom, workdir):
+    result = run_rom(rom, 30)
+    assert result['name'] == 'cpu_instrs'
+    assert result['status'] == 'timeout'
+    assert result['frames'] == 30
+    # booted, the rom got to print its name
+    assert result['output'].startswith('cpu_instrs')
+    # nothing is left behind
+    assert list(workdir.iterdir()) == []
+
+
+def test_missing_rom_is_an_error(workdir):
+    result = run_rom(str(workdir / 'missing.gb'), 10)
+    assert result['status'] == 'error'
+
+
+def test_junit_counts(workdir):
+    results = [
+        {'name': 'a', 'status': 'pass', 'seconds': 1, 'output': ''},
+        {'name': 'b', 'status': 'timeout', 'seconds': 1, 'output': 'x'},
+        {'name': 'c', 'status': 'error', 'seconds': 1, 'output': '',
+         'error': 'boom'}]
+    suite = ET.fromstring(junit_report(results, 3))
+    assert suite.get('tests') == '3'
+    assert suite.get('failures') == '1'
+    assert suite.get('errors') == '1'
+
+
+def test_main_reports(rom, workdir):
+    assert main([rom, '--frames', '10', '--jobs', '1',
+                 '--json', 'report.json']) == 1
+    with open('report.json') as report:
+        results = json.load(report)['results']
+    assert [r['status'] for r in results] == ['timeout']
@@ -0,0 +1,79 @@
+import os
+from pyboi import Pyboi
+from pyboi.memory.rambank import RAMBank
+from pyboi.memory.savefile import SaveFile
+
+
+def write_ram(gb, byte):
+    gb.mem.write(0x0a, 0x0000)
+    gb.mem.write(byte, 0xa000)
+    gb.mem.write(0x00, 0x0000)
+
+
+def read_ram(gb):
+    gb.mem.write(0x0a, 0x0000)
+    return gb.mem.read(0xa000)
+
+
+def test_save_file_is_created_and_kept(workdir):
+    path = str(workdir / 'saves' / 'game.sav')
+    save = SaveFile(path, 0x2000)
+    save.data[0] = 0x42
+    save.close()
+    assert os.path.getsize(path) == 0x2000
+    save = SaveFile(path, 0x2000)
+    assert save.data[0] == 0x42
+    save.close()
+
+
+def test_save_file_grows_to_the_ram_size(workdir):
+    path = str(workdir / 'small.sav')
+    with open(path, 'wb') as f:
+        f.write(b'\x07')
+    save = SaveFile(path, 0x800)
+    assert len(save.data) == 0x800
+    assert save.data[0] == 0x07
+    save.close()
+
+
+def test_disabling_the_ram_requests_a_flush(workdir):
+    save = SaveFile(str(workdir / 'game.sav'), 0x2000, interval=3600)
+    requested = []
+    save.request_flush = lambda: requested.append(True)
+    ram = RAMBank(2)
+    ram.set_battery(save)
+    ram.set_ext_ram_enable(True)
+    ram.set_ext_ram_enable(False)
+    assert requested == [True]
+    save.close()
+
+
+def test_battery_ram_saved_per_user(make_rom, workdir):
+    path = make_rom(0x03, ram_code=2)
+    gb = Pyboi()
+    gb.load_rom(path, user='ann', save_dir='saves')
+    write_ram(gb, 0x11)
+    gb.close()
+    gb = Pyboi()
+    gb.load_rom(path, user='bob', save_dir='saves')
+    write_ram(gb, 0x22)
+    gb.close()
+
+    directory = workdir / 'saves' / gb.mem.rom_hash
+    assert sorted(os.listdir(directory)) == ['ann.sav', 'bob.sav']
+    gb = Pyboi()
+    gb.load_rom(path, user='ann', save_dir='saves')
+    assert read_ram(gb) == 0x11
+    gb.close()
+
+
+def test_no_save_dir_keeps_the_ram_in_memory(make_rom, workdir):
+    path = make_rom(0x03, ram_code=2)
+    gb = Pyboi()
+    gb.load_rom(path)
+    assert gb.mem.save.path is None
+    write_ram(gb, 0x33)
+    assert read_ram(gb) == 0x33
+    gb.close()
+    assert not any(name.endswith('.sav')
+                   for _, _, names in os.walk(workdir) for name in names)
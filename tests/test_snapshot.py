@@ -0,0 +1,82 @@
+import os
+from pyboi import Pyboi
+from pyboi.emulator.snapshot import SnapshotPool
+
+
+def test_battery_mbc2_can_be_snapshotted(make_rom):
+    gb = Pyboi()
+    gb.load_rom(make_rom(0x06), save_dir='saves')
+    gb.boot()
+    # enable the built in ram, write a nibble
+    gb.mem.write(0x0a, 0x0000)
+    gb.mem.write(0x5, 0xa010)
+    session = Pyboi(gb.snapshot())
+    bank = session.mem.membanks.bank
+    assert bank.save is None
+    assert session.mem.read(0xa010) & 0xf == 0x5
+    # the copy's ram is its own, not the .sav file
+    session.mem.write(0x7, 0xa010)
+    assert gb.mem.read(0xa010) & 0xf == 0x5
+    gb.close()
+
+
+def test_battery_mbc3_clock_can_be_snapshotted(make_rom):
+    gb = Pyboi()
+    gb.load_rom(make_rom(0x10, ram_code=2), save_dir='saves')
+    gb.boot()
+    session = Pyboi(gb.snapshot())
+    rtc = session.mem.membanks.bank.rtc
+    assert rtc.save is None
+    assert rtc is not gb.mem.membanks.bank.rtc
+    # setting the copy's clock leaves the .sav alone
+    saved = bytes(gb.mem.save.data)
+    session.mem.write(0x0a, 0x0000)
+    session.mem.write(0x08, 0x4000)
+    session.mem.write(0x30, 0xa000)
+    assert bytes(gb.mem.save.data) == saved
+    gb.close()
+
+
+def test_session_copy_runs_like_the_original(gb):
+    gb.boot()
+    gb.get_frame()
+    session = Pyboi(gb.snapshot(1))
+    session.mem.serial_echo = False
+    for _ in range(3):
+        assert bytes(session.get_frame()) == bytes(gb.get_frame())
+    assert session.z80.pc == gb.z80.pc
+
+
+def test_sessions_are_independent(gb):
+    gb.boot()
+    snapshot = gb.snapshot()
+    first = Pyboi(snapshot)
+    second = Pyboi(snapshot)
+    before = second.mem.read(0xc000)
+    first.mem.write(before ^ 0xff, 0xc000)
+    assert second.mem.read(0xc000) == before
+    assert gb.mem.read(0xc000) == before
+    assert first.mem.rom is second.mem.rom is gb.mem.rom
+    assert first.gpu.gb_screen is not second.gpu.gb_screen
+    assert first.booted == second.booted == 'state'
+
+
+def test_pool_boots_each_rom_once(rom, make_rom):
+    pool = SnapshotPool(frames=2)
+    snapshot = pool.snapshot(rom)
+    assert snapshot.frames == 2
+    assert pool.snapshot(rom) is snapshot
+    assert pool.snapshot(rom, frames=0) is not snapshot
+    # battery roms start from the boot, the game reads its save
+    assert pool.snapshot(make_rom(0x03, ram_code=2)).frames == 0
+    assert pool.snapshot('missing.gb') is None
+
+
+def test_pool_session_opens_the_users_save(make_rom, workdir):
+    path = make_rom(0x03, ram_code=2)
+    pool = SnapshotPool()
+    gb = pool.session(path, user='ann', save_dir='saves')
+    assert gb.booted == 'state'
+    assert gb.mem.save.path.endswith(os.path.join('saves', gb.mem.rom_hash,
+                                                  'ann.sav'))
+    gb.close()
@@ -0,0 +1,66 @@
+import io
+from pyboi.frontend.terminal import TerminalRenderer, HALF_BLOCKS
+
+
+def blank():
+    return bytearray(160 * 144)
+
+
+def test_braille_dots():
+    frame = blank()
+    # top left and bottom right pixels of the first cell
+    frame[0] = 3
+    frame[3 * 160 + 1] = 3
+    cells = TerminalRenderer().frame_cells(frame)
+    assert cells.shape == (36, 80)
+    assert cells[0, 0] == 0x01 | 0x80
+    assert cells.sum() == 0x81
+
+
+def test_threshold():
+    frame = blank()
+    frame[0] = 1
+    assert TerminalRenderer(threshold=1).frame_cells(frame)[0, 0] == 0x01
+    assert TerminalRenderer(threshold=2).frame_cells(frame)[0, 0] == 0
+
+
+def test_half_blocks_pair_two_rows():
+    frame = blank()
+    frame[0] = 3
+    frame[160] = 1
+    cells = TerminalRenderer('half').frame_cells(frame)
+    assert cells.shape == (72, 160)
+    assert HALF_BLOCKS[cells[0, 0]] == '\x1b[38;5;16;48;5;248m▀'
+
+
+def test_first_frame_clears_the_screen():
+    renderer = TerminalRenderer()
+    output = renderer.render(blank())
+    assert output.startswith('\x1b[2J\x1b[?25l')
+    assert output.count('\x1b[') == 2 + 36
+    assert output.count('⠀') == 80 * 36
+
+
+def test_only_changed_cells_are_redrawn():
+    renderer = TerminalRenderer()
+    frame = blank()
+    renderer.render(frame)
+    assert renderer.render(frame) == ''
+    # cells 10 and 12 of row 2
+    frame[8 * 160 + 20] = 3
+    frame[8 * 160 + 24] = 3
+    assert renderer.render(frame) == '\x1b[3;11H⠁⠀⠁'
+
+
+def test_draw_and_close_write_to_out():
+    out = io.StringIO()
+    renderer = TerminalRenderer('half', out=out)
+    renderer.draw(blank())
+    assert out.getvalue().endswith('\x1b[0m')
+    renderer.close()
+    assert out.getvalue().endswith('\x1b[73;1H\x1b[?25h\n')
+    assert renderer.cells is None
+
+
+def test_unknown_mode_falls_back_to_braille():
+    assert TerminalRenderer('sixel').mode == 'braille'
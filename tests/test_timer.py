@@ -0,0 +1,81 @@
+from pyboi.timer.timer import Timer, NEVER
+
+
+class Interrupts:
+    """ Stands in for the memory, records requested interrupts. """
+    def __init__(self):
+        self.requested = []
+
+    def request_interrupt(self, int_id):
+        self.requested.append(int_id)
+
+
+def make_timer():
+    mem = Interrupts()
+    return Timer(mem), mem
+
+
+def test_div_counts_every_256_cycles():
+    timer, _ = make_timer()
+    timer.tick(255)
+    assert timer.read_div() == 0
+    timer.tick(1)
+    assert timer.read_div() == 1
+    timer.write_div()
+    assert timer.read_div() == 0
+
+
+def test_tima_stopped_until_enabled():
+    timer, mem = make_timer()
+    timer.tick(10000)
+    assert timer.read_tima() == 0
+    assert timer.next_event == NEVER
+    assert mem.requested == []
+
+
+def test_tima_overflow_reloads_tma_and_interrupts():
+    timer, mem = make_timer()
+    timer.write_tma(0xf0)
+    timer.write_tima(0xfe)
+    # 16 cycles per increment
+    timer.write_tac(0x5)
+    timer.tick(16)
+    assert timer.read_tima() == 0xff
+    assert mem.requested == []
+    assert timer.cycles_to_event() == 16
+    timer.tick(16)
+    assert mem.requested == [2]
+    assert timer.read_tima() == 0xf0
+    # the next overflow counts up from TMA
+    assert timer.cycles_to_event() == 0x10 * 16
+
+
+def test_several_overflows_in_one_tick():
+    timer, mem = make_timer()
+    timer.write_tma(0xff)
+    timer.write_tima(0xff)
+    timer.write_tac(0x5)
+    timer.tick(16 * 3)
+    assert mem.requested == [2, 2, 2]
+    assert timer.read_tima() == 0xff
+
+
+def test_rate_change_keeps_tima():
+    timer, _ = make_timer()
+    timer.write_tac(0x5)
+    timer.tick(16 * 5)
+    assert timer.read_tima() == 5
+    # 1024 cycles per increment, counted from the internal counter
+    timer.write_tac(0x4)
+    assert timer.read_tima() == 5
+    timer.tick(1024 - 16 * 5)
+    assert timer.read_tima() == 6
+
+
+def test_tima_through_the_registers(gb):
+    gb.mem.write(0x00, 0xff06)
+    gb.mem.write(0xff, 0xff05)
+    gb.mem.write(0x05, 0xff07)
+    gb.mem.timer.tick(16)
+    assert gb.mem.read(0xff05) == 0x00
+    assert gb.mem.read(0xff0f) & 0x4
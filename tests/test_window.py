@@ -0,0 +1,74 @@
+# LCDC: lcd, window map 0x9c00, window, unsigned tiles, background
+WINDOW_ON = 0xf1
+WINDOW_OFF = 0xd1
+
+
+def setup_window(gb, wy=0, wx=7):
+    mem = gb.mem
+    # tile 1 is solid color 3, tile 0 color 0
+    for i in range(16):
+        mem.write(0xff, 0x8010 + i)
+    # window rows 0 (lines 0-7) tile 1, row 1 tile 0
+    for i in range(32):
+        mem.write(1, 0x9c00 + i)
+        mem.write(0, 0x9c20 + i)
+        mem.write(0, 0x9800 + i)
+    mem.write(0xe4, 0xff47)
+    mem.write(wy, 0xff4a)
+    mem.write(wx, 0xff4b)
+    mem.write(0, 0xff42)
+    mem.write(0, 0xff43)
+
+
+def draw(gb, lines, lcd_control):
+    gb.mem.write(lcd_control, 0xff40)
+    for line in lines:
+        gb.gpu.draw_scanline(line)
+
+
+def row(gb, line):
+    return bytes(gb.gpu.gb_screen[line * 160:(line + 1) * 160])
+
+
+def test_window_line_counter_skips_hidden_lines(gb):
+    setup_window(gb)
+    draw(gb, range(0, 4), WINDOW_ON)
+    draw(gb, range(4, 10), WINDOW_OFF)
+    assert row(gb, 5) == bytes(160)
+    # the window continues with its line 4, not line 10
+    draw(gb, range(10, 14), WINDOW_ON)
+    assert gb.gpu.window_line == 8
+    assert row(gb, 13) == bytes([3]) * 160
+    draw(gb, [14], WINDOW_ON)
+    assert row(gb, 14) == bytes(160)
+
+
+def test_window_starts_at_wy(gb):
+    setup_window(gb, wy=20)
+    draw(gb, range(0, 30), WINDOW_ON)
+    assert row(gb, 19) == bytes(160)
+    assert row(gb, 20) == bytes([3]) * 160
+    assert row(gb, 27) == bytes([3]) * 160
+    assert row(gb, 28) == bytes(160)
+    assert gb.gpu.window_line == 10
+
+
+def test_counter_resets_each_frame(gb):
+    setup_window(gb)
+    draw(gb, range(0, 12), WINDOW_ON)
+    draw(gb, [0], WINDOW_ON)
+    assert gb.gpu.window_line == 1
+    assert row(gb, 0) == bytes([3]) * 160
+
+
+def test_window_covers_from_wx(gb):
+    setup_window(gb, wx=7 + 80)
+    draw(gb, [0], WINDOW_ON)
+    assert row(gb, 0) == bytes(80) + bytes([3]) * 80
+
+
+def test_window_off_screen_is_not_counted(gb):
+    setup_window(gb, wx=167)
+    draw(gb, range(0, 4), WINDOW_ON)
+    assert gb.gpu.window_line == 0
+    assert row(gb, 0) == bytes(160)